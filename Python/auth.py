@@ -0,0 +1,164 @@
+# auth.py — Token verification + role-based permissions carried in the access token
+# Login/refresh embed `role_id` and `perms` (compiled from the `roles` table, cached).
+# require_perm() guards routes from the verified token alone — no DB round trip per
+# request; ACCESS_TOKEN_MINUTES bounds how long a role change takes to apply.
+
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import jwt  # PyJWT
+from fastapi import Depends, HTTPException, status
+from fastapi.security import OAuth2PasswordBearer
+from mysql.connector import errors as mysql_errors
+from mysql.connector.errorcode import ER_NO_SUCH_TABLE
+
+import cache_bus
+from config import JWT_SECRET, JWT_ALGORITHM, RBAC_ENFORCE, RBAC_DEFAULT_PERMISSIONS
+from db import get_conn
+
+# ================= TOKENS =================
+REVOKED_JTI: set[str] = set()
+
+def decode_token(token: str) -> dict:
+    try:
+        return jwt.decode(
+            token,
+            JWT_SECRET,
+            algorithms=[JWT_ALGORITHM],
+            leeway=60
+        )
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Token expired")
+    except jwt.InvalidTokenError as e:
+        print("[JWT Decode Error]", str(e))
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+def ensure_not_revoked(jti: str):
+    if jti in REVOKED_JTI:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has been revoked")
+
+# ================= PERMISSION MATRIX =================
+PERMISSIONS = (
+    "inventory:read", "inventory:write",
+    "transactions:read", "transactions:write",
+    "users:read", "users:write",
+)
+
+# RoleName (case-insensitive) → permissions, used when `roles` has no Permissions column
+# (or it is empty for that role). Other roles in the table get RBAC_DEFAULT_PERMISSIONS; a user
+# whose RoleID is missing or not in the table gets none.
+ROLE_PERMISSIONS: Dict[str, Tuple[str, ...]] = {
+    "admin":   PERMISSIONS,
+    "manager": ("inventory:read", "inventory:write", "transactions:read", "transactions:write", "users:read"),
+    "staff":   ("inventory:read", "inventory:write", "transactions:read", "transactions:write"),
+    "viewer":  ("inventory:read", "transactions:read"),
+}
+
+_matrix: Optional[Dict[int, Tuple[str, ...]]] = None
+_matrix_lock = threading.Lock()
+
+def parse_permissions(text: str) -> Tuple[str, ...]:
+    """'inventory:read, transactions:*' / '*' → known permissions only."""
+    out: List[str] = []
+    for p in text.replace(";", ",").replace(" ", ",").split(","):
+        p = p.strip().lower()
+        if not p:
+            continue
+        if p == "*":
+            return PERMISSIONS
+        if p.endswith(":*"):
+            out.extend(x for x in PERMISSIONS if x.startswith(p[:-1]))
+        elif p in PERMISSIONS:
+            out.append(p)
+    return tuple(dict.fromkeys(out))
+
+def compile_matrix(rows: Iterable[Tuple[Any, Any, Any]]) -> Dict[int, Tuple[str, ...]]:
+    """(RoleID, RoleName, Permissions or None) rows → RoleID → permissions."""
+    matrix: Dict[int, Tuple[str, ...]] = {}
+    for role_id, name, perms_text in rows:
+        perms = parse_permissions(perms_text) if perms_text else ()
+        if not perms:
+            perms = ROLE_PERMISSIONS.get(str(name or "").strip().lower(), tuple(RBAC_DEFAULT_PERMISSIONS))
+        matrix[int(role_id)] = perms
+    return matrix
+
+def _load_matrix() -> Optional[Dict[int, Tuple[str, ...]]]:
+    # None = could not read right now (not cached, retried next time); {} = no roles table
+    try:
+        conn = get_conn(); cur = conn.cursor()
+    except HTTPException:
+        return None
+    try:
+        cur.execute("SELECT * FROM `roles`")
+        names = list(cur.column_names)
+        rows = cur.fetchall()
+    except mysql_errors.ProgrammingError as e:
+        if e.errno == ER_NO_SUCH_TABLE:
+            return {}
+        print("[rbac] roles not readable:", e.msg)
+        return None
+    except mysql_errors.Error as e:
+        print("[rbac] roles not readable:", e.msg)
+        return None
+    finally:
+        cur.close(); conn.close()
+    perms_col = next((c for c in names if c.lower() in ("permissions", "perms")), None)
+    idx = {c: i for i, c in enumerate(names)}
+    return compile_matrix(
+        (r[idx["RoleID"]], r[idx["RoleName"]], r[idx[perms_col]] if perms_col else None) for r in rows
+    )
+
+def role_matrix() -> Dict[int, Tuple[str, ...]]:
+    """RoleID → permissions; 503 while `roles` cannot be read (tokens are never issued without it)."""
+    global _matrix
+    m = _matrix
+    if m is None:
+        with _matrix_lock:
+            if _matrix is None:
+                _matrix = _load_matrix()
+            m = _matrix
+    if m is None:
+        raise HTTPException(status_code=503, detail="Role permissions unavailable, try again shortly")
+    return m
+
+def clear_matrix(key: Optional[str] = None) -> None:
+    global _matrix
+    _matrix = None
+
+cache_bus.subscribe("roles", clear_matrix)
+
+def role_claims(role_id: Optional[int]) -> Dict[str, Any]:
+    """Claims for login/refresh: {"role_id": ..., "perms": [...]}; no role or an unknown one → no perms."""
+    rid = int(role_id) if role_id is not None else None
+    perms = role_matrix().get(rid, ()) if rid is not None else ()
+    return {"role_id": rid, "perms": list(perms)}
+
+# ================= DEPENDENCY =================
+_optional_bearer = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
+
+def require_perm(perm: str):
+    """Route dependency: a valid, unrevoked access token whose `perms` claim contains `perm`."""
+    if perm not in PERMISSIONS:
+        raise ValueError(f"Unknown permission '{perm}'")
+
+    def check(token: Optional[str] = Depends(_optional_bearer)) -> Dict[str, Any]:
+        if not RBAC_ENFORCE:
+            return {}
+        if not token:
+            raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+        claims = decode_token(token)
+        ensure_not_revoked(claims.get("jti", ""))
+        if claims.get("type") != "access":
+            raise HTTPException(status_code=401, detail="Not an access token")
+        perms = claims.get("perms")
+        if perms is None:
+            # issued before permissions were embedded: 401 makes the UI refresh and retry
+            raise HTTPException(status_code=401, detail="Token has no permissions claim; refresh it")
+        if perm not in perms:
+            raise HTTPException(status_code=403, detail=f"Missing permission: {perm}")
+        return claims
+
+    return Depends(check)
+
+def warm_up() -> None:
+    role_matrix()
@@ -0,0 +1,50 @@
+# batch.py — Shared helpers for the GET .../batch?ids=3,1,2 lookups
+# One `WHERE id IN (...)` per table; the answer keeps the order the ids were asked in
+# and lists the ids that were not found: {"data": [...], "missing": [...]}.
+
+import json
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+from fastapi import HTTPException
+
+from config import BATCH_MAX_IDS
+
+def parse_ids(raw: str) -> List[int]:
+    """'3,1,3,2' → [3, 1, 2] (duplicates dropped, first position wins)."""
+    ids: List[int] = []
+    seen = set()
+    for part in (raw or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            v = int(part)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid id '{part}'")
+        if v not in seen:
+            seen.add(v)
+            ids.append(v)
+    if not ids:
+        raise HTTPException(status_code=400, detail="ids is required (comma-separated)")
+    if len(ids) > BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_IDS} ids per request")
+    return ids
+
+def in_clause(column: str, n: int) -> str:
+    return f"`{column}` IN ({', '.join(['%s'] * n)})"
+
+def index_rows(rows: Iterable[Sequence[Any]], key: Callable[[Sequence[Any]], Any] = lambda r: r[0]) -> Dict[int, Any]:
+    return {int(key(r)): r for r in rows}
+
+def in_request_order(ids: List[int], found: Dict[int, Any]) -> Tuple[List[Any], List[int]]:
+    data, missing = [], []
+    for i in ids:
+        r = found.get(i)
+        if r is None:
+            missing.append(i)
+        else:
+            data.append(r)
+    return data, missing
+
+def encode_batch(data_json: bytes, missing: List[int]) -> bytes:
+    return b'{"data":' + data_json + b',"missing":' + json.dumps(missing, separators=(",", ":")).encode() + b'}'
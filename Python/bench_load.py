@@ -0,0 +1,538 @@
+# bench_load.py — End-to-end HTTP load benchmark for the unified API (main:app)
+# Seeds a dedicated MySQL schema with a configurable catalog/ledger, then drives
+# concurrent clients through the same flows the UI uses and records latency stats.
+#
+# Run:
+#   python bench_load.py seed  --items 10000 --transactions 5000000
+#   python bench_load.py run   --clients 32 --duration 60 --out results/v1.json
+#   python bench_load.py run   --url http://127.0.0.1:8001 --out results/v2.json --compare results/v1.json
+#
+# Without --url the script boots main:app in-process (uvicorn) against BENCH_DB.
+# BENCH_BACKEND=sqlite seeds and serves a local SQLite file (BENCH_SQLITE_PATH) instead, so
+# the benchmark runs on a machine without a MySQL server.
+
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import platform
+import threading
+import subprocess
+import http.client
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, urlencode
+
+from dotenv import load_dotenv
+import mysql.connector
+
+# ================= ENV / DB =================
+load_dotenv()
+DB_HOST = os.getenv("MYSQL_HOST", "127.0.0.1")
+DB_PORT = int(os.getenv("MYSQL_PORT", "3306"))
+DB_USER = os.getenv("MYSQL_USER", "root")
+DB_PASS = os.getenv("MYSQL_PASSWORD", "")
+BENCH_DB = os.getenv("BENCH_DB", "FoodCo_Bench")
+BENCH_BACKEND = os.getenv("BENCH_BACKEND", "mysql").strip().lower()
+BENCH_SQLITE_PATH = os.path.abspath(os.getenv("BENCH_SQLITE_PATH", "foodco_bench.sqlite3"))
+
+BENCH_USER = "bench_user"
+BENCH_EMAIL = "bench_user@example.com"
+BENCH_PASSWORD = "bench_password_123"
+
+SEED_CHUNK = 10_000
+
+# Schema mirrors the production tables the API resolves (RawMaterials, FinishedGoods,
+# inventory_transactions, users, roles). Only created when missing.
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS roles (
+      RoleID   INT AUTO_INCREMENT PRIMARY KEY,
+      RoleName VARCHAR(50) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS users (
+      UserID       INT AUTO_INCREMENT PRIMARY KEY,
+      UserName     VARCHAR(30)  NOT NULL UNIQUE,
+      PhoneNumber  VARCHAR(20)  NULL,
+      Email        VARCHAR(100) NOT NULL UNIQUE,
+      PasswordHash CHAR(64)     NOT NULL,
+      BirthDate    DATE         NULL,
+      RoleID       INT          NULL,
+      IsActive     TINYINT(1)   NOT NULL DEFAULT 1
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS RawMaterials (
+      MaterialsId   INT AUTO_INCREMENT PRIMARY KEY,
+      MaterialsName VARCHAR(100) NOT NULL,
+      Quantity      INT          NOT NULL DEFAULT 0,
+      LowStock      INT          NULL,
+      Unit          VARCHAR(10)  NOT NULL,
+      TimeUpdate    DATETIME     NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS FinishedGoods (
+      ProductId   INT AUTO_INCREMENT PRIMARY KEY,
+      ProductName VARCHAR(100) NOT NULL,
+      Quantity    INT          NOT NULL DEFAULT 0,
+      LowStock    INT          NULL,
+      TimeUpdate  DATETIME     NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS inventory_transactions (
+      TransactionID   BIGINT AUTO_INCREMENT PRIMARY KEY,
+      TransactionType ENUM('Import','Export') NOT NULL,
+      ItemType        ENUM('RawMaterials','FinishedGoods') NOT NULL,
+      MaterialsId     INT NULL,
+      ProductId       INT NULL,
+      Qty             DECIMAL(12,2) NOT NULL,
+      BeforeQty       DECIMAL(12,2) NULL,
+      AfterQty        DECIMAL(12,2) NULL,
+      Note            VARCHAR(255) NULL,
+      ChangedBy       INT NOT NULL,
+      TimeUpdate      DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+]
+
+def server_conn(database: Optional[str] = None):
+    return mysql.connector.connect(
+        host=DB_HOST, port=DB_PORT, user=DB_USER, password=DB_PASS, database=database
+    )
+
+def use_sqlite_backend() -> None:
+    # config.py reads these at import time: set them before any app module is imported
+    os.environ["DB_BACKEND"] = "sqlite"
+    os.environ["SQLITE_PATH"] = BENCH_SQLITE_PATH
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+def bench_conn():
+    """Connection to the benchmark database (transactions committed explicitly)."""
+    if BENCH_BACKEND == "sqlite":
+        use_sqlite_backend()
+        import sqlite_backend   # creates the file and sqlite_backend.SCHEMA on first use
+        return sqlite_backend.connect(autocommit=False)
+    return server_conn(BENCH_DB)
+
+# ================= SEED =================
+def seed(items: int, transactions: int, days: int, reset: bool, rng_seed: int) -> Dict[str, Any]:
+    rng = random.Random(rng_seed)
+    t0 = time.perf_counter()
+
+    if BENCH_BACKEND != "sqlite":
+        conn = server_conn()
+        cur = conn.cursor()
+        cur.execute(f"CREATE DATABASE IF NOT EXISTS `{BENCH_DB}`")
+        cur.close(); conn.close()
+
+    conn = bench_conn()
+    cur = conn.cursor()
+    if BENCH_BACKEND != "sqlite":
+        for ddl in SCHEMA:
+            cur.execute(ddl)
+    if reset:
+        for t in ("inventory_transactions", "RawMaterials", "FinishedGoods", "users", "roles"):
+            cur.execute(f"DELETE FROM `{t}`" if BENCH_BACKEND == "sqlite" else f"TRUNCATE TABLE `{t}`")
+    conn.commit()
+
+    # roles + bench user (password hashed the same way as user.hash_sha256)
+    cur.execute("SELECT RoleID FROM roles WHERE RoleName='Admin'")
+    row = cur.fetchone()
+    if row:
+        role_id = row[0]
+    else:
+        cur.execute("INSERT INTO roles (RoleName) VALUES ('Admin'), ('Staff')")
+        role_id = cur.lastrowid
+    cur.execute("SELECT UserID FROM users WHERE UserName=%s", (BENCH_USER,))
+    row = cur.fetchone()
+    if row:
+        user_id = row[0]
+    else:
+        cur.execute(
+            "INSERT INTO users (UserName, Email, PasswordHash, RoleID, IsActive) VALUES (%s,%s,%s,%s,1)",
+            (BENCH_USER, BENCH_EMAIL, hashlib.sha256(BENCH_PASSWORD.encode("utf-8")).hexdigest(), role_id),
+        )
+        user_id = cur.lastrowid
+    conn.commit()
+
+    # catalog: split items between raw materials and finished goods
+    n_raw = items // 2
+    n_fin = items - n_raw
+    units = ["kg", "g", "l", "ml", "pcs", "box"]
+    _insert_chunked(cur, conn,
+        "INSERT INTO RawMaterials (MaterialsName, Quantity, LowStock, Unit) VALUES (%s,%s,%s,%s)",
+        ((f"Material {i:06d}", rng.randint(0, 5000), rng.choice([None, 10, 50, 100]), rng.choice(units))
+         for i in range(n_raw)))
+    _insert_chunked(cur, conn,
+        "INSERT INTO FinishedGoods (ProductName, Quantity, LowStock) VALUES (%s,%s,%s)",
+        ((f"Product {i:06d}", rng.randint(0, 2000), rng.choice([None, 5, 20, 40]))
+         for i in range(n_fin)))
+
+    cur.execute("SELECT MIN(MaterialsId), MAX(MaterialsId) FROM RawMaterials")
+    raw_lo, raw_hi = cur.fetchone()
+    cur.execute("SELECT MIN(ProductId), MAX(ProductId) FROM FinishedGoods")
+    fin_lo, fin_hi = cur.fetchone()
+
+    # ledger: timestamps spread uniformly over the last `days` days, oldest first
+    now = datetime.now().replace(microsecond=0)
+    span = days * 86400
+    def tx_rows():
+        for i in range(transactions):
+            ts = now - timedelta(seconds=span - (span * i) // max(transactions, 1))
+            tx_type = "Import" if rng.random() < 0.45 else "Export"
+            if rng.random() < 0.7 and raw_lo is not None:
+                item_type, mid, pid = "RawMaterials", rng.randint(raw_lo, raw_hi), None
+            elif fin_lo is not None:
+                item_type, mid, pid = "FinishedGoods", None, rng.randint(fin_lo, fin_hi)
+            else:
+                continue
+            qty = rng.randint(1, 50)
+            before = rng.randint(0, 5000)
+            after = before + qty if tx_type == "Import" else max(before - qty, 0)
+            yield (tx_type, item_type, mid, pid, qty, before, after, None, user_id, ts)
+    _insert_chunked(cur, conn,
+        """INSERT INTO inventory_transactions
+           (TransactionType, ItemType, MaterialsId, ProductId, Qty, BeforeQty, AfterQty, Note, ChangedBy, TimeUpdate)
+           VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)""",
+        tx_rows())
+
+    cur.close(); conn.close()
+    return {
+        "db": BENCH_SQLITE_PATH if BENCH_BACKEND == "sqlite" else BENCH_DB, "raw_materials": n_raw, "finished_goods": n_fin,
+        "transactions": transactions, "days": days, "seed": rng_seed,
+        "seconds": round(time.perf_counter() - t0, 2),
+    }
+
+def _insert_chunked(cur, conn, sql: str, rows) -> None:
+    batch: List[Tuple] = []
+    for r in rows:
+        batch.append(r)
+        if len(batch) >= SEED_CHUNK:
+            cur.executemany(sql, batch); conn.commit(); batch = []
+    if batch:
+        cur.executemany(sql, batch); conn.commit()
+
+def dataset_shape() -> Dict[str, Any]:
+    conn = bench_conn(); cur = conn.cursor()
+    shape = {}
+    for t in ("RawMaterials", "FinishedGoods", "inventory_transactions", "users"):
+        cur.execute(f"SELECT COUNT(*) FROM `{t}`")
+        shape[t] = cur.fetchone()[0]
+    cur.execute("SELECT MIN(MaterialsId), MAX(MaterialsId) FROM RawMaterials")
+    shape["raw_id_range"] = list(cur.fetchone())
+    cur.execute("SELECT MIN(ProductId), MAX(ProductId) FROM FinishedGoods")
+    shape["finished_id_range"] = list(cur.fetchone())
+    cur.close(); conn.close()
+    return shape
+
+# ================= HTTP CLIENT =================
+class Client:
+    """One keep-alive connection + token pair per virtual user (not thread-safe)."""
+
+    def __init__(self, base_url: str, timeout: float):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.https = parts.scheme == "https"
+        self.timeout = timeout
+        self.conn: Optional[http.client.HTTPConnection] = None
+        self.access: Optional[str] = None
+        self.refresh: Optional[str] = None
+        self.user_id: Optional[int] = None
+
+    def _connect(self):
+        cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        self.conn = cls(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method: str, path: str, body: Any = None, auth: bool = True) -> Tuple[int, Any]:
+        headers = {"Accept": "application/json"}
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        if auth and self.access:
+            headers["Authorization"] = f"Bearer {self.access}"
+        for attempt in (0, 1):
+            if self.conn is None:
+                self._connect()
+            try:
+                self.conn.request(method, path, body=data, headers=headers)
+                resp = self.conn.getresponse()
+                raw = resp.read()
+                break
+            except (http.client.HTTPException, OSError):
+                self.conn.close(); self.conn = None
+                if attempt:
+                    raise
+        payload = None
+        if raw and "json" in (resp.getheader("content-type") or ""):
+            payload = json.loads(raw)
+        return resp.status, payload
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+
+# ================= FLOWS =================
+# (name, weight) — relative mix of a warehouse tablet session
+FLOW_MIX = [
+    ("me", 15),
+    ("inventory", 20),
+    ("inventory_filtered", 20),
+    ("tx_list_recent", 15),
+    ("tx_post", 20),
+    ("refresh", 5),
+    ("login", 5),
+]
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def add(self, name: str, ms: float, ok: bool):
+        with self.lock:
+            self.samples.setdefault(name, []).append(ms)
+            if not ok:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+def _timed(rec: Recorder, name: str, fn) -> Any:
+    t = time.perf_counter()
+    ok = False
+    out = None
+    try:
+        status_code, out = fn()
+        ok = 200 <= status_code < 300
+    except Exception:
+        ok = False
+    rec.add(name, (time.perf_counter() - t) * 1000.0, ok)
+    return out if ok else None
+
+def do_login(c: Client, rec: Recorder) -> bool:
+    out = _timed(rec, "login", lambda: c.request(
+        "POST", "/api/auth/login", {"identifier": BENCH_USER, "password": BENCH_PASSWORD}, auth=False))
+    if not out:
+        return False
+    c.access, c.refresh = out["access_token"], out["refresh_token"]
+    return True
+
+def run_flow(name: str, c: Client, rec: Recorder, rng: random.Random, shape: Dict[str, Any]) -> None:
+    if name == "login":
+        do_login(c, rec)
+    elif name == "me":
+        out = _timed(rec, "me", lambda: c.request("GET", "/api/me"))
+        if out and c.user_id is None:
+            c.user_id = out.get("user_id")
+    elif name == "inventory":
+        _timed(rec, "inventory", lambda: c.request("GET", "/api/inventory"))
+    elif name == "inventory_filtered":
+        params = rng.choice([
+            {"type": "Raw"}, {"type": "Finished"}, {"status": "Low"},
+            {"inStockOnly": "true"}, {"search": f"{rng.randint(0, 999):03d}"},
+        ])
+        _timed(rec, "inventory_filtered", lambda: c.request("GET", "/api/inventory?" + urlencode(params)))
+    elif name == "tx_list_recent":
+        since = (datetime.now() - timedelta(days=rng.choice([0, 1, 7]))).date().isoformat()
+        _timed(rec, "tx_list_recent", lambda: c.request("GET", "/api/transactions?" + urlencode({"from_date": since})))
+    elif name == "tx_post":
+        if c.user_id is None:
+            return
+        if rng.random() < 0.7 and shape["raw_id_range"][0] is not None:
+            body = {"TransactionType": "Import", "ItemType": "RawMaterials",
+                    "MaterialsId": rng.randint(*shape["raw_id_range"])}
+        else:
+            body = {"TransactionType": "Import", "ItemType": "FinishedGoods",
+                    "ProductId": rng.randint(*shape["finished_id_range"])}
+        body.update({"Qty": rng.randint(1, 20), "Note": "bench", "ChangedBy": c.user_id})
+        _timed(rec, "tx_post", lambda: c.request("POST", "/api/transactions", body))
+    elif name == "refresh":
+        if not c.refresh:
+            return
+        out = _timed(rec, "refresh", lambda: c.request(
+            "POST", "/api/auth/refresh", {"refresh_token": c.refresh}, auth=False))
+        if out:
+            c.access, c.refresh = out["access_token"], out["refresh_token"]
+
+def worker(idx: int, base_url: str, deadline: float, rec: Recorder, shape: Dict[str, Any],
+           rng_seed: int, timeout: float) -> None:
+    rng = random.Random(rng_seed + idx)
+    names = [n for n, _ in FLOW_MIX]
+    weights = [w for _, w in FLOW_MIX]
+    c = Client(base_url, timeout)
+    try:
+        if not do_login(c, rec):
+            return
+        run_flow("me", c, rec, rng, shape)
+        while time.perf_counter() < deadline:
+            run_flow(rng.choices(names, weights)[0], c, rec, rng, shape)
+    finally:
+        c.close()
+
+# ================= REPORT =================
+def percentile(sorted_vals: List[float], p: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    k = (len(sorted_vals) - 1) * p
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_vals) - 1)
+    return sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * (k - lo)
+
+def summarize(rec: Recorder, elapsed: float) -> Dict[str, Any]:
+    endpoints: Dict[str, Any] = {}
+    total = 0
+    errors = 0
+    for name in sorted(rec.samples):
+        vals = sorted(rec.samples[name])
+        n = len(vals)
+        err = rec.errors.get(name, 0)
+        total += n; errors += err
+        endpoints[name] = {
+            "count": n,
+            "errors": err,
+            "rps": round(n / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(vals, 0.50), 3),
+            "p95_ms": round(percentile(vals, 0.95), 3),
+            "p99_ms": round(percentile(vals, 0.99), 3),
+            "max_ms": round(vals[-1], 3) if vals else 0.0,
+        }
+    return {
+        "total_requests": total,
+        "total_errors": errors,
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "elapsed_s": round(elapsed, 3),
+        "endpoints": endpoints,
+    }
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return "unknown"
+
+def print_report(result: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> None:
+    s = result["summary"]
+    print(f"\n{'endpoint':<20}{'count':>8}{'err':>6}{'rps':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for name, e in s["endpoints"].items():
+        line = f"{name:<20}{e['count']:>8}{e['errors']:>6}{e['rps']:>10}{e['p50_ms']:>10}{e['p95_ms']:>10}{e['p99_ms']:>10}"
+        if baseline and name in baseline["summary"]["endpoints"]:
+            b = baseline["summary"]["endpoints"][name]
+            if b["p95_ms"]:
+                line += f"   p95 {((e['p95_ms'] - b['p95_ms']) / b['p95_ms']) * 100:+.1f}%"
+        print(line)
+    print(f"\nthroughput: {s['throughput_rps']} req/s  total: {s['total_requests']}  errors: {s['total_errors']}")
+    if baseline:
+        b = baseline["summary"]
+        if b["throughput_rps"]:
+            delta = (s["throughput_rps"] - b["throughput_rps"]) / b["throughput_rps"] * 100
+            print(f"vs {baseline['meta'].get('git', '?')}: throughput {delta:+.1f}%")
+
+# ================= SERVER =================
+def start_inprocess_server(port: int) -> str:
+    # main.py reads MYSQL_DB at import time → point it at the bench schema first
+    os.environ["MYSQL_DB"] = BENCH_DB
+    if BENCH_BACKEND == "sqlite":
+        use_sqlite_backend()
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import uvicorn
+    config = uvicorn.Config("main:app", host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    th = threading.Thread(target=server.run, daemon=True)
+    th.start()
+    deadline = time.time() + 30
+    while not server.started and time.time() < deadline:
+        time.sleep(0.05)
+    if not server.started:
+        raise RuntimeError("in-process server failed to start")
+    return f"http://127.0.0.1:{port}"
+
+def run(args) -> Dict[str, Any]:
+    base_url = args.url or start_inprocess_server(args.port)
+    shape = dataset_shape()
+    rec = Recorder()
+
+    # warm-up phase (not recorded)
+    if args.warmup > 0:
+        warm = Recorder()
+        wd = time.perf_counter() + args.warmup
+        ths = [threading.Thread(target=worker, args=(i, base_url, wd, warm, shape, args.seed, args.timeout))
+               for i in range(min(args.clients, 4))]
+        for t in ths: t.start()
+        for t in ths: t.join()
+
+    t0 = time.perf_counter()
+    deadline = t0 + args.duration
+    ths = [threading.Thread(target=worker, args=(i, base_url, deadline, rec, shape, args.seed, args.timeout))
+           for i in range(args.clients)]
+    for t in ths: t.start()
+    for t in ths: t.join()
+    elapsed = time.perf_counter() - t0
+
+    return {
+        "meta": {
+            "git": git_revision(),
+            "time": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "url": args.url or "in-process",
+            "backend": BENCH_BACKEND,
+            "clients": args.clients,
+            "duration_s": args.duration,
+            "seed": args.seed,
+            "flow_mix": dict(FLOW_MIX),
+            "dataset": shape,
+        },
+        "summary": summarize(rec, elapsed),
+    }
+
+# ================= CLI =================
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="FoodCo API load benchmark")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    sp = sub.add_parser("seed", help="create/seed the benchmark schema")
+    sp.add_argument("--items", type=int, default=10_000)
+    sp.add_argument("--transactions", type=int, default=5_000_000)
+    sp.add_argument("--days", type=int, default=365)
+    sp.add_argument("--reset", action="store_true", help="truncate tables before seeding")
+    sp.add_argument("--seed", type=int, default=42)
+
+    rp = sub.add_parser("run", help="drive the API with concurrent clients")
+    rp.add_argument("--url", default=None, help="target server; default boots main:app in-process")
+    rp.add_argument("--port", type=int, default=8765)
+    rp.add_argument("--clients", type=int, default=16)
+    rp.add_argument("--duration", type=float, default=30.0)
+    rp.add_argument("--warmup", type=float, default=5.0)
+    rp.add_argument("--timeout", type=float, default=30.0)
+    rp.add_argument("--seed", type=int, default=42)
+    rp.add_argument("--out", default=None, help="write JSON results here")
+    rp.add_argument("--compare", default=None, help="previous JSON results to diff against")
+
+    args = ap.parse_args(argv)
+    if args.cmd == "seed":
+        info = seed(args.items, args.transactions, args.days, args.reset, args.seed)
+        print(json.dumps(info, indent=2))
+        return 0
+
+    result = run(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+            f.write("\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
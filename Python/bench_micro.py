@@ -0,0 +1,280 @@
+# bench_micro.py — Micro-benchmarks for per-row / per-request pure-Python hot paths
+# No database needed: rows are synthesised in the shapes the MySQL cursors return.
+#
+# Run:
+#   python bench_micro.py                                  # print table
+#   python bench_micro.py --save bench_micro_baseline.json # record a baseline
+#   python bench_micro.py --baseline bench_micro_baseline.json --threshold 0.20
+#       → exit code 1 if any case is >20% slower (or allocates >20% more) than baseline
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+from datetime import datetime, date, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pydantic import TypeAdapter
+
+import fastjson
+import inventory
+import reorder
+import transaction
+import user
+
+# ================= FIXTURES =================
+ROWS = int(os.getenv("BENCH_ROWS", "10000"))
+RNG = random.Random(1234)
+NOW = datetime(2025, 1, 1, 8, 0, 0)
+
+class EnumCursor:
+    """Stands in for a cursor answering the COLUMN_TYPE query of get_enum_values."""
+    def __init__(self, coltype: str):
+        self.row = (coltype,)
+    def execute(self, q, params=None):
+        pass
+    def fetchone(self):
+        return self.row
+
+def inventory_rows(n: int) -> List[Dict[str, Any]]:
+    out = []
+    for i in range(n):
+        out.append({
+            "id": i + 1,
+            "name": f"Item {i:06d}",
+            "quantity": RNG.randint(0, 500),
+            "unit": RNG.choice(["kg", "l", "pcs", None]),
+            "lowStock": RNG.choice([None, 10, 50]),
+            "updatedAt": NOW - timedelta(minutes=i),
+        })
+    return out
+
+def tx_rows(n: int) -> List[Dict[str, Any]]:
+    out = []
+    for i in range(n):
+        raw = RNG.random() < 0.7
+        qty = Decimal(RNG.randint(1, 50))
+        out.append({
+            "TransactionID": n - i,
+            "TransactionType": RNG.choice(["Import", "Export"]),
+            "ItemType": "RawMaterials" if raw else "FinishedGoods",
+            "MaterialsId": RNG.randint(1, 5000) if raw else None,
+            "ProductId": None if raw else RNG.randint(1, 5000),
+            "Qty": qty,
+            "BeforeQty": Decimal(100),
+            "AfterQty": Decimal(100) + qty,
+            "Note": RNG.choice([None, "restock", "production run"]),
+            "ChangedBy": RNG.randint(1, 50),
+            "TimeUpdate": NOW - timedelta(seconds=i * 37),
+        })
+    return out
+
+def user_rows(n: int) -> List[Dict[str, Any]]:
+    out = []
+    for i in range(n):
+        out.append({
+            "user_id": i + 1,
+            "table_used": "users",
+            "username": f"user_{i:06d}",
+            "email": f"user_{i:06d}@example.com",
+            "phone": "0900000000",
+            "birthdate": date(1990, 1, 1) + timedelta(days=i % 9000),
+            "role_id": 1 + i % 3,
+            "role_name": ("Admin", "Manager", "Staff")[i % 3],
+            "is_active": True,
+        })
+    return out
+
+def tx_create_payloads(n: int) -> List[Dict[str, Any]]:
+    out = []
+    for i in range(n):
+        if i % 2:
+            out.append({"TransactionType": "Import", "ItemType": "Raw", "MaterialsId": i, "Qty": 5, "ChangedBy": 1})
+        else:
+            out.append({"TransactionType": "Export", "ItemType": "FinishedProduct", "ProductId": i, "Qty": 2.5,
+                        "Note": "bench", "ChangedBy": 2})
+    return out
+
+def tx_update_payloads(n: int) -> List[Dict[str, Any]]:
+    return [{"ItemType": "RawMaterials", "MaterialsId": i, "Qty": 3} if i % 2 else {"Note": "edit", "Qty": 1.5}
+            for i in range(n)]
+
+# ================= CASES =================
+# Each case returns (callable running one batch, number of calls per batch)
+def build_cases(rows: int) -> Dict[str, Tuple[Callable[[], Any], int]]:
+    inv = inventory_rows(rows)
+    txs = tx_rows(rows)
+    users = user_rows(rows)
+    creates = tx_create_payloads(rows)
+    updates = tx_update_payloads(rows)
+    statuses = [(r["quantity"], r["lowStock"]) for r in inv]
+    enum_cur = EnumCursor("enum('RawMaterials','FinishedGoods','Consumables','Packaging')")
+    allowed = ["RawMaterials", "FinishedGoods"]
+    requested = ["Raw", "RawMaterials", "FinishedProduct", "finished", "FinishedGoods"] * (rows // 5 + 1)
+    tx_list = TypeAdapter(List[transaction.TxOut])
+    user_list = TypeAdapter(List[user.UserItem])
+
+    tx_tuples = [tuple(r.values()) for r in txs]
+    user_tuples = [tuple(r.values()) for r in users]
+    inv_tuples = [(r["id"], r["name"], r["quantity"], r["unit"], r["lowStock"], r["updatedAt"]) for r in inv]
+
+    cases = {
+        "normalize_row_to_item": (lambda: [inventory.normalize_row_to_item(r, "Raw") for r in inv], rows),
+        "compute_status": (lambda: [inventory.compute_status(q, l) for q, l in statuses], rows),
+        "get_enum_values": (lambda: [transaction.get_enum_values(enum_cur, "t", "c") for _ in range(1000)], 1000),
+        "coerce_item_type_for_db": (lambda: [transaction.coerce_item_type_for_db(r, allowed) for r in requested[:rows]], rows),
+        "TxCreate.validate": (lambda: [transaction.TxCreate.model_validate(p) for p in creates], rows),
+        "TxUpdate.validate": (lambda: [transaction.TxUpdate.model_validate(p) for p in updates], rows),
+        "List[TxOut] validate+dump": (lambda: tx_list.dump_json(tx_list.validate_python(txs)), rows),
+        "List[UserItem] validate+dump": (lambda: user_list.dump_json(user_list.validate_python(users)), rows),
+        # what the endpoints did before fastjson (FastAPI response_model + JSONResponse)
+        "List[TxOut] response_model": (lambda: response_model_bytes(tx_list, txs), rows),
+        "List[UserItem] response_model": (lambda: response_model_bytes(user_list, users), rows),
+        "fastjson tx rows": (lambda: fastjson.encode_rows(transaction.encode_tx_row, tx_tuples), rows),
+        "fastjson user rows": (lambda: fastjson.encode_rows(user.encode_user_row, user_tuples), rows),
+        "fastjson inventory rows": (lambda: fastjson.encode_rows(
+            inventory.encode_inventory_row, [inventory.normalize_row_to_tuple(r, "Raw") for r in inv_tuples]), rows),
+    }
+    if reorder.np is not None:
+        # (item, day) export sums as load_exports returns them: ~20 export days per item over 90 days
+        np = reorder.np
+        gen = np.random.default_rng(1234)
+        n_items, m = max(rows // 20, 1), rows
+        item_ids = np.arange(1, n_items + 1)
+        ex = (gen.integers(1, n_items + 1, m), gen.integers(0, 90, m), gen.random(m) * 10)
+        cases["reorder.compute (numpy)"] = (lambda: reorder.compute(item_ids, *ex, days=90, lead_days=7, z=1.645), rows)
+    return cases
+
+# ================= FAST JSON PARITY =================
+def response_model_bytes(adapter: TypeAdapter, rows: List[Any]) -> bytes:
+    # what FastAPI sends for response_model=...: json-mode dump, then JSONResponse.render
+    content = adapter.dump_python(adapter.validate_python(rows), mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
+def verify_fast_json(rows: int) -> List[str]:
+    """Compare the precompiled encoders with the response_model output on synthetic rows."""
+    n = min(rows, 2000)
+    txs = tx_rows(n)
+    txs[0]["Note"] = 'quote " backslash \\ tab \t ctrl \x01 unicode Đồ ăn'
+    users = user_rows(n)
+    users[0].update(phone=None, birthdate=None, role_id=None, role_name=None, is_active=None)
+    users[1]["is_active"] = 0
+    inv = inventory_rows(n)
+    mismatches = []
+
+    expected = response_model_bytes(TypeAdapter(List[transaction.TxOut]), txs)
+    got = fastjson.encode_rows(transaction.encode_tx_row, [tuple(r.values()) for r in txs])
+    if got != expected:
+        mismatches.append("TxOut")
+
+    expected = response_model_bytes(TypeAdapter(List[user.UserItem]), users)
+    got = fastjson.encode_rows(user.encode_user_row, [tuple(r.values()) for r in users])
+    if got != expected:
+        mismatches.append("UserItem")
+
+    items = [inventory.normalize_row_to_item(r, "Finished" if i % 3 else "Raw") for i, r in enumerate(inv)]
+    expected = response_model_bytes(TypeAdapter(List[inventory.InventoryItem]), items)
+    got = fastjson.encode_rows(inventory.encode_inventory_row, [
+        inventory.normalize_row_to_tuple(
+            (r["id"], r["name"], r["quantity"], r["unit"], r["lowStock"], r["updatedAt"]),
+            "Finished" if i % 3 else "Raw")
+        for i, r in enumerate(inv)])
+    if got != expected:
+        mismatches.append("InventoryItem")
+    return mismatches
+
+# ================= RUNNER =================
+def measure(fn: Callable[[], Any], calls: int, repeat: int) -> Dict[str, float]:
+    fn()  # warm-up
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    result = fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+
+    return {
+        "ns_per_call": round(best / calls * 1e9, 1),
+        "alloc_bytes_per_call": round(max(peak - before, 0) / calls, 1),
+    }
+
+def run(rows: int, repeat: int, only: Optional[str]) -> Dict[str, Dict[str, float]]:
+    cases = build_cases(rows)
+    results = {}
+    for name, (fn, calls) in cases.items():
+        if only and only not in name:
+            continue
+        results[name] = measure(fn, calls, repeat)
+    return results
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            threshold: float) -> List[str]:
+    failures = []
+    for name, cur in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric in ("ns_per_call", "alloc_bytes_per_call"):
+            b, c = base.get(metric, 0), cur[metric]
+            if b > 0 and c > b * (1 + threshold):
+                failures.append(f"{name}: {metric} {b} -> {c} (+{(c / b - 1) * 100:.1f}%)")
+    return failures
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="FoodCo micro-benchmarks")
+    ap.add_argument("--rows", type=int, default=ROWS)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--only", default=None, help="substring filter on case name")
+    ap.add_argument("--save", default=None, help="write results as a baseline JSON")
+    ap.add_argument("--baseline", default=None, help="baseline JSON to check against")
+    ap.add_argument("--threshold", type=float, default=0.20, help="allowed regression ratio")
+    args = ap.parse_args(argv)
+
+    mismatches = verify_fast_json(args.rows)
+    if mismatches:
+        print("FAST JSON MISMATCH vs response_model output: " + ", ".join(mismatches))
+        return 1
+
+    results = run(args.rows, args.repeat, args.only)
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["cases"]
+
+    print(f"{'case':<32}{'ns/call':>12}{'alloc B/call':>14}")
+    for name, r in results.items():
+        line = f"{name:<32}{r['ns_per_call']:>12}{r['alloc_bytes_per_call']:>14}"
+        if name in baseline and baseline[name]["ns_per_call"]:
+            line += f"   {(r['ns_per_call'] / baseline[name]['ns_per_call'] - 1) * 100:+.1f}%"
+        print(line)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"rows": args.rows, "cases": results}, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+    if baseline:
+        failures = compare(results, baseline, args.threshold)
+        if failures:
+            print("\nREGRESSIONS:")
+            for line in failures:
+                print("  " + line)
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
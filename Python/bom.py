@@ -0,0 +1,300 @@
+# bom.py — Bill of materials: finished good → raw-material quantities per unit
+# The whole BOM is compiled once into a BomGraph (per-product component lists for
+# exploding a run, plus NumPy edge arrays for catalog-wide math) and cached until a
+# BOM write publishes "bom". Stock is not part of the graph: it is read per request.
+#
+#   GET  /api/bom/producible        max units of every product from current raw stock (NumPy)
+#   GET/PUT/DELETE /api/bom/{id}    components of one finished good
+#   POST /api/production            explode the BOM → one Export per material + one Import
+#                                   of the product, inserted in a single DB transaction
+
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Header, HTTPException, Query, Request, status
+from mysql.connector import errors as mysql_errors
+from mysql.connector.errorcode import ER_NO_SUCH_TABLE
+from pydantic import BaseModel, Field, field_validator
+
+try:
+    import numpy as np  # optional: pip install numpy
+except ImportError:
+    np = None
+
+import batch
+import cache_bus
+from auth import require_perm
+from compression import cached
+from db import get_conn
+from fastjson import compile_row_encoder, encode_rows, json_bytes_response
+import idempotency
+from repository import repo
+import inventory
+import transaction
+
+router = APIRouter()
+
+BOM_TABLE = "bill_of_materials"
+
+# created by migrations.py (version 4)
+DDL = f"""
+CREATE TABLE IF NOT EXISTS `{BOM_TABLE}` (
+  ProductId    INT           NOT NULL,
+  MaterialsId  INT           NOT NULL,
+  QtyPerUnit   DECIMAL(12,4) NOT NULL,
+  PRIMARY KEY (ProductId, MaterialsId),
+  KEY idx_bom_material (MaterialsId)
+)
+"""
+
+# ================= MODELS =================
+class BomLine(BaseModel):
+    MaterialsId: int
+    QtyPerUnit: float = Field(..., gt=0)
+
+class BomIn(BaseModel):
+    components: List[BomLine] = Field(..., min_length=1)
+
+    @field_validator("components")
+    @classmethod
+    def _unique_materials(cls, v: List[BomLine]):
+        ids = [c.MaterialsId for c in v]
+        if len(set(ids)) != len(ids):
+            raise ValueError("Each MaterialsId may appear only once")
+        return v
+
+class ProductionIn(BaseModel):
+    ProductId: int
+    Units: int = Field(..., gt=0)
+    ChangedBy: int
+    Note: Optional[str] = Field(None, max_length=255)
+
+PRODUCIBLE_FIELDS = [("ProductId", "int"), ("MaxUnits", "int"), ("LimitingMaterialsId", "int")]
+encode_producible_row = compile_row_encoder(PRODUCIBLE_FIELDS, name="encode_producible_row")
+
+# ================= GRAPH =================
+class BomGraph:
+    """Immutable compiled BOM. Edge arrays are sorted by product, one segment per product."""
+
+    def __init__(self, rows: List[Tuple[int, int, float]]):
+        rows = sorted((int(p), int(m), float(q)) for p, m, q in rows)
+        self.components: Dict[int, List[Tuple[int, float]]] = {}
+        for p, m, q in rows:
+            self.components.setdefault(p, []).append((m, q))
+        if np is None:
+            return
+        prod = np.array([r[0] for r in rows], dtype=np.int64)
+        mat = np.array([r[1] for r in rows], dtype=np.int64)
+        self.product_ids, self.starts = np.unique(prod, return_index=True)
+        self.edge_product = np.searchsorted(self.product_ids, prod)
+        self.material_ids = np.unique(mat)
+        self.edge_material = np.searchsorted(self.material_ids, mat)
+        self.edge_qty = np.array([r[2] for r in rows], dtype=np.float64)
+
+    def max_producible(self, stock_ids: "np.ndarray", stock_qty: "np.ndarray") -> Tuple["np.ndarray", "np.ndarray"]:
+        """(max units, limiting material id) per product_ids entry; unknown materials count as 0 stock."""
+        if not len(self.product_ids):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        stock = np.zeros(len(self.material_ids))
+        pos = np.minimum(np.searchsorted(self.material_ids, stock_ids), len(self.material_ids) - 1)
+        hit = self.material_ids[pos] == stock_ids
+        stock[pos[hit]] = np.maximum(stock_qty[hit], 0)
+        ratio = stock[self.edge_material] / self.edge_qty
+        units = np.floor(np.minimum.reduceat(ratio, self.starts) + 1e-9).astype(np.int64)
+        # smallest ratio inside each product segment: sort by (product, ratio), take segment heads
+        order = np.lexsort((ratio, self.edge_product))
+        limiting = self.material_ids[self.edge_material[order[self.starts]]]
+        return units, limiting
+
+_graph: Optional[BomGraph] = None
+_graph_gen = 0                      # bumped by clear_graph: a load that started earlier is not installed
+_graph_lock = threading.Lock()      # one load at a time
+_graph_state_lock = threading.Lock()
+
+def _load_rows() -> List[Tuple[int, int, float]]:
+    conn = get_conn(read_only=True); cur = conn.cursor()
+    try:
+        cur.execute(f"SELECT ProductId, MaterialsId, QtyPerUnit FROM `{BOM_TABLE}`")
+        return cur.fetchall()
+    except mysql_errors.ProgrammingError as e:
+        if e.errno == ER_NO_SUCH_TABLE:
+            return []   # migrations not applied yet: no product has a BOM
+        raise
+    finally:
+        cur.close(); conn.close()
+
+def get_graph() -> BomGraph:
+    global _graph
+    g = _graph
+    if g is None:
+        with _graph_lock:
+            g = _graph
+            if g is None:
+                gen = _graph_gen
+                g = BomGraph(_load_rows())
+                with _graph_state_lock:
+                    if _graph_gen == gen:   # else a BOM write landed while loading: the next call reloads
+                        _graph = g
+    return g
+
+def clear_graph(key: Optional[str] = None) -> None:
+    global _graph, _graph_gen
+    with _graph_state_lock:
+        _graph_gen += 1
+        _graph = None
+
+cache_bus.subscribe("bom", clear_graph)
+cache_bus.subscribe("schema", clear_graph)
+
+def warm_up() -> None:
+    get_graph()
+
+def _raw_stock() -> Tuple["np.ndarray", "np.ndarray"]:
+    table, c = inventory.get_raw_table_and_cols()
+    conn = get_conn(read_only=True); cur = conn.cursor()
+    try:
+        cur.execute(f"SELECT `{c['id']}`, `{c['quantity']}` FROM `{table}`")
+        rows = cur.fetchall()
+    finally:
+        cur.close(); conn.close()
+    arr = np.array(rows, dtype=np.float64).reshape(-1, 2)
+    return arr[:, 0].astype(np.int64), arr[:, 1]
+
+# ================= ROUTES =================
+# declared before /{product_id} so "producible" is not parsed as an id
+@router.get("/api/bom/producible", dependencies=[require_perm("inventory:read")])
+def producible(request: Request, ids: Optional[str] = Query(None, description="Comma-separated ProductIds (default: every product with a BOM)")):
+    if np is None:
+        raise HTTPException(status_code=503, detail="Producibility needs NumPy (pip install numpy)")
+    wanted = batch.parse_ids(ids) if ids else None
+
+    def build():
+        g = get_graph()
+        units, limiting = g.max_producible(*_raw_stock())
+        rows = list(zip(g.product_ids.tolist(), units.tolist(), limiting.tolist()))
+        if wanted is not None:
+            # ids without a BOM come back with null units
+            by_id = {r[0]: r for r in rows}
+            rows = [by_id.get(i, (i, None, None)) for i in wanted]
+        return json_bytes_response(encode_rows(encode_producible_row, rows))
+
+    return cached(request, ("bom", "raw_materials"), build)
+
+@router.get("/api/bom/{product_id}", dependencies=[require_perm("inventory:read")])
+def get_bom(product_id: int):
+    lines = get_graph().components.get(product_id)
+    if not lines:
+        raise HTTPException(status_code=404, detail="No BOM for this product")
+    return {"ProductId": product_id, "components": [{"MaterialsId": m, "QtyPerUnit": q} for m, q in lines]}
+
+def _missing_ids(cur, table: str, id_col: str, ids: List[int]) -> List[int]:
+    cur.execute(f"SELECT `{id_col}` FROM `{table}` WHERE {batch.in_clause(id_col, len(ids))}", tuple(ids))
+    found = {int(r[0]) for r in cur.fetchall()}
+    return [i for i in ids if i not in found]
+
+@router.put("/api/bom/{product_id}", dependencies=[require_perm("inventory:write")])
+def put_bom(product_id: int, payload: BomIn):
+    """Replace the product's components."""
+    fin_table, fc = inventory.get_finished_table_and_cols()
+    raw_table, rc = inventory.get_raw_table_and_cols()
+    mat_ids = [c.MaterialsId for c in payload.components]
+    conn = get_conn(autocommit=False); cur = conn.cursor()
+    try:
+        if _missing_ids(cur, fin_table, fc['id'], [product_id]):
+            raise HTTPException(status_code=404, detail="Finished good not found")
+        missing = _missing_ids(cur, raw_table, rc['id'], mat_ids)
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Unknown MaterialsId(s): {missing}")
+        cur.execute(f"DELETE FROM `{BOM_TABLE}` WHERE ProductId=%s", (product_id,))
+        values = ", ".join(["(%s, %s, %s)"] * len(mat_ids))
+        params = [v for c in payload.components for v in (product_id, c.MaterialsId, c.QtyPerUnit)]
+        cur.execute(f"INSERT INTO `{BOM_TABLE}` (ProductId, MaterialsId, QtyPerUnit) VALUES {values}", tuple(params))
+        conn.commit()
+    except mysql_errors.Error as e:
+        conn.rollback()
+        raise HTTPException(status_code=400, detail=e.msg)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close(); conn.close()
+    cache_bus.publish("bom", product_id)
+    return {"updated": True}
+
+@router.delete("/api/bom/{product_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[require_perm("inventory:write")])
+def delete_bom(product_id: int):
+    conn = get_conn(); cur = conn.cursor()
+    try:
+        cur.execute(f"DELETE FROM `{BOM_TABLE}` WHERE ProductId=%s", (product_id,))
+        affected = cur.rowcount
+    finally:
+        cur.close(); conn.close()
+    if affected == 0:
+        raise HTTPException(status_code=404, detail="No BOM for this product")
+    cache_bus.publish("bom", product_id, "D")
+    return
+
+# ================= PRODUCTION =================
+@router.post("/api/production", status_code=status.HTTP_201_CREATED)
+def create_production(payload: ProductionIn, idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+                      claims: Dict[str, Any] = require_perm("transactions:write")):
+    # a retried run must not consume the materials twice
+    return idempotency.run("production", idempotency_key, payload,
+                           lambda: _produce(payload), status.HTTP_201_CREATED, claims.get("sub"))
+
+def _produce(payload: ProductionIn) -> Dict[str, Any]:
+    lines = get_graph().components.get(payload.ProductId)
+    if not lines:
+        raise HTTPException(status_code=404, detail="No BOM for this product")
+    consumption = [(m, round(q * payload.Units, 2)) for m, q in lines]
+
+    table, c = transaction.get_tx_table_and_cols()
+    allowed = transaction.get_item_type_enum(table, c['itemType'])
+    raw_type = transaction.coerce_item_type_for_db("RawMaterials", allowed)
+    fin_type = transaction.coerce_item_type_for_db("FinishedGoods", allowed)
+    raw_table, rc = inventory.get_raw_table_and_cols()
+    mat_ids = [m for m, _ in consumption]
+
+    # transaction.TX_INSERT_KEYS order
+    rows = [("Export", raw_type, m, None, qty, payload.Note, payload.ChangedBy) for m, qty in consumption]
+    rows.append(("Import", fin_type, None, payload.ProductId, payload.Units, payload.Note, payload.ChangedBy))
+
+    refs = [("Raw", m) for m in mat_ids] + [("Finished", payload.ProductId)]
+    conn = get_conn(autocommit=False); cur = conn.cursor()
+    try:
+        # lock the materials so two runs cannot both spend the same stock
+        cur.execute(
+            f"SELECT `{rc['id']}`, `{rc['quantity']}` FROM `{raw_table}` "
+            f"WHERE {batch.in_clause(rc['id'], len(mat_ids))}{repo.for_update}",
+            tuple(mat_ids),
+        )
+        stock = {int(r[0]): float(r[1] or 0) for r in cur.fetchall()}
+        short = [{"MaterialsId": m, "required": qty, "available": stock.get(m, 0.0)}
+                 for m, qty in consumption if stock.get(m, 0.0) < qty]
+        if short:
+            raise HTTPException(status_code=409, detail={"message": "Insufficient stock", "shortages": short})
+        # one INSERT per row, each keeping its own lastrowid: a multi-row INSERT's ids are not
+        # consecutive under innodb_autoinc_lock_mode=2 or auto_increment_increment > 1
+        sql = transaction.tx_insert_sql(table, c, 1)
+        tx_ids: List[int] = []
+        for r in rows:
+            cur.execute(sql, r)
+            tx_ids.append(int(cur.lastrowid))
+        transaction.record_tx_changes(cur, tx_ids, "I", refs)
+        conn.commit()
+    except mysql_errors.Error as e:
+        conn.rollback()
+        raise HTTPException(status_code=400, detail=e.msg)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close(); conn.close()
+
+    transaction.publish_tx_changes(tx_ids, "I", refs)
+    return {
+        "ProductId": payload.ProductId,
+        "Units": payload.Units,
+        "transactions": tx_ids,
+        "consumed": [{"MaterialsId": m, "Qty": qty} for m, qty in consumption],
+    }
@@ -0,0 +1,176 @@
+# cache_bus.py — Cross-worker cache invalidation over a polled MySQL change table
+# Writers call publish(table, key). Local subscribers run immediately; with CACHE_BUS=1
+# the event is also appended to `cache_changes`, which every worker polls every
+# CACHE_BUS_POLL_MS and replays to its own subscribers. Each row carries the publishing
+# worker's WORKER_ID, so a worker skips its own events (it already ran them), and rows younger
+# than CACHE_BUS_SETTLE_MS are held back: AUTO_INCREMENT values can commit out of order, and
+# the poller must never move past a Seq that is still invisible.
+#
+# Scopes used by the app: "raw_materials", "finished_goods", "transactions", "users",
+# "roles", "schema", "ledger", "bom". key=None means "anything in this table".
+
+import os
+import socket
+import time
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from config import CACHE_BUS, CACHE_BUS_POLL_MS, CACHE_BUS_RETENTION_MINUTES, CACHE_BUS_SETTLE_MS
+from db import get_conn
+from repository import repo
+
+CHANGES_TABLE = "cache_changes"
+
+# identifies this process's rows in the change table (pids repeat across hosts and restarts)
+WORKER_ID = f"{socket.gethostname()[:40]}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+DDL = f"""
+CREATE TABLE IF NOT EXISTS `{CHANGES_TABLE}` (
+  Seq        BIGINT AUTO_INCREMENT PRIMARY KEY,
+  TableName  VARCHAR(64) NOT NULL,
+  ItemKey    VARCHAR(64) NULL,
+  Op         CHAR(1)     NOT NULL DEFAULT 'U',
+  Origin     VARCHAR(64) NULL,
+  CreatedAt  DATETIME(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+  KEY idx_cache_changes_created (CreatedAt)
+)
+"""
+
+Callback = Callable[[Optional[str]], None]
+
+_subscribers: Dict[str, List[Callback]] = {}
+_versions: Dict[str, int] = {}
+_lock = threading.Lock()
+
+_stats: Dict[str, Any] = {"published": 0, "received": 0, "polls": 0, "poll_errors": 0,
+                          "last_seq": 0, "last_poll_ms": None}
+_poller: Optional[threading.Thread] = None
+_stop = threading.Event()
+
+def subscribe(table: str, callback: Callback) -> None:
+    with _lock:
+        _subscribers.setdefault(table, []).append(callback)
+
+def version(table: str) -> int:
+    """Monotonic per-process counter of invalidations seen for `table` (local + remote)."""
+    return _versions.get(table, 0)
+
+def _dispatch(table: str, key: Optional[str]) -> None:
+    with _lock:
+        _versions[table] = _versions.get(table, 0) + 1
+        callbacks = list(_subscribers.get(table, ()))
+    for cb in callbacks:
+        try:
+            cb(key)
+        except Exception as e:
+            print(f"[cache-bus] subscriber for '{table}' failed:", e)
+
+def _dispatch_all() -> None:
+    # used after a polling gap: we may have missed events, so drop everything
+    with _lock:
+        tables = list(_subscribers)
+    for t in tables:
+        _dispatch(t, None)
+
+def publish(table: str, key: Any = None, op: str = "U") -> None:
+    """Invalidate `table` (or one `key` in it) here and, when the bus is on, on every worker."""
+    k = None if key is None else str(key)
+    _dispatch(table, k)
+    _stats["published"] += 1
+    if not CACHE_BUS:
+        return
+    try:
+        conn = get_conn(); cur = conn.cursor()
+        try:
+            cur.execute(f"INSERT INTO `{CHANGES_TABLE}` (TableName, ItemKey, Op, Origin) VALUES (%s,%s,%s,%s)",
+                        (table, k, op, WORKER_ID))
+        finally:
+            cur.close(); conn.close()
+    except Exception as e:
+        # the write itself succeeded; other workers catch up at their next reconcile
+        print("[cache-bus] publish failed:", getattr(e, "detail", e))
+
+# ================= POLLER =================
+def _settled(cur) -> datetime:
+    """Newest CreatedAt the poller may replay: the database's now minus CACHE_BUS_SETTLE_MS."""
+    cur.execute(f"SELECT {repo.now_ms}")
+    now = cur.fetchone()[0]
+    if isinstance(now, str):
+        now = datetime.fromisoformat(now)   # SQLite: expressions carry no column type
+    return now - timedelta(milliseconds=CACHE_BUS_SETTLE_MS)
+
+def _poll_once(last_seq: int) -> int:
+    """Replay other workers' settled rows after `last_seq`; returns the new cursor."""
+    conn = get_conn(); cur = conn.cursor()
+    try:
+        cur.execute(
+            f"SELECT Seq, TableName, ItemKey, Origin FROM `{CHANGES_TABLE}` WHERE Seq > %s AND CreatedAt <= %s "
+            f"ORDER BY Seq LIMIT 1000",
+            (last_seq, _settled(cur)),
+        )
+        rows = cur.fetchall()
+    finally:
+        cur.close(); conn.close()
+    received = 0
+    for seq, table, key, origin in rows:
+        last_seq = seq
+        if origin == WORKER_ID:
+            continue   # publish() already ran it here
+        _dispatch(table, key)
+        received += 1
+    _stats["received"] += received
+    return last_seq
+
+def _prune() -> None:
+    conn = get_conn(); cur = conn.cursor()
+    try:
+        cur.execute(
+            f"DELETE FROM `{CHANGES_TABLE}` WHERE CreatedAt < NOW(3) - INTERVAL %s MINUTE LIMIT 10000",
+            (CACHE_BUS_RETENTION_MINUTES,),
+        )
+    finally:
+        cur.close(); conn.close()
+
+def _poll_loop(last_seq: int) -> None:
+    interval = CACHE_BUS_POLL_MS / 1000.0
+    next_prune = time.monotonic() + 60
+    gap = False
+    while not _stop.wait(interval):
+        t = time.perf_counter()
+        try:
+            if gap:
+                _dispatch_all()
+                gap = False
+            last_seq = _poll_once(last_seq)
+            _stats["polls"] += 1
+            _stats["last_seq"] = last_seq
+            _stats["last_poll_ms"] = round((time.perf_counter() - t) * 1000, 2)
+            if time.monotonic() >= next_prune:
+                _prune()
+                next_prune = time.monotonic() + 60
+        except Exception as e:
+            _stats["poll_errors"] += 1
+            gap = True
+            print("[cache-bus] poll failed:", getattr(e, "detail", e))
+
+def start() -> None:
+    """Create the change table if needed and start polling from its current end (idempotent)."""
+    global _poller
+    if not CACHE_BUS or _poller is not None:
+        return
+    conn = get_conn(); cur = conn.cursor()
+    try:
+        cur.execute(DDL)
+        cur.execute(f"SELECT COALESCE(MAX(Seq), 0) FROM `{CHANGES_TABLE}`")
+        last_seq = int(cur.fetchone()[0])
+    finally:
+        cur.close(); conn.close()
+    _stats["last_seq"] = last_seq
+    _poller = threading.Thread(target=_poll_loop, args=(last_seq,), name="cache-bus", daemon=True)
+    _poller.start()
+
+def stats() -> Dict[str, Any]:
+    return {"enabled": CACHE_BUS, "poll_ms": CACHE_BUS_POLL_MS, "settle_ms": CACHE_BUS_SETTLE_MS,
+            "worker": WORKER_ID, **_stats, "versions": dict(_versions)}
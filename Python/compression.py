@@ -0,0 +1,196 @@
+# compression.py — gzip/brotli response compression + cached precompressed list payloads
+# CompressionMiddleware compresses any JSON/text response above COMPRESS_MIN_BYTES for
+# clients that accept it (br preferred when the optional `brotli` package is installed).
+# List handlers additionally wrap their body in cached(): the final (already compressed)
+# bytes are kept per path + query + encoding and reused while the cache-bus versions of
+# the tables they read are unchanged — no query, no serialization, no compression.
+# On a miss, identical concurrent requests share one build (singleflight.py).
+
+import gzip
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from fastapi import Request, Response
+
+import cache_bus
+import db
+import singleflight
+from config import COMPRESS_MIN_BYTES, GZIP_LEVEL, BROTLI_QUALITY, RESPONSE_CACHE_MAX_BYTES
+
+try:
+    import brotli  # optional: pip install brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+def negotiate(accept_encoding: str) -> str:
+    """'br' | 'gzip' | 'identity' from an Accept-Encoding header (q=0 means refused)."""
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name] = q
+    star = accepted.get("*", 0.0)
+    if brotli is not None and accepted.get("br", star) > 0:
+        return "br"
+    if accepted.get("gzip", star) > 0:
+        return "gzip"
+    return "identity"
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return body
+
+def _encode_for(body: bytes, media_type: Optional[str], encoding: str) -> str:
+    # what we actually send: small or non-text bodies stay as they are
+    if encoding == "identity" or len(body) < COMPRESS_MIN_BYTES:
+        return "identity"
+    if not media_type or not media_type.startswith(COMPRESSIBLE_TYPES):
+        return "identity"
+    return encoding
+
+# ================= MIDDLEWARE =================
+class CompressionMiddleware:
+    """Pure ASGI: buffers a single-message response body and compresses it when worthwhile."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        accept = ""
+        for k, v in scope.get("headers", ()):
+            if k == b"accept-encoding":
+                accept = v.decode("latin-1")
+                break
+        encoding = negotiate(accept) if accept else "identity"
+        if encoding == "identity":
+            return await self.app(scope, receive, send)
+
+        start: Dict[str, Any] = {}
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal passthrough
+            if message["type"] == "http.response.start":
+                start.update(message)
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                return await send(message)
+            headers = [(k, v) for k, v in start.get("headers", []) if k != b"content-length"]
+            names = {k for k, _ in headers}
+            body = message.get("body", b"")
+            if message.get("more_body") or b"content-encoding" in names:
+                # streaming or already encoded (cached()): send untouched
+                passthrough = True
+                await send(start)
+                return await send(message)
+            ctype = next((v.decode("latin-1") for k, v in headers if k == b"content-type"), None)
+            enc = _encode_for(body, ctype, encoding)
+            if enc != "identity":
+                body = compress(body, enc)
+                headers.append((b"content-encoding", enc.encode()))
+            if b"vary" in names:
+                headers = [(k, v + b", Accept-Encoding" if k == b"vary" else v) for k, v in headers]
+            else:
+                headers.append((b"vary", b"Accept-Encoding"))
+            headers.append((b"content-length", str(len(body)).encode()))
+            await send({**start, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
+
+# ================= PRECOMPRESSED LIST CACHE =================
+class ResponseCache:
+    """LRU of final response bytes, bounded by total size."""
+
+    def __init__(self, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.entries: "OrderedDict[Tuple, Tuple[Tuple[int, ...], int, str, bytes]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "uncacheable": 0, "evicted": 0}
+
+    def get(self, key: Tuple, versions: Tuple[int, ...]):
+        with self.lock:
+            e = self.entries.get(key)
+            if e is None:
+                self.stats["misses"] += 1
+                return None
+            if e[0] != versions:
+                self.stats["stale"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return e
+
+    def put(self, key: Tuple, versions: Tuple[int, ...], status_code: int, encoding: str, body: bytes) -> None:
+        if self.max_bytes <= 0 or len(body) > self.max_bytes // 4:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old[3])
+            self.entries[key] = (versions, status_code, encoding, body)
+            self.bytes += len(body)
+            while self.bytes > self.max_bytes and self.entries:
+                _, ev = self.entries.popitem(last=False)
+                self.bytes -= len(ev[3])
+                self.stats["evicted"] += 1
+
+    def report(self) -> Dict[str, Any]:
+        with self.lock:
+            return {"entries": len(self.entries), "bytes": self.bytes, "max_bytes": self.max_bytes, **self.stats}
+
+response_cache = ResponseCache()
+
+def _response(status_code: int, encoding: str, body: bytes) -> Response:
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
+
+def cached(request: Request, tables: Sequence[str], build: Callable[[], Any]) -> Any:
+    """
+    Serve `build()`'s response from the cache while every table in `tables` is unchanged.
+    Only Response results (the fastjson paths) are cached; anything else is returned as is.
+    """
+    query = tuple(sorted(request.query_params.multi_items()))
+    versions = tuple(cache_bus.version(t) for t in tables)   # read before build(): a write racing it → stale next time
+    # same endpoint + query + table versions: a request made after a local write never joins an older
+    # flight; a session pinned to the primary never shares a replica read
+    flight = (request.url.path, query, versions, db.session_pinned())
+    if db.REPLICAS or response_cache.max_bytes <= 0:
+        # a replica may still be behind the version we would tag the entry with
+        result, shared = singleflight.do(flight, build)
+        return singleflight.copy_response(result) if shared else result
+    encoding = negotiate(request.headers.get("accept-encoding", ""))
+    key = (request.url.path, query, encoding)
+    hit = response_cache.get(key, versions)
+    if hit is not None:
+        return _response(hit[1], hit[2], hit[3])
+    result, shared = singleflight.do(flight, build)
+    if not isinstance(result, Response) or result.status_code != 200 or "content-encoding" in result.headers:
+        response_cache.stats["uncacheable"] += 1
+        return singleflight.copy_response(result) if shared else result
+    body = bytes(result.body)
+    enc = _encode_for(body, result.media_type or "application/json", encoding)
+    body = compress(body, enc)
+    response_cache.put(key, versions, result.status_code, enc, body)
+    return _response(result.status_code, enc, body)
+
+def stats() -> Dict[str, Any]:
+    return {"brotli": brotli is not None, "min_bytes": COMPRESS_MIN_BYTES, **response_cache.report()}
@@ -0,0 +1,147 @@
+# config.py — Single place that reads .env / environment (loaded once, at import)
+import os
+from typing import List
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def env_bool(name: str, default: bool = False) -> bool:
+    v = os.getenv(name)
+    if v is None:
+        return default
+    return v.strip().lower() in ("1", "true", "yes", "on")
+
+def env_list(name: str, default: List[str]) -> List[str]:
+    v = os.getenv(name)
+    if not v:
+        return default
+    return [x.strip() for x in v.split(",") if x.strip()]
+
+# ================= DB =================
+# Storage backend under the handlers (repository.py): "mysql" (default) or "sqlite", an
+# embedded file for edge sites, local runs and the benchmark suite (sqlite_backend.py)
+DB_BACKEND = os.getenv("DB_BACKEND", "mysql").strip().lower()
+
+DB_HOST = os.getenv("MYSQL_HOST", "127.0.0.1").strip()
+DB_PORT = int(os.getenv("MYSQL_PORT", "3306"))
+DB_USER = os.getenv("MYSQL_USER", "root")
+DB_PASS = os.getenv("MYSQL_PASSWORD", "")
+DB_NAME = os.getenv("MYSQL_DB", "FoodCo_Management")
+DB_POOL_SIZE = int(os.getenv("MYSQL_POOL_SIZE", "10"))  # mysql-connector caps pools at 32
+
+# Read replicas: comma-separated DSNs, e.g. mysql://ro_user:pw@10.0.0.12:3306/FoodCo_Management
+# (user/password/db default to the primary's). Empty → every read goes to the primary.
+DB_REPLICA_DSNS = env_list("MYSQL_REPLICA_DSNS", [])
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_CHECK_SECONDS = float(os.getenv("REPLICA_CHECK_SECONDS", "2"))
+# after a write, the same session reads from the primary for this long (read-your-writes)
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "10"))
+
+# SQLite backend (DB_BACKEND=sqlite)
+SQLITE_PATH = os.getenv("SQLITE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "foodco.sqlite3"))
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "16"))            # idle connections kept open
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").upper()  # NORMAL: durable in WAL mode except on power loss
+SQLITE_CACHE_MB = int(os.getenv("SQLITE_CACHE_MB", "64"))               # page cache per connection
+SQLITE_MMAP_MB = int(os.getenv("SQLITE_MMAP_MB", "256"))                # memory-mapped reads
+SQLITE_BUSY_MS = int(os.getenv("SQLITE_BUSY_MS", "5000"))               # wait for the writer lock this long
+
+# ================= JWT =================
+JWT_SECRET = os.getenv("JWT_SECRET", "change_me_super_secret")
+JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_MINUTES", "15"))   # also how long a role change takes to apply
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_DAYS", "7"))
+
+# ================= RBAC =================
+RBAC_ENFORCE = env_bool("RBAC_ENFORCE", True)
+# roles with neither a Permissions value nor a known RoleName
+RBAC_DEFAULT_PERMISSIONS = env_list("RBAC_DEFAULT_PERMISSIONS", [
+    "inventory:read", "inventory:write", "transactions:read", "transactions:write",
+])
+
+# ================= USERS =================
+USERS_PAGE_SIZE = int(os.getenv("USERS_PAGE_SIZE", "100"))     # /api/users default limit
+USERS_PAGE_MAX = int(os.getenv("USERS_PAGE_MAX", "1000"))
+ROLES_CACHE_SECONDS = int(os.getenv("ROLES_CACHE_SECONDS", "300"))
+BULK_USERS_MAX = int(os.getenv("BULK_USERS_MAX", "5000"))                  # POST /api/users/bulk
+BULK_USERS_MAX_BYTES = int(os.getenv("BULK_USERS_MAX_BYTES", str(5 * 1024 * 1024)))
+BULK_INSERT_CHUNK = int(os.getenv("BULK_INSERT_CHUNK", "500"))             # rows per multi-row INSERT
+
+# ================= HTTP =================
+# superset of the Live Server ports the UI is served from during dev
+CORS_ORIGINS = env_list("CORS_ORIGINS", [
+    "http://localhost",
+    "http://127.0.0.1",
+    "http://localhost:5500", "http://127.0.0.1:5500",
+    "http://localhost:5501", "http://127.0.0.1:5501",
+    "http://localhost:5502", "http://127.0.0.1:5502",
+    "http://localhost:5503", "http://127.0.0.1:5503",
+    "http://localhost:5504", "http://127.0.0.1:5504",
+    "http://localhost:5505", "http://127.0.0.1:5505",
+])
+DEBUG_LOG_HEADERS = env_bool("DEBUG_LOG_HEADERS", False)
+BATCH_MAX_IDS = int(os.getenv("BATCH_MAX_IDS", "500"))   # GET .../batch?ids=
+
+# ================= COMPRESSION =================
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))   # smaller bodies are sent as is
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))               # only if `brotli` is installed
+# precompressed list payloads (0 disables); skipped when read replicas are configured
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# identical concurrent list reads share one build (see singleflight.py)
+SINGLEFLIGHT = env_bool("SINGLEFLIGHT", True)
+SINGLEFLIGHT_MAX_WAIT_MS = int(os.getenv("SINGLEFLIGHT_MAX_WAIT_MS", "5000"))   # then a waiter builds on its own
+
+# ================= FEATURES =================
+FAST_JSON = env_bool("FAST_JSON", True)
+INVENTORY_READ_MODEL = env_bool("INVENTORY_READ_MODEL", False)
+INVENTORY_READ_MODEL_RECONCILE_SECONDS = int(os.getenv("INVENTORY_READ_MODEL_RECONCILE_SECONDS", "60"))
+REQUIRE_IF_MATCH = env_bool("REQUIRE_IF_MATCH", False)    # PUT/DELETE without If-Match → 428
+
+# ================= REORDER ENGINE =================
+REORDER_LOOKBACK_DAYS = int(os.getenv("REORDER_LOOKBACK_DAYS", "90"))       # Export history used
+REORDER_LEAD_DAYS = float(os.getenv("REORDER_LEAD_DAYS", "7"))              # supplier/production lead time
+REORDER_SERVICE_LEVEL = float(os.getenv("REORDER_SERVICE_LEVEL", "0.95"))   # P(no stock-out during lead time)
+REORDER_UPDATE_CHUNK = int(os.getenv("REORDER_UPDATE_CHUNK", "1000"))       # rows per Lowstock write-back UPDATE
+
+# ================= MIGRATIONS =================
+MIGRATE_ON_STARTUP = env_bool("MIGRATE_ON_STARTUP", False)    # off: warm-up only reports pending work
+MIGRATIONS_CHECK_MIN_ROWS = int(os.getenv("MIGRATIONS_CHECK_MIN_ROWS", "1000"))
+
+# ================= LEDGER (hot + archive tiers) =================
+LEDGER_HOT_MONTHS = int(os.getenv("LEDGER_HOT_MONTHS", "3"))       # whole months kept hot besides the current one
+LEDGER_ROLL_BATCH = int(os.getenv("LEDGER_ROLL_BATCH", "5000"))     # rows moved per archive transaction
+
+# ================= TRANSACTION JOURNAL (write-behind) =================
+# off: POST /api/transactions writes MySQL directly (default)
+# fallback: journal only while MySQL is unreachable (or the journal still has a backlog)
+# always: every POST is journaled locally and drained into MySQL in the background
+TX_JOURNAL = os.getenv("TX_JOURNAL", "off").strip().lower()
+TX_JOURNAL_PATH = os.getenv("TX_JOURNAL_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tx_journal.sqlite3"))
+TX_JOURNAL_BATCH = int(os.getenv("TX_JOURNAL_BATCH", "200"))               # entries replayed per MySQL transaction
+TX_JOURNAL_DRAIN_MS = int(os.getenv("TX_JOURNAL_DRAIN_MS", "50"))          # idle poll interval of the drainer
+TX_JOURNAL_RETENTION_HOURS = int(os.getenv("TX_JOURNAL_RETENTION_HOURS", "24"))   # drained entries kept for lookups
+
+# ================= DELTA SYNC =================
+SYNC_RETENTION_DAYS = int(os.getenv("SYNC_RETENTION_DAYS", "30"))   # older cursors get 410 → full re-download
+SYNC_PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", "1000"))           # changes per /api/sync page (default)
+SYNC_SETTLE_MS = int(os.getenv("SYNC_SETTLE_MS", "1000"))           # newer changes wait for the next page
+
+# ================= DASHBOARD =================
+DASHBOARD_RECENT = int(os.getenv("DASHBOARD_RECENT", "10"))                         # latest transactions shown
+DASHBOARD_RECONCILE_SECONDS = int(os.getenv("DASHBOARD_RECONCILE_SECONDS", "300"))  # full recount (0 = only when stale)
+
+# ================= CACHE INVALIDATION BUS =================
+CACHE_BUS = env_bool("CACHE_BUS", False)             # on when running several workers
+CACHE_BUS_POLL_MS = int(os.getenv("CACHE_BUS_POLL_MS", "100"))
+CACHE_BUS_SETTLE_MS = int(os.getenv("CACHE_BUS_SETTLE_MS", "500"))   # younger rows wait for a later poll
+CACHE_BUS_RETENTION_MINUTES = int(os.getenv("CACHE_BUS_RETENTION_MINUTES", "60"))
+
+# ================= IDEMPOTENCY =================
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+# how long a duplicate waits for the first request with the same key before getting a 409
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+
+# ================= STARTUP =================
+WARMUP_RETRY_SECONDS = int(os.getenv("WARMUP_RETRY_SECONDS", "5"))
@@ -0,0 +1,264 @@
+# dashboard.py — GET /api/dashboard/summary: the home page overview in one call
+# Served from in-process counters instead of the full lists:
+#   items   id → (status, quantity) per table → item counts per status + total stock
+#   today   TransactionID → (type, Qty) for today's rows → count/Qty per TransactionType
+#   recent  the DASHBOARD_RECENT newest transactions
+# Cache-bus events keep them current: an event for one id re-reads that row and applies the
+# difference (constant work per write). An event without an id (bulk writes), a new day or a
+# deleted row leaving `recent` short marks the counters stale; the next request recounts
+# from the database. A background recount every DASHBOARD_RECONCILE_SECONDS catches drift.
+# The response body is built once per change and then served as-is.
+
+import json
+import threading
+import time
+from datetime import date, datetime, timezone
+from datetime import time as dtime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from fastapi import APIRouter
+
+from auth import require_perm
+from config import DASHBOARD_RECENT, DASHBOARD_RECONCILE_SECONDS
+from db import get_conn
+from fastjson import encode_rows, json_bytes_response
+import cache_bus
+import inventory
+import transaction
+
+router = APIRouter()
+
+KINDS = ("Raw", "Finished")
+STATUSES = ("OK", "Low", "Out")
+TX_TYPES = ("Import", "Export")
+
+# positions in a transaction.TX_FIELDS row
+TX_ID, TX_TYPE, TX_QTY, TX_TIME = 0, 1, 5, 10
+
+class Summary:
+    """Counters behind one lock. While a recount reads the DB, events are collected in `touched`."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.items: Dict[str, Dict[int, Tuple[str, int]]] = {k: {} for k in KINDS}
+        self.counts = {k: dict.fromkeys(STATUSES, 0) for k in KINDS}
+        self.stock = dict.fromkeys(KINDS, 0)
+        self.day: Optional[date] = None
+        self.today: Dict[int, Tuple[str, float]] = {}
+        self.volume = {t: [0, 0.0] for t in TX_TYPES}    # type → [count, Qty]
+        self.recent: List[Tuple] = []                     # newest TransactionID first
+        self.stale = True
+        self.reconciled_at: Optional[datetime] = None
+        self.touched: Optional[Set[Tuple[str, int]]] = None
+        self.body: Optional[bytes] = None
+        self.events = 0
+
+    def set_item(self, kind: str, rid: int, qty: Any, low: Any, present: bool) -> None:
+        with self.lock:
+            old = self.items[kind].pop(rid, None)
+            if old is not None:
+                self.counts[kind][old[0]] -= 1
+                self.stock[kind] -= old[1]
+            if present:
+                qty = int(qty or 0)
+                st = inventory.compute_status(qty, low)
+                self.items[kind][rid] = (st, qty)
+                self.counts[kind][st] += 1
+                self.stock[kind] += qty
+            self.body = None
+
+    def set_tx(self, tx_id: int, row: Optional[Tuple]) -> None:
+        with self.lock:
+            old = self.today.pop(tx_id, None)
+            if old is not None:
+                v = self.volume[old[0]]
+                v[0] -= 1; v[1] -= old[1]
+            if row is not None and row[TX_TYPE] in self.volume and _day_of(row[TX_TIME]) == self.day:
+                qty = float(row[TX_QTY] or 0)
+                self.today[tx_id] = (row[TX_TYPE], qty)
+                v = self.volume[row[TX_TYPE]]
+                v[0] += 1; v[1] += qty
+            had = len(self.recent)
+            self.recent = [r for r in self.recent if r[TX_ID] != tx_id]
+            if row is not None:
+                if len(self.recent) < DASHBOARD_RECENT or tx_id > self.recent[-1][TX_ID]:
+                    self.recent.append(row)
+                    self.recent.sort(key=lambda r: r[TX_ID], reverse=True)
+                    del self.recent[DASHBOARD_RECENT:]
+            elif len(self.recent) < had and had >= DASHBOARD_RECENT:
+                self.stale = True   # the next-newest row is not known here
+            self.body = None
+
+summary = Summary()
+_recount_lock = threading.Lock()
+_reconciler: Optional[threading.Thread] = None
+
+def _day_of(v: Any) -> Optional[date]:
+    if isinstance(v, str):
+        v = datetime.fromisoformat(v)
+    return v.date() if isinstance(v, datetime) else None
+
+# ================= EVENTS (one row each) =================
+def _refresh_item(kind: str, rid: int) -> None:
+    # inventory subscribed first (imported above), so a live read model already has this write;
+    # otherwise read the primary: a replica may not have it yet, and no session is pinned here
+    rows, _ = inventory.fetch_items_by_ids(kind, [rid], primary=True)   # Row: (id, name, qty, unit, low, time)
+    if rows:
+        summary.set_item(kind, rid, rows[0][2], rows[0][4], True)
+    else:
+        summary.set_item(kind, rid, None, None, False)
+
+def _refresh_tx(tx_id: int) -> None:
+    rows, _ = transaction.fetch_tx_by_ids([tx_id], primary=True)
+    summary.set_tx(tx_id, rows[0] if rows else None)
+
+def _on_change(scope: str):
+    def handler(key: Optional[str]) -> None:
+        with summary.lock:
+            summary.events += 1
+            if key is None:
+                summary.stale = True
+                summary.body = None
+                return
+            if summary.touched is not None:
+                summary.touched.add((scope, int(key)))
+            if summary.stale and summary.touched is None:
+                return   # nothing loaded yet: the next recount sees this write anyway
+        if scope == "transactions":
+            _refresh_tx(int(key))
+        else:
+            _refresh_item(scope, int(key))
+    return handler
+
+cache_bus.subscribe("raw_materials", _on_change("Raw"))
+cache_bus.subscribe("finished_goods", _on_change("Finished"))
+cache_bus.subscribe("transactions", _on_change("transactions"))
+cache_bus.subscribe("schema", _on_change("schema"))   # always key=None → recount
+
+# ================= RECOUNT =================
+def _load_items(kind: str) -> List[Tuple[int, Any, Any]]:
+    if inventory.ensure_read_model():
+        return [(r[0], r[2], r[4]) for r in inventory.read_model.rows(kind)]
+    table, c = inventory.get_raw_table_and_cols() if kind == "Raw" else inventory.get_finished_table_and_cols()
+    conn = get_conn(read_only=True); cur = conn.cursor()
+    try:
+        cur.execute(f"SELECT `{c['id']}`, `{c['quantity']}`, `{c['low']}` FROM `{table}`")
+        return cur.fetchall()
+    finally:
+        cur.close(); conn.close()
+
+def _load_transactions(day: date) -> Tuple[List[Tuple], List[Tuple]]:
+    """(today's (id, type, Qty) rows, the newest transactions) — both from the tiers that can hold them."""
+    table, c = transaction.get_tx_table_and_cols()
+    start = datetime.combine(day, dtime.min)
+    cols = ", ".join(f"`{c[k]}`" for k in transaction.TX_COLUMN_KEYS)
+    today: List[Tuple] = []
+    recent: List[Tuple] = []
+    conn = get_conn(read_only=True); cur = conn.cursor()
+    try:
+        for t in transaction.tx_tables(table, c, start=start):
+            cur.execute(f"SELECT `{c['id']}`, `{c['txType']}`, `{c['qty']}` FROM `{t}` WHERE `{c['time']}` >= %s",
+                        (start,))
+            today.extend(cur.fetchall())
+        # hot tier first; the archive only when the hot table is nearly empty
+        for t in transaction.tx_tables_for_id(table):
+            cur.execute(f"SELECT {cols} FROM `{t}` ORDER BY `{c['id']}` DESC LIMIT %s",
+                        (DASHBOARD_RECENT - len(recent),))
+            recent.extend(cur.fetchall())
+            if len(recent) >= DASHBOARD_RECENT:
+                break
+    finally:
+        cur.close(); conn.close()
+    return today, recent
+
+def _outdated() -> bool:
+    return summary.stale or summary.day != datetime.now().date()
+
+def recount(force: bool = True) -> None:
+    """Rebuild every counter from the database; writes seen meanwhile are re-applied after."""
+    with _recount_lock:
+        if not force and not _outdated():
+            return   # another request recounted while this one waited
+        with summary.lock:
+            summary.touched = set()
+        try:
+            day = datetime.now().date()
+            items = {k: _load_items(k) for k in KINDS}
+            today, recent = _load_transactions(day)
+        except Exception:
+            with summary.lock:
+                summary.touched = None
+            raise
+        with summary.lock:
+            summary.items = {k: {} for k in KINDS}
+            summary.counts = {k: dict.fromkeys(STATUSES, 0) for k in KINDS}
+            summary.stock = dict.fromkeys(KINDS, 0)
+            for kind, rows in items.items():
+                for rid, qty, low in rows:
+                    summary.set_item(kind, int(rid), qty, low, True)
+            summary.day = day
+            summary.today = {}
+            summary.volume = {t: [0, 0.0] for t in TX_TYPES}
+            for tx_id, tx_type, qty in today:
+                if tx_type in summary.volume:
+                    summary.today[int(tx_id)] = (tx_type, float(qty or 0))
+                    v = summary.volume[tx_type]
+                    v[0] += 1; v[1] += float(qty or 0)
+            summary.recent = recent
+            summary.stale = False
+            summary.reconciled_at = datetime.now(timezone.utc)
+            summary.body = None
+            touched, summary.touched = summary.touched, None
+        for scope, key in touched:
+            if scope == "transactions":
+                _refresh_tx(key)
+            elif scope in KINDS:
+                _refresh_item(scope, key)
+
+def _reconcile_loop() -> None:
+    while True:
+        time.sleep(DASHBOARD_RECONCILE_SECONDS)
+        try:
+            recount()
+        except Exception as e:
+            print("[dashboard] reconcile failed:", getattr(e, "detail", e))
+
+def warm_up() -> None:
+    """Count once and start the periodic reconciliation (idempotent)."""
+    global _reconciler
+    recount()
+    if _reconciler is None and DASHBOARD_RECONCILE_SECONDS > 0:
+        _reconciler = threading.Thread(target=_reconcile_loop, name="dashboard", daemon=True)
+        _reconciler.start()
+
+# ================= ROUTES =================
+def _build_body() -> bytes:
+    items = {k: {"total": len(summary.items[k]), **summary.counts[k], "stock": summary.stock[k]} for k in KINDS}
+    today = {"date": summary.day.isoformat() if summary.day else None,
+             **{t: {"count": n, "qty": round(q, 6)} for t, (n, q) in summary.volume.items()}}
+    head = json.dumps({
+        "reconciledAt": summary.reconciled_at.isoformat() if summary.reconciled_at else None,
+        "items": items,
+        "today": today,
+    }, separators=(",", ":"))
+    return head[:-1].encode() + b',"recent":' + encode_rows(transaction.encode_tx_row, summary.recent) + b"}"
+
+@router.get("/api/dashboard/summary", dependencies=[require_perm("inventory:read"), require_perm("transactions:read")])
+def dashboard_summary():
+    if _outdated():
+        recount(force=False)
+    with summary.lock:
+        body = summary.body
+        if body is None:
+            body = summary.body = _build_body()
+    return json_bytes_response(body)
+
+def stats() -> Dict[str, Any]:
+    return {
+        "reconcile_seconds": DASHBOARD_RECONCILE_SECONDS,
+        "reconciled_at": summary.reconciled_at.isoformat() if summary.reconciled_at else None,
+        "stale": summary.stale,
+        "events": summary.events,
+        "tracked_items": sum(len(v) for v in summary.items.values()),
+        "tracked_today": len(summary.today),
+    }
@@ -0,0 +1,208 @@
+# db.py — Shared MySQL connection pools for inventory.py, transaction.py, user.py
+# Writes (and anything not marked read_only) go to the primary. GET handlers ask for
+# read_only connections, which rotate over healthy replicas unless the calling session
+# wrote recently (read-your-writes pin) or every replica is lagging/unreachable.
+# With DB_BACKEND=sqlite every connection comes from sqlite_backend instead (no replicas).
+import time
+import threading
+import itertools
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit, unquote
+
+from fastapi import HTTPException
+import mysql.connector
+from mysql.connector import errors as mysql_errors
+from mysql.connector import pooling
+
+import sqlite_backend
+
+from config import (
+    DB_BACKEND, DB_HOST, DB_PORT, DB_USER, DB_PASS, DB_NAME, DB_POOL_SIZE,
+    DB_REPLICA_DSNS, REPLICA_MAX_LAG_SECONDS, REPLICA_CHECK_SECONDS, READ_YOUR_WRITES_SECONDS,
+)
+
+class DBUnavailable(HTTPException):
+    """get_conn() could not reach MySQL: nothing was sent, so the work can be retried or deferred."""
+    def __init__(self, detail: str):
+        super().__init__(status_code=500, detail=detail)
+
+_pool: Optional[pooling.MySQLConnectionPool] = None
+_pool_lock = threading.Lock()
+
+def _connect_args() -> dict:
+    return dict(host=DB_HOST, port=DB_PORT, user=DB_USER, password=DB_PASS, database=DB_NAME)
+
+def open_pool() -> pooling.MySQLConnectionPool:
+    """Create the primary pool (idempotent). Called by the warm-up phase; raises on DB errors."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pooling.MySQLConnectionPool(
+                    pool_name="foodco", pool_size=DB_POOL_SIZE, pool_reset_session=True, **_connect_args()
+                )
+    return _pool
+
+def _checkout(pool_factory, args: dict):
+    # When every pooled connection is checked out, use a one-off connection instead of failing
+    try:
+        return pool_factory().get_connection()
+    except mysql_errors.PoolError:
+        return mysql.connector.connect(**args)
+
+# ================= REPLICAS =================
+class Replica:
+    def __init__(self, index: int, dsn: str):
+        u = urlsplit(dsn if "://" in dsn else f"mysql://{dsn}")
+        self.name = f"{u.hostname}:{u.port or 3306}"
+        self.args = dict(
+            host=u.hostname, port=u.port or 3306,
+            user=unquote(u.username) if u.username else DB_USER,
+            password=unquote(u.password) if u.password else DB_PASS,
+            database=u.path.lstrip("/") or DB_NAME,
+        )
+        self.pool_name = f"foodco-replica-{index}"
+        self.pool: Optional[pooling.MySQLConnectionPool] = None
+        self.lock = threading.Lock()
+        self.healthy = False          # joins the rotation after its first successful lag check
+        self.lag: Optional[float] = None
+        self.error: Optional[str] = None
+        self.checked_at: Optional[float] = None
+
+    def get_pool(self) -> pooling.MySQLConnectionPool:
+        if self.pool is None:
+            with self.lock:
+                if self.pool is None:
+                    self.pool = pooling.MySQLConnectionPool(
+                        pool_name=self.pool_name, pool_size=DB_POOL_SIZE, pool_reset_session=True, **self.args
+                    )
+        return self.pool
+
+    def report(self) -> Dict[str, Any]:
+        return {"name": self.name, "healthy": self.healthy, "lag_seconds": self.lag, "error": self.error,
+                "checked_at": self.checked_at}
+
+REPLICAS: List[Replica] = [] if DB_BACKEND == "sqlite" else [Replica(i, dsn) for i, dsn in enumerate(DB_REPLICA_DSNS)]
+_rr = itertools.count()
+_checker: Optional[threading.Thread] = None
+
+# Session identity for read-your-writes (set per request by the middleware in main.py)
+current_session: ContextVar[Optional[str]] = ContextVar("db_session", default=None)
+_last_write: Dict[str, float] = {}
+_stats = {"primary_reads": 0, "replica_reads": 0, "pinned_reads": 0, "replica_fallbacks": 0}
+
+def mark_write(session: Optional[str]) -> None:
+    if not session or not REPLICAS:
+        return
+    now = time.monotonic()
+    _last_write[session] = now
+    if len(_last_write) > 10000:
+        for k, t in list(_last_write.items()):
+            if now - t > READ_YOUR_WRITES_SECONDS:
+                _last_write.pop(k, None)
+
+def _pinned(session: Optional[str]) -> bool:
+    t = _last_write.get(session) if session else None
+    return t is not None and time.monotonic() - t < READ_YOUR_WRITES_SECONDS
+
+def session_pinned() -> bool:
+    """True while the current request's session reads from the primary (it wrote recently)."""
+    return _pinned(current_session.get())
+
+def _pick_replica() -> Optional[Replica]:
+    healthy = [r for r in REPLICAS if r.healthy]
+    if not healthy:
+        return None
+    return healthy[next(_rr) % len(healthy)]
+
+def get_conn(autocommit: bool = True, read_only: bool = False):
+    """Pooled connection (close() returns it to its pool); read_only may be served by a replica."""
+    try:
+        if DB_BACKEND == "sqlite":
+            return sqlite_backend.connect(autocommit)
+        if read_only and REPLICAS:
+            if _pinned(current_session.get()):
+                _stats["pinned_reads"] += 1
+            else:
+                rep = _pick_replica()
+                if rep is not None:
+                    try:
+                        conn = _checkout(rep.get_pool, rep.args)
+                        conn.autocommit = autocommit
+                        _stats["replica_reads"] += 1
+                        return conn
+                    except mysql_errors.Error as e:
+                        rep.healthy = False
+                        rep.error = str(e)
+                        _stats["replica_fallbacks"] += 1
+        if read_only:
+            _stats["primary_reads"] += 1
+        conn = _checkout(open_pool, _connect_args())
+        conn.autocommit = autocommit
+        return conn
+    except mysql_errors.Error as e:
+        raise DBUnavailable(f"DB connection error: {e.msg}")
+
+def check_replica(rep: Replica) -> None:
+    """Measure replication lag; a stopped or lagging replica leaves the rotation."""
+    rep.checked_at = time.time()
+    try:
+        conn = _checkout(rep.get_pool, rep.args)
+        try:
+            cur = conn.cursor(dictionary=True)
+            try:
+                cur.execute("SHOW REPLICA STATUS")
+            except mysql_errors.Error:
+                cur.execute("SHOW SLAVE STATUS")  # MySQL < 8.0.22
+            row = cur.fetchone()
+            cur.fetchall()
+            cur.close()
+        finally:
+            conn.close()
+        if not row:
+            raise RuntimeError("not configured as a replica")
+        lag = row.get("Seconds_Behind_Source", row.get("Seconds_Behind_Master"))
+        if lag is None:
+            raise RuntimeError("replication is not running")
+        rep.lag = float(lag)
+        rep.error = None if rep.lag <= REPLICA_MAX_LAG_SECONDS else f"lag {rep.lag}s > {REPLICA_MAX_LAG_SECONDS}s"
+        rep.healthy = rep.lag <= REPLICA_MAX_LAG_SECONDS
+    except Exception as e:
+        rep.healthy = False
+        rep.error = str(e)
+
+def _check_loop() -> None:
+    while True:
+        for rep in REPLICAS:
+            check_replica(rep)
+        time.sleep(REPLICA_CHECK_SECONDS)
+
+def start_replica_checks() -> None:
+    """First lag check synchronously (warm-up), then keep checking in the background."""
+    global _checker
+    if not REPLICAS or _checker is not None:
+        return
+    for rep in REPLICAS:
+        check_replica(rep)
+    _checker = threading.Thread(target=_check_loop, name="replica-lag", daemon=True)
+    _checker.start()
+
+def replica_report() -> Dict[str, Any]:
+    return {
+        "replicas": [r.report() for r in REPLICAS],
+        "max_lag_seconds": REPLICA_MAX_LAG_SECONDS,
+        "read_your_writes_seconds": READ_YOUR_WRITES_SECONDS,
+        "pinned_sessions": sum(1 for k in list(_last_write) if _pinned(k)),
+        **_stats,
+    }
+
+def ping() -> None:
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT 1")
+        cur.fetchall()
+        cur.close()
+    finally:
+        conn.close()
@@ -0,0 +1,102 @@
+# etag.py — Optimistic concurrency for the item and transaction endpoints
+# GET by id sends an ETag; PUT/DELETE with If-Match only succeed while the row still carries it:
+#   "v<RowVersion>"   when the table has a RowVersion column (migrations.py version 7).
+#                     Every UPDATE through the API bumps it.
+#   "t<TimeUpdate>"   fallback for tables without it (second resolution)
+# The check is part of the write itself (UPDATE/DELETE ... WHERE id=%s AND RowVersion=%s); no
+# locks and no extra read on success. Only a write that matched nothing reads the row, to tell
+# 404 (gone) from 412 (changed since the client's GET).
+
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from config import REQUIRE_IF_MATCH
+from repository import repo
+
+VERSION_CANDIDATES = ["RowVersion", "row_version", "rowversion"]
+
+# (kind, value): ("v", 3) or ("t", datetime)
+Token = Tuple[str, Any]
+
+def find_version_column(cur, table: str) -> str:
+    """Name of the RowVersion column of `table`, "" when it has none (optional column)."""
+    cols = {c.lower(): c for c in repo.column_names(cur, table)}
+    for cand in VERSION_CANDIDATES:
+        if cand.lower() in cols:
+            return cols[cand.lower()]
+    return ""
+
+def version_sql(c) -> str:
+    """SELECT expression for the version (NULL without the column)."""
+    return f"`{c['version']}`" if c.get("version") else "NULL"
+
+def bump(c) -> List[str]:
+    """SET fragment every UPDATE through the API adds."""
+    return [f"`{c['version']}`=`{c['version']}`+1"] if c.get("version") else []
+
+def make(version: Any, updated: Any) -> str:
+    if version is not None:
+        return f'"v{int(version)}"'
+    if isinstance(updated, datetime):
+        updated = updated.replace(tzinfo=None).isoformat()
+    return f'"t{updated}"'
+
+def parse_if_match(header: Optional[str]) -> Optional[Token]:
+    """None = no precondition (header absent or "*"). Unknown or weak tags can never match → 412."""
+    if header is None:
+        if REQUIRE_IF_MATCH:
+            raise HTTPException(status_code=428, detail="If-Match header required")
+        return None
+    value = header.strip()
+    if value == "*":
+        return None
+    if len(value) > 3 and value[0] == value[-1] == '"':
+        kind, raw = value[1], value[2:-1]
+        try:
+            if kind == "v":
+                return ("v", int(raw))
+            if kind == "t":
+                return ("t", datetime.fromisoformat(raw))
+        except ValueError:
+            pass
+    raise precondition_failed()
+
+def where(c, token: Optional[Token]) -> Tuple[str, List[Any]]:
+    """Extra WHERE condition (and its params) for a conditional UPDATE/DELETE."""
+    if token is None:
+        return "", []
+    kind, value = token
+    if kind == "v":
+        if not c.get("version"):
+            raise precondition_failed()
+        return f" AND `{c['version']}`=%s", [value]
+    return f" AND `{c['time']}`=%s", [value]
+
+def next_etag(c, token: Optional[Token]) -> Optional[str]:
+    """ETag after a successful conditional UPDATE, when it is known without reading the row."""
+    if token is not None and token[0] == "v" and c.get("version"):
+        return make(token[1] + 1, None)
+    return None
+
+def matches(token: Token, version: Any, updated: Any) -> bool:
+    """Whether a row read back after a 0-row write still satisfies `token` (the write was a no-op)."""
+    kind, value = token
+    if kind == "v":
+        return version is not None and int(version) == value
+    return make(None, updated) == make(None, value)
+
+def precondition_failed() -> HTTPException:
+    return HTTPException(status_code=412, detail="Resource was modified since it was read (ETag mismatch)")
+
+def check_miss(cur, tables: List[str], c, row_id: int, token: Token, not_found: str) -> None:
+    """A conditional write matched no row: 404 if it is gone, 412 if it changed, return if it was a no-op."""
+    for t in tables:
+        cur.execute(f"SELECT {version_sql(c)}, `{c['time']}` FROM `{t}` WHERE `{c['id']}`=%s", (row_id,))
+        row = cur.fetchone()
+        if row:
+            if matches(token, row[0], row[1]):
+                return   # MySQL counts an UPDATE that changes nothing as 0 affected rows
+            raise precondition_failed()
+    raise HTTPException(status_code=404, detail=not_found)
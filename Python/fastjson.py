@@ -0,0 +1,132 @@
+# fastjson.py — Precompiled row encoders: DB tuples → JSON bytes without per-row Pydantic models
+# Output is byte-for-byte what FastAPI produces for the equivalent response_model
+# (JSONResponse: ensure_ascii=False, separators=(",", ":"), Pydantic json-mode values).
+# Disable with FAST_JSON=0 to fall back to the response_model path.
+
+from datetime import datetime, date, timedelta
+from json.encoder import encode_basestring  # C-accelerated, same escaping as json.dumps(ensure_ascii=False)
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response
+
+from config import FAST_JSON
+
+# Field kinds understood by compile_row_encoder (every kind is nullable → null)
+#   int | float | str | bool | datetime | date | raw (value already JSON text)
+FieldSpec = Tuple[str, str]
+
+_ZERO = timedelta(0)
+
+def _enc_datetime(v: datetime) -> str:
+    # Pydantic renders UTC offsets as "Z", otherwise plain isoformat()
+    if v.tzinfo is not None and v.utcoffset() == _ZERO:
+        return '"' + v.replace(tzinfo=None).isoformat() + 'Z"'
+    return '"' + v.isoformat() + '"'
+
+def _enc_date(v: date) -> str:
+    # a DATETIME driver value in a date field: Pydantic keeps only the (midnight) date part
+    if isinstance(v, datetime):
+        v = v.date()
+    return '"' + v.isoformat() + '"'
+
+def _enc_str(v: Any) -> str:
+    return encode_basestring(v if isinstance(v, str) else str(v))
+
+# DECIMAL columns repeat the same few values (quantities), so float text is memoised;
+# Decimal('5.00') == Decimal('5') == 5.0 share one entry, which is correct since all render "5.0".
+_FLOAT_TEXT: dict = {}
+_FLOAT_TEXT_MAX = 8192
+
+def _enc_float(v: Any) -> str:
+    out = float(v).__repr__()
+    if not v:
+        return out  # 0 == -0 but they render differently
+    if len(_FLOAT_TEXT) >= _FLOAT_TEXT_MAX:
+        _FLOAT_TEXT.clear()
+    _FLOAT_TEXT[v] = out
+    return out
+
+_EXPR = {
+    "int":      "str({v}) if {v}.__class__ is int else str(int({v}))",
+    "float":    "float_text.get({v}) or enc_float({v})",
+    "str":      "encode_basestring({v}) if {v}.__class__ is str else enc_str({v})",
+    "bool":     "'true' if {v} else 'false'",
+    "datetime": "('\"' + {v}.isoformat() + '\"') if {v}.__class__ is datetime and {v}.tzinfo is None "
+                "else enc_datetime({v}) if isinstance({v}, datetime) else enc_str({v})",
+    "date":     "('\"' + {v}.isoformat() + '\"') if {v}.__class__ is date "
+                "else enc_date({v}) if isinstance({v}, date) else enc_str({v})",
+    "raw":      "{v}",
+}
+
+_NAMESPACE = {
+    "float_text": _FLOAT_TEXT,
+    "enc_float": _enc_float,
+    "encode_basestring": encode_basestring,
+    "enc_str": _enc_str,
+    "enc_datetime": _enc_datetime,
+    "enc_date": _enc_date,
+    "datetime": datetime,
+    "date": date,
+}
+
+def compile_row_encoder(fields: Sequence[FieldSpec], name: str = "encode_row") -> Callable[[Sequence[Any]], str]:
+    """
+    Build a function row_tuple -> JSON object text for the given (key, kind) list.
+    Keys are baked into one %-template at compile time, so per row only the value
+    conversions and a single string format run.
+    """
+    if not fields:
+        return lambda row: "{}"
+    args = [f"v{i}" for i in range(len(fields))]
+    template = []
+    exprs = []
+    for i, (key, kind) in enumerate(fields):
+        if kind not in _EXPR:
+            raise ValueError(f"Unknown field kind '{kind}' for '{key}'")
+        template.append(("{" if i == 0 else ",") + encode_basestring(key).replace("%", "%%") + ":%s")
+        exprs.append(f"'null' if {args[i]} is None else {_EXPR[kind].format(v=args[i])}")
+    src = (
+        f"def {name}(row):\n"
+        f"    {', '.join(args)}{',' if len(args) == 1 else ''} = row\n"
+        f"    return TEMPLATE % ({', '.join('(' + e + ')' for e in exprs)},)\n"
+    )
+    ns = dict(_NAMESPACE, TEMPLATE="".join(template) + "}")
+    exec(compile(src, f"<fastjson:{name}>", "exec"), ns)
+    return ns[name]
+
+def encode_rows(encoder: Callable[[Sequence[Any]], str], rows: Iterable[Sequence[Any]]) -> bytes:
+    return ("[" + ",".join(map(encoder, rows)) + "]").encode("utf-8")
+
+def json_bytes_response(body: bytes, status_code: int = 200) -> Response:
+    return Response(content=body, status_code=status_code, media_type="application/json")
+
+# ================= SPARSE FIELDSETS (?fields=a,b) =================
+Projection = Tuple[Tuple[int, ...], Callable[[Sequence[Any]], Tuple], Callable[[Sequence[Any]], str]]
+_projections: Dict[Tuple[str, Tuple[int, ...]], Projection] = {}
+
+def parse_fields(raw: Optional[str], fields: Sequence[FieldSpec]) -> Optional[Tuple[int, ...]]:
+    """'name,id' → positions in `fields` (declared order, so JSON key order is stable); None = all."""
+    if raw is None or not raw.strip():
+        return None
+    pos = {key: i for i, (key, _) in enumerate(fields)}
+    wanted = set()
+    for name in raw.split(","):
+        name = name.strip()
+        if not name:
+            continue
+        if name not in pos:
+            raise HTTPException(status_code=400, detail=f"Unknown field '{name}'. Allowed: {', '.join(pos)}")
+        wanted.add(pos[name])
+    if not wanted or len(wanted) == len(fields):
+        return None
+    return tuple(sorted(wanted))
+
+def projection(fields: Sequence[FieldSpec], idx: Tuple[int, ...], name: str) -> Projection:
+    """(idx, pick(row) → sub-tuple, encoder) for a parsed ?fields=; compiled once per subset."""
+    key = (name, idx)
+    p = _projections.get(key)
+    if p is None:
+        pick = itemgetter(*idx) if len(idx) > 1 else (lambda row, i=idx[0]: (row[i],))
+        p = _projections[key] = (idx, pick, compile_row_encoder([fields[i] for i in idx], name=f"{name}_fields"))
+    return p
@@ -0,0 +1,135 @@
+# idempotency.py — Idempotency-Key support for the create/post endpoints
+# The first request carrying a key runs the handler; its 2xx response is kept (bounded,
+# expiring, per process) together with a fingerprint of the payload. A replay of the same
+# key + payload gets the stored response back without touching the DB. A replay that is
+# still running elsewhere is waited for; the same key with a different payload is a 422.
+# Keys are per principal (the token subject): another user's key never returns this one's response.
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from config import IDEMPOTENCY_MAX_KEYS, IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_WAIT_SECONDS
+
+MAX_KEY_LENGTH = 255
+REPLAY_HEADER = "Idempotent-Replayed"
+
+class _Entry:
+    __slots__ = ("fingerprint", "status_code", "body", "expires", "done")
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.status_code = 0
+        self.body: Optional[bytes] = None       # None while the first request is still running
+        self.expires = 0.0
+        self.done = threading.Event()
+
+def fingerprint(payload: Any) -> str:
+    raw = payload.model_dump_json() if isinstance(payload, BaseModel) else repr(payload)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _render(result: Any, status_code: int) -> Tuple[int, bytes]:
+    if isinstance(result, Response):
+        return result.status_code, bytes(result.body)
+    # same bytes FastAPI would have sent for the first response
+    return status_code, JSONResponse(jsonable_encoder(result)).body
+
+class IdempotencyStore:
+    """Bounded (oldest first out) store of completed responses, keyed by (scope, principal, key)."""
+
+    def __init__(self, max_keys: int = IDEMPOTENCY_MAX_KEYS, ttl_seconds: float = IDEMPOTENCY_TTL_SECONDS):
+        self.max_keys = max_keys
+        self.ttl = ttl_seconds
+        self.entries: "OrderedDict[Tuple[str, Optional[str], str], _Entry]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats: Dict[str, int] = {"executed": 0, "replayed": 0, "waited": 0, "conflicts": 0,
+                                      "mismatches": 0, "evicted": 0, "expired": 0}
+
+    def _purge(self, now: float) -> None:
+        # TTL is the same for every key, so insertion order is also expiry order
+        while self.entries:
+            k, e = next(iter(self.entries.items()))
+            if e.body is None or e.expires > now:
+                break
+            del self.entries[k]
+            self.stats["expired"] += 1
+        # in-flight entries stay: evicting one would let its retry run the handler a second time
+        over = len(self.entries) - self.max_keys
+        if over > 0:
+            for k in [k for k, e in self.entries.items() if e.body is not None][:over]:
+                del self.entries[k]
+                self.stats["evicted"] += 1
+
+    def _claim(self, k: Tuple[str, Optional[str], str], fp: str) -> Tuple[_Entry, bool]:
+        with self.lock:
+            self._purge(time.monotonic())
+            e = self.entries.get(k)
+            if e is None:
+                e = self.entries[k] = _Entry(fp)
+                return e, True
+            return e, False
+
+    def run(self, scope: str, key: Optional[str], payload: Any, handler: Callable[[], Any],
+            status_code: int = 200, principal: Optional[str] = None) -> Any:
+        """Run `handler` once per (scope, principal, key); without a key it just runs."""
+        if not key:
+            return handler()
+        key = key.strip()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+        k = (scope, principal, key)
+        fp = fingerprint(payload)
+
+        while True:
+            e, owner = self._claim(k, fp)
+            if owner:
+                break
+            if e.fingerprint != fp:
+                self.stats["mismatches"] += 1
+                raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different payload")
+            if e.body is None:
+                self.stats["waited"] += 1
+                if not e.done.wait(IDEMPOTENCY_WAIT_SECONDS):
+                    self.stats["conflicts"] += 1
+                    raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+                if e.body is None:
+                    continue  # the first attempt failed and released the key; try it ourselves
+            self.stats["replayed"] += 1
+            return Response(content=e.body, status_code=e.status_code, media_type="application/json",
+                            headers={REPLAY_HEADER: "true"})
+
+        try:
+            result = handler()
+        except BaseException:
+            # errors are not remembered: the client may retry with the same key
+            with self.lock:
+                if self.entries.get(k) is e:
+                    del self.entries[k]
+            e.done.set()
+            raise
+        e.status_code, e.body = _render(result, status_code)
+        e.expires = time.monotonic() + self.ttl
+        e.done.set()
+        self.stats["executed"] += 1
+        return result
+
+    def report(self) -> Dict[str, Any]:
+        with self.lock:
+            self._purge(time.monotonic())
+            return {"keys": len(self.entries), "max_keys": self.max_keys, "ttl_seconds": self.ttl, **self.stats}
+
+store = IdempotencyStore()
+
+def run(scope: str, key: Optional[str], payload: Any, handler: Callable[[], Any], status_code: int = 200,
+        principal: Optional[str] = None) -> Any:
+    return store.run(scope, key, payload, handler, status_code, principal)
+
+def stats() -> Dict[str, Any]:
+    return store.report()
@@ -1,45 +1,31 @@
 # inventory.py — FastAPI CRUD + Auto-resolve table/column names (Raw/Finished)
 # Supports tables: RawMaterials | raw_materials  and  FinishedGoods | finished_products
-# Run: uvicorn inventory:app --reload --port 8001
+# Routes are mounted by main.create_app(); run: uvicorn main:app --reload --port 8001
 
-import os
+import time
+import threading
 from datetime import datetime, timezone
+from json.encoder import encode_basestring
 from typing import List, Optional, Literal, Any, Dict, Tuple
 
-from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, status, Query
-from fastapi.middleware.cors import CORSMiddleware
+from fastapi import APIRouter, Header, HTTPException, Request, Response, status, Query
 from pydantic import BaseModel, Field
-import mysql.connector
 from mysql.connector import errors as mysql_errors
 
-# ================= ENV / DB =================
-load_dotenv()
-DB_HOST = os.getenv("MYSQL_HOST", "127.0.0.1")
-DB_PORT = int(os.getenv("MYSQL_PORT", "3306"))
-DB_USER = os.getenv("MYSQL_USER", "root")
-DB_PASS = os.getenv("MYSQL_PASSWORD", "")
-DB_NAME = os.getenv("MYSQL_DB", "FoodCo_Management")
-
-def get_conn():
-    try:
-        conn = mysql.connector.connect(
-            host=DB_HOST, port=DB_PORT, user=DB_USER, password=DB_PASS, database=DB_NAME
-        )
-        conn.autocommit = True
-        return conn
-    except mysql_errors.Error as e:
-        raise HTTPException(status_code=500, detail=f"DB connection error: {e.msg}")
-
-# ================= APP =================
-app = FastAPI(title="Inventory API", version="1.1 (auto-resolve table/cols)")
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:5500", "http://127.0.0.1:5500", "http://localhost:5501", "http://127.0.0.1:5501","http://localhost:5503", "http://127.0.0.1:5503","http://localhost:5502", "http://127.0.0.1:5502",   "http://localhost", "http://127.0.0.1"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+import batch
+import cache_bus
+import etag
+import sync_log
+from auth import require_perm
+from compression import cached
+import idempotency
+from config import DB_NAME, INVENTORY_READ_MODEL, INVENTORY_READ_MODEL_RECONCILE_SECONDS
+from db import get_conn
+from repository import repo
+from fastjson import FAST_JSON, compile_row_encoder, encode_rows, json_bytes_response, parse_fields, projection
+from inventory_store import InventoryStore
+
+router = APIRouter()
 
 # ================= MODELS =================
 class RawMatCreate(BaseModel):
@@ -80,15 +66,7 @@ def resolve_table_name(cur, candidates: List[str]) -> str:
     """
     Return the first existing table name in DB among candidates (case-insensitive).
     """
-    cur.execute(
-        """
-        SELECT table_name
-        FROM information_schema.tables
-        WHERE table_schema=%s
-        """,
-        (DB_NAME,),
-    )
-    existing = {r[0].lower(): r[0] for r in cur.fetchall()}
+    existing = {t.lower(): t for t in repo.table_names(cur)}
     for cand in candidates:
         if cand.lower() in existing:
             return existing[cand.lower()]
@@ -99,15 +77,7 @@ def resolve_column_names(cur, table: str, wanted: Dict[str, List[str]]) -> Dict[
     For given table, map logical keys -> actual column names.
     wanted = { logical: [candidate1, candidate2, ...] }
     """
-    cur.execute(
-        """
-        SELECT column_name
-        FROM information_schema.columns
-        WHERE table_schema=%s AND table_name=%s
-        """,
-        (DB_NAME, table),
-    )
-    cols = {r[0].lower(): r[0] for r in cur.fetchall()}
+    cols = {c.lower(): c for c in repo.column_names(cur, table)}
     out = {}
     for key, cands in wanted.items():
         found = None
@@ -128,21 +98,237 @@ def compute_status(qty: int, low: Optional[int]) -> str:
     return "OK"
 
 # ================= HEALTH =================
-@app.get("/api/health")
+@router.get("/api/health")
 def health():
     return {"ok": True, "db": DB_NAME, "time": datetime.now(timezone.utc).isoformat()}
 
+# ================= READ MODEL (optional, in-memory) =================
+# INVENTORY_READ_MODEL=1 → serve /api/inventory, /api/raw-materials, /api/finished-goods
+# (list + by id) from a column store loaded at startup, kept current by the write
+# handlers here and in transaction.py, and fully reconciled every N seconds.
+READ_MODEL_ENABLED = INVENTORY_READ_MODEL
+READ_MODEL_RECONCILE_SECONDS = INVENTORY_READ_MODEL_RECONCILE_SECONDS
+
+read_model = InventoryStore()
+_read_model_lock = threading.Lock()
+_reconciler: Optional[threading.Thread] = None
+
+def _item_select(kind: Literal["Raw","Finished"]) -> Tuple[str, str]:
+    # (id, name, quantity, unit, lowStock, updatedAt) — the inventory_store.Row shape, + RowVersion
+    if kind == "Raw":
+        table, c = get_raw_table_and_cols()
+        unit = f"`{c['unit']}`"
+    else:
+        table, c = get_finished_table_and_cols()
+        unit = "NULL"
+    return f"""SELECT `{c['id']}`, `{c['name']}`, `{c['quantity']}`, {unit}, `{c['low']}`, `{c['time']}`,
+                     {etag.version_sql(c)}
+              FROM `{table}`""", c['id']
+
+def load_read_model() -> None:
+    raw_q, _ = _item_select("Raw")
+    fin_q, _ = _item_select("Finished")
+    read_model.begin_load()
+    conn = get_conn(); cur = conn.cursor()
+    try:
+        cur.execute(raw_q); raw_rows = cur.fetchall()
+        cur.execute(fin_q); fin_rows = cur.fetchall()
+    finally:
+        cur.close(); conn.close()
+    touched = read_model.replace(raw_rows, fin_rows)
+    for kind, rid in touched:
+        refresh_read_model_item(kind, rid)
+
+def _reconcile_loop() -> None:
+    while True:
+        time.sleep(READ_MODEL_RECONCILE_SECONDS)
+        try:
+            load_read_model()
+        except Exception as e:
+            print("[read-model] reconcile failed:", e)
+
+def ensure_read_model() -> bool:
+    """True when reads should be served from memory (loads on first use)."""
+    global _reconciler
+    if not READ_MODEL_ENABLED:
+        return False
+    if read_model.loaded:
+        return True
+    with _read_model_lock:
+        if not read_model.loaded:
+            load_read_model()
+        if _reconciler is None and READ_MODEL_RECONCILE_SECONDS > 0:
+            _reconciler = threading.Thread(target=_reconcile_loop, name="inventory-read-model", daemon=True)
+            _reconciler.start()
+    return True
+
+def refresh_read_model_item(kind: Literal["Raw","Finished"], item_id: Optional[int]) -> None:
+    """Re-read one item after a write (no-op unless the read model is live)."""
+    if not READ_MODEL_ENABLED or not read_model.loaded or item_id is None:
+        return
+    q, id_col = _item_select(kind)
+    conn = get_conn(); cur = conn.cursor()
+    try:
+        cur.execute(q + f" WHERE `{id_col}`=%s", (item_id,))
+        row = cur.fetchone()
+    finally:
+        cur.close(); conn.close()
+    if row:
+        read_model.upsert(kind, row)
+    else:
+        read_model.remove(kind, item_id)
+
+# Cache-bus scopes for the two item tables (also published by transaction.py: stock moves)
+ITEM_SCOPES = {"Raw": "raw_materials", "Finished": "finished_goods"}
+
+def publish_item_change(kind: Literal["Raw","Finished"], item_id: Optional[int], op: str = "U") -> None:
+    """Cache-bus event after the commit (its sync_log row was written inside the DB transaction)."""
+    if item_id is not None:
+        cache_bus.publish(ITEM_SCOPES[kind], item_id, op)
+
+def _on_item_change(kind: Literal["Raw","Finished"]):
+    def handler(key: Optional[str]) -> None:
+        if key is None:
+            if READ_MODEL_ENABLED and read_model.loaded:
+                load_read_model()
+        else:
+            refresh_read_model_item(kind, int(key))
+    return handler
+
+cache_bus.subscribe("raw_materials", _on_item_change("Raw"))
+cache_bus.subscribe("finished_goods", _on_item_change("Finished"))
+cache_bus.subscribe("schema", lambda key: clear_schema_cache())
+
+def warm_up() -> None:
+    """Resolve both tables once and, if enabled, load the read model."""
+    get_raw_table_and_cols()
+    get_finished_table_and_cols()
+    ensure_read_model()
+
+@router.get("/api/inventory/read-model", dependencies=[require_perm("inventory:read")])
+def read_model_stats():
+    return {"enabled": READ_MODEL_ENABLED, "reconcile_seconds": READ_MODEL_RECONCILE_SECONDS, **read_model.stats()}
+
+RAW_FIELDS = [
+    ("MaterialID", "int"), ("MaterialName", "str"), ("MaterialQuantity", "int"),
+    ("Lowstock", "int"), ("Unit", "str"), ("TimeUpdate", "datetime"),
+]
+FINISHED_FIELDS = [
+    ("GoodsID", "int"), ("FinishedGoodsName", "str"), ("FinishedGoodsQuantity", "int"),
+    ("Lowstock", "int"), ("TimeUpdate", "datetime"),
+]
+encode_raw_material_row = compile_row_encoder(RAW_FIELDS, name="encode_raw_material_row")
+encode_finished_goods_row = compile_row_encoder(FINISHED_FIELDS, name="encode_finished_goods_row")
+
+def _raw_out(r) -> Tuple:
+    return (r[0], r[1], r[2], r[4], r[3], r[5])
+
+def _finished_out(r) -> Tuple:
+    return (r[0], r[1], r[2], r[4], r[5])
+
+def fetch_items_by_ids(kind: Literal["Raw","Finished"], ids: List[int],
+                       primary: bool = False) -> Tuple[List[Any], List[int]]:
+    """
+    Rows (inventory_store.Row shape) for `ids` in request order + the ids not found.
+    primary=True reads the primary, never a replica (re-reads right after a write).
+    """
+    if ensure_read_model():
+        found = {}
+        for i in ids:
+            r = read_model.get(kind, i)
+            if r is not None:
+                found[i] = r
+    else:
+        q, id_col = _item_select(kind)
+        conn = get_conn(read_only=not primary); cur = conn.cursor()
+        try:
+            cur.execute(q + " WHERE " + batch.in_clause(id_col, len(ids)), tuple(ids))
+            found = batch.index_rows(cur.fetchall())
+        finally:
+            cur.close(); conn.close()
+    return batch.in_request_order(ids, found)
+
+def _batch_response(kind: Literal["Raw","Finished"], ids: str):
+    rows, missing = fetch_items_by_ids(kind, batch.parse_ids(ids))
+    encoder, out, fields = ((encode_raw_material_row, _raw_out, RAW_FIELDS) if kind == "Raw"
+                            else (encode_finished_goods_row, _finished_out, FINISHED_FIELDS))
+    if FAST_JSON:
+        return json_bytes_response(batch.encode_batch(encode_rows(encoder, map(out, rows)), missing))
+    keys = [k for k, _ in fields]
+    return {"data": [dict(zip(keys, out(r))) for r in rows], "missing": missing}
+
+def _projected_item_list(kind: Literal["Raw","Finished"], proj: Tuple[int, ...]):
+    """?fields= on the item lists: only those columns are read (or picked) and encoded."""
+    fields, out, name = ((RAW_FIELDS, _raw_out, "raw_material") if kind == "Raw"
+                         else (FINISHED_FIELDS, _finished_out, "finished_goods"))
+    idx, pick, encoder = projection(fields, proj, name)
+    if ensure_read_model():
+        rows = map(pick, map(out, sorted(read_model.rows(kind), key=lambda r: r[0], reverse=True)))
+    else:
+        if kind == "Raw":
+            table, c = get_raw_table_and_cols()
+            cols = [c['id'], c['name'], c['quantity'], c['low'], c['unit'], c['time']]
+        else:
+            table, c = get_finished_table_and_cols()
+            cols = [c['id'], c['name'], c['quantity'], c['low'], c['time']]
+        q = f"SELECT {', '.join(f'`{cols[i]}`' for i in idx)} FROM `{table}` ORDER BY `{c['id']}` DESC"
+        conn = get_conn(read_only=True); cur = conn.cursor()
+        try:
+            cur.execute(q)
+            rows = cur.fetchall()
+        finally:
+            cur.close(); conn.close()
+    return json_bytes_response(b'{"data":' + encode_rows(encoder, rows) + b'}')
+
+# ================= LOOKUP (dropdowns) =================
+# [[id, name, "Raw"|"Finished"], ...] — just what a <select> needs. Cached as bytes and
+# rebuilt when either item table's cache-bus version moves.
+_lookup_cache: Dict[Optional[str], Tuple[Tuple[int, int], bytes]] = {}
+
+def _lookup_rows(kind: Literal["Raw","Finished"]) -> List[Tuple[int, str]]:
+    if ensure_read_model():
+        return sorted(((r[0], r[1]) for r in read_model.rows(kind)), reverse=True)
+    table, c = get_raw_table_and_cols() if kind == "Raw" else get_finished_table_and_cols()
+    conn = get_conn(read_only=True); cur = conn.cursor()
+    try:
+        cur.execute(f"SELECT `{c['id']}`, `{c['name']}` FROM `{table}` ORDER BY `{c['id']}` DESC")
+        return cur.fetchall()
+    finally:
+        cur.close(); conn.close()
+
+@router.get("/api/lookup/items", dependencies=[require_perm("inventory:read")])
+def lookup_items(type: Optional[Literal["Raw","Finished"]] = Query(None)):
+    ver = (cache_bus.version(ITEM_SCOPES["Raw"]), cache_bus.version(ITEM_SCOPES["Finished"]))
+    cached = _lookup_cache.get(type)
+    if cached and cached[0] == ver:
+        return json_bytes_response(cached[1])
+    parts = []
+    for kind in ([type] if type else ["Raw", "Finished"]):
+        tag = f',"{kind}"]'
+        parts.extend(f"[{int(rid)},{encode_basestring(name) if name is not None else 'null'}{tag}"
+                     for rid, name in _lookup_rows(kind))
+    body = ("[" + ",".join(parts) + "]").encode("utf-8")
+    _lookup_cache[type] = (ver, body)
+    return json_bytes_response(body)
+
 # ================= RAW MATERIALS CRUD =================
+# Resolved (table, columns) per logical table — resolved once (warm-up) instead of per request
+_schema_cache: Dict[str, Tuple[str, Dict[str, str]]] = {}
+
+def clear_schema_cache() -> None:
+    _schema_cache.clear()
+
 def get_raw_table_and_cols() -> Tuple[str, Dict[str,str]]:
+    cached = _schema_cache.get("raw")
+    if cached:
+        return cached
     conn = get_conn()
     cur = conn.cursor()
     table = resolve_table_name(cur, ["RawMaterials", "raw_materials"])
-    cur.close(); conn.close()
     if not table:
+        cur.close(); conn.close()
         raise HTTPException(status_code=500, detail="Table RawMaterials/raw_materials not found in DB")
 
-    conn = get_conn()
-    cur = conn.cursor()
     cols = resolve_column_names(cur, table, {
         # aterialsId/MaterialsName/Quantity/LowStock
         "id":       ["MaterialID", "material_id", "id",
@@ -156,57 +342,113 @@ def get_raw_table_and_cols() -> Tuple[str, Dict[str,str]]:
         "unit":     ["Unit", "unit"],
         "time":     ["TimeUpdate", "time_update", "updated_at", "update_time", "timestamp"],
     })
+    cols["version"] = etag.find_version_column(cur, table)
     cur.close(); conn.close()
+    _schema_cache["raw"] = (table, cols)
     return table, cols
 
 
-@app.get("/api/raw-materials")
-def list_raw_materials():
+def _conditional_write(kind: Literal["Raw","Finished"], head_sql: str, vals: List[Any], item_id: int,
+                       token: Optional[etag.Token], not_found: str, op: str) -> None:
+    """`head_sql` WHERE id=%s [AND version/time = If-Match] and its sync_log row in one DB
+    transaction: 404 / 412 when no row matched."""
+    table, c = get_raw_table_and_cols() if kind == "Raw" else get_finished_table_and_cols()
+    cond, params = etag.where(c, token)
+    conn = get_conn(autocommit=False); cur = conn.cursor()
+    try:
+        cur.execute(f"{head_sql} WHERE `{c['id']}`=%s{cond}", (*vals, item_id, *params))
+        if cur.rowcount == 0:
+            if token is None:
+                raise HTTPException(status_code=404, detail=not_found)
+            etag.check_miss(cur, [table], c, item_id, token, not_found)
+        sync_log.record(cur, [(ITEM_SCOPES[kind], item_id, op)])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close(); conn.close()
+
+@router.get("/api/raw-materials", dependencies=[require_perm("inventory:read")])
+def list_raw_materials(request: Request, fields: Optional[str] = Query(None, description="Comma-separated subset, e.g. MaterialID,MaterialName")):
+    return cached(request, (ITEM_SCOPES["Raw"],), lambda: _list_raw_materials(fields))
+
+def _list_raw_materials(fields: Optional[str]):
+    proj = parse_fields(fields, RAW_FIELDS)
+    if proj:
+        return _projected_item_list("Raw", proj)
+    if ensure_read_model():
+        rows = sorted(read_model.rows("Raw"), key=lambda r: r[0], reverse=True)
+        return json_bytes_response(b'{"data":' + encode_rows(encode_raw_material_row, map(_raw_out, rows)) + b'}')
     table, c = get_raw_table_and_cols()
     q = f"""SELECT `{c['id']}` AS MaterialID, `{c['name']}` AS MaterialName,
                    `{c['quantity']}` AS MaterialQuantity, `{c['low']}` AS Lowstock,
                    `{c['unit']}` AS Unit, `{c['time']}` AS TimeUpdate
             FROM `{table}` ORDER BY `{c['id']}` DESC"""
-    conn = get_conn()
+    conn = get_conn(read_only=True)
     cur = conn.cursor(dictionary=True)
     cur.execute(q)
     rows = cur.fetchall()
     cur.close(); conn.close()
     return {"data": rows}
 
-@app.get("/api/raw-materials/{material_id}")
-def get_raw_material(material_id: int):
+# declared before /{material_id} so "batch" is not parsed as an id
+@router.get("/api/raw-materials/batch", dependencies=[require_perm("inventory:read")])
+def get_raw_materials_batch(ids: str = Query(..., description="Comma-separated MaterialIDs, e.g. 3,1,2")):
+    return _batch_response("Raw", ids)
+
+@router.get("/api/raw-materials/{material_id}", dependencies=[require_perm("inventory:read")])
+def get_raw_material(material_id: int, response: Response):
+    if ensure_read_model():
+        r, ver = read_model.get_versioned("Raw", material_id)
+        if not r:
+            raise HTTPException(status_code=404, detail="Raw material not found")
+        resp = json_bytes_response(('{"data":' + encode_raw_material_row(_raw_out(r)) + '}').encode("utf-8"))
+        resp.headers["ETag"] = etag.make(ver, r[5])
+        return resp
     table, c = get_raw_table_and_cols()
     q = f"""SELECT `{c['id']}` AS MaterialID, `{c['name']}` AS MaterialName,
                    `{c['quantity']}` AS MaterialQuantity, `{c['low']}` AS Lowstock,
-                   `{c['unit']}` AS Unit, `{c['time']}` AS TimeUpdate
+                   `{c['unit']}` AS Unit, `{c['time']}` AS TimeUpdate, {etag.version_sql(c)} AS _version
             FROM `{table}` WHERE `{c['id']}`=%s"""
-    conn = get_conn()
+    conn = get_conn(read_only=True)
     cur = conn.cursor(dictionary=True)
     cur.execute(q, (material_id,))
     row = cur.fetchone()
     cur.close(); conn.close()
     if not row:
         raise HTTPException(status_code=404, detail="Raw material not found")
+    response.headers["ETag"] = etag.make(row.pop("_version"), row["TimeUpdate"])
     return {"data": row}
 
-@app.post("/api/raw-materials", status_code=status.HTTP_201_CREATED)
-def create_raw_material(payload: RawMatCreate):
+@router.post("/api/raw-materials", status_code=status.HTTP_201_CREATED)
+def create_raw_material(payload: RawMatCreate, idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+                        claims: Dict[str, Any] = require_perm("inventory:write")):
+    return idempotency.run("raw-materials", idempotency_key, payload,
+                           lambda: _insert_raw_material(payload), status.HTTP_201_CREATED, claims.get("sub"))
+
+def _insert_raw_material(payload: RawMatCreate) -> Dict[str, Any]:
     table, c = get_raw_table_and_cols()
     q = f"""INSERT INTO `{table}`(`{c['name']}`,`{c['quantity']}`,`{c['low']}`,`{c['unit']}`)
             VALUES (%s,%s,%s,%s)"""
-    conn = get_conn(); cur = conn.cursor()
+    conn = get_conn(autocommit=False); cur = conn.cursor()
     try:
         cur.execute(q, (payload.MaterialName, payload.MaterialQuantity, payload.Lowstock, payload.Unit))
         new_id = cur.lastrowid
+        sync_log.record(cur, [(ITEM_SCOPES["Raw"], new_id, "I")])
+        conn.commit()
     except mysql_errors.Error as e:
+        conn.rollback()
         raise HTTPException(status_code=400, detail=e.msg)
     finally:
         cur.close(); conn.close()
+    publish_item_change("Raw", new_id, "I")
     return {"id": new_id}
 
-@app.put("/api/raw-materials/{material_id}")
-def update_raw_material(material_id: int, payload: RawMatUpdate):
+@router.put("/api/raw-materials/{material_id}", dependencies=[require_perm("inventory:write")])
+def update_raw_material(material_id: int, payload: RawMatUpdate, response: Response,
+                        if_match: Optional[str] = Header(None, alias="If-Match")):
+    token = etag.parse_if_match(if_match)
     table, c = get_raw_table_and_cols()
     fields, vals = [], []
     if payload.MaterialName is not None: fields += [f"`{c['name']}`=%s"]; vals += [payload.MaterialName]
@@ -214,36 +456,33 @@ def update_raw_material(material_id: int, payload: RawMatUpdate):
     if payload.Lowstock is not None: fields += [f"`{c['low']}`=%s"]; vals += [payload.Lowstock]
     if payload.Unit is not None: fields += [f"`{c['unit']}`=%s"]; vals += [payload.Unit]
     if not fields: raise HTTPException(status_code=400, detail="No fields to update")
-
-    q = f"UPDATE `{table}` SET {', '.join(fields)} WHERE `{c['id']}`=%s"
-    vals.append(material_id)
-    conn = get_conn(); cur = conn.cursor()
-    cur.execute(q, tuple(vals))
-    affected = cur.rowcount
-    cur.close(); conn.close()
-    if affected == 0: raise HTTPException(status_code=404, detail="Raw material not found")
+    _conditional_write("Raw", f"UPDATE `{table}` SET {', '.join(fields + etag.bump(c))}", vals,
+                       material_id, token, "Raw material not found", "U")
+    publish_item_change("Raw", material_id)
+    new_tag = etag.next_etag(c, token)
+    if new_tag:
+        response.headers["ETag"] = new_tag
     return {"updated": True}
 
-@app.delete("/api/raw-materials/{material_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_raw_material(material_id: int):
-    table, c = get_raw_table_and_cols()
-    q = f"DELETE FROM `{table}` WHERE `{c['id']}`=%s"
-    conn = get_conn(); cur = conn.cursor()
-    cur.execute(q, (material_id,))
-    affected = cur.rowcount
-    cur.close(); conn.close()
-    if affected == 0: raise HTTPException(status_code=404, detail="Raw material not found")
+@router.delete("/api/raw-materials/{material_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[require_perm("inventory:write")])
+def delete_raw_material(material_id: int, if_match: Optional[str] = Header(None, alias="If-Match")):
+    token = etag.parse_if_match(if_match)
+    table, _ = get_raw_table_and_cols()
+    _conditional_write("Raw", f"DELETE FROM `{table}`", [], material_id, token, "Raw material not found", "D")
+    publish_item_change("Raw", material_id, "D")
     return
 
 # ================= FINISHED GOODS CRUD =================
 def get_finished_table_and_cols() -> Tuple[str, Dict[str,str]]:
+    cached = _schema_cache.get("finished")
+    if cached:
+        return cached
     conn = get_conn(); cur = conn.cursor()
     table = resolve_table_name(cur, ["FinishedGoods", "finished_products"])
-    cur.close(); conn.close()
     if not table:
+        cur.close(); conn.close()
         raise HTTPException(status_code=500, detail="Table FinishedGoods/finished_products not found in DB")
 
-    conn = get_conn(); cur = conn.cursor()
     cols = resolve_column_names(cur, table, {
         # ProductId/ProductName/Quantity/LowStock
         "id":       ["GoodsID", "goods_id", "id",
@@ -256,77 +495,107 @@ def get_finished_table_and_cols() -> Tuple[str, Dict[str,str]]:
                      "LowStock"],
         "time":     ["TimeUpdate", "time_update", "updated_at", "update_time", "timestamp"],
     })
+    cols["version"] = etag.find_version_column(cur, table)
     cur.close(); conn.close()
+    _schema_cache["finished"] = (table, cols)
     return table, cols
 
 
-@app.get("/api/finished-goods")
-def list_finished_goods():
+@router.get("/api/finished-goods", dependencies=[require_perm("inventory:read")])
+def list_finished_goods(request: Request, fields: Optional[str] = Query(None, description="Comma-separated subset, e.g. GoodsID,FinishedGoodsName")):
+    return cached(request, (ITEM_SCOPES["Finished"],), lambda: _list_finished_goods(fields))
+
+def _list_finished_goods(fields: Optional[str]):
+    proj = parse_fields(fields, FINISHED_FIELDS)
+    if proj:
+        return _projected_item_list("Finished", proj)
+    if ensure_read_model():
+        rows = sorted(read_model.rows("Finished"), key=lambda r: r[0], reverse=True)
+        return json_bytes_response(b'{"data":' + encode_rows(encode_finished_goods_row, map(_finished_out, rows)) + b'}')
     table, c = get_finished_table_and_cols()
     q = f"""SELECT `{c['id']}` AS GoodsID, `{c['name']}` AS FinishedGoodsName,
                    `{c['quantity']}` AS FinishedGoodsQuantity, `{c['low']}` AS Lowstock,
                    `{c['time']}` AS TimeUpdate
             FROM `{table}` ORDER BY `{c['id']}` DESC"""
-    conn = get_conn(); cur = conn.cursor(dictionary=True)
+    conn = get_conn(read_only=True); cur = conn.cursor(dictionary=True)
     cur.execute(q); rows = cur.fetchall()
     cur.close(); conn.close()
     return {"data": rows}
 
-@app.get("/api/finished-goods/{goods_id}")
-def get_finished_goods(goods_id: int):
+@router.get("/api/finished-goods/batch", dependencies=[require_perm("inventory:read")])
+def get_finished_goods_batch(ids: str = Query(..., description="Comma-separated GoodsIDs, e.g. 3,1,2")):
+    return _batch_response("Finished", ids)
+
+@router.get("/api/finished-goods/{goods_id}", dependencies=[require_perm("inventory:read")])
+def get_finished_goods(goods_id: int, response: Response):
+    if ensure_read_model():
+        r, ver = read_model.get_versioned("Finished", goods_id)
+        if not r:
+            raise HTTPException(status_code=404, detail="Finished goods not found")
+        resp = json_bytes_response(('{"data":' + encode_finished_goods_row(_finished_out(r)) + '}').encode("utf-8"))
+        resp.headers["ETag"] = etag.make(ver, r[5])
+        return resp
     table, c = get_finished_table_and_cols()
     q = f"""SELECT `{c['id']}` AS GoodsID, `{c['name']}` AS FinishedGoodsName,
                    `{c['quantity']}` AS FinishedGoodsQuantity, `{c['low']}` AS Lowstock,
-                   `{c['time']}` AS TimeUpdate
+                   `{c['time']}` AS TimeUpdate, {etag.version_sql(c)} AS _version
             FROM `{table}` WHERE `{c['id']}`=%s"""
-    conn = get_conn(); cur = conn.cursor(dictionary=True)
+    conn = get_conn(read_only=True); cur = conn.cursor(dictionary=True)
     cur.execute(q, (goods_id,))
     row = cur.fetchone()
     cur.close(); conn.close()
     if not row: raise HTTPException(status_code=404, detail="Finished goods not found")
+    response.headers["ETag"] = etag.make(row.pop("_version"), row["TimeUpdate"])
     return {"data": row}
 
-@app.post("/api/finished-goods", status_code=status.HTTP_201_CREATED)
-def create_finished_goods(payload: FinishedCreate):
+@router.post("/api/finished-goods", status_code=status.HTTP_201_CREATED)
+def create_finished_goods(payload: FinishedCreate, idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+                          claims: Dict[str, Any] = require_perm("inventory:write")):
+    return idempotency.run("finished-goods", idempotency_key, payload,
+                           lambda: _insert_finished_goods(payload), status.HTTP_201_CREATED, claims.get("sub"))
+
+def _insert_finished_goods(payload: FinishedCreate) -> Dict[str, Any]:
     table, c = get_finished_table_and_cols()
     q = f"""INSERT INTO `{table}`(`{c['name']}`,`{c['quantity']}`,`{c['low']}`)
             VALUES (%s,%s,%s)"""
-    conn = get_conn(); cur = conn.cursor()
+    conn = get_conn(autocommit=False); cur = conn.cursor()
     try:
         cur.execute(q, (payload.FinishedGoodsName, payload.FinishedGoodsQuantity, payload.Lowstock))
         new_id = cur.lastrowid
+        sync_log.record(cur, [(ITEM_SCOPES["Finished"], new_id, "I")])
+        conn.commit()
     except mysql_errors.Error as e:
+        conn.rollback()
         raise HTTPException(status_code=400, detail=e.msg)
     finally:
         cur.close(); conn.close()
+    publish_item_change("Finished", new_id, "I")
     return {"id": new_id}
 
-@app.put("/api/finished-goods/{goods_id}")
-def update_finished_goods(goods_id: int, payload: FinishedUpdate):
+@router.put("/api/finished-goods/{goods_id}", dependencies=[require_perm("inventory:write")])
+def update_finished_goods(goods_id: int, payload: FinishedUpdate, response: Response,
+                          if_match: Optional[str] = Header(None, alias="If-Match")):
+    token = etag.parse_if_match(if_match)
     table, c = get_finished_table_and_cols()
     fields, vals = [], []
     if payload.FinishedGoodsName is not None: fields += [f"`{c['name']}`=%s"]; vals += [payload.FinishedGoodsName]
     if payload.FinishedGoodsQuantity is not None: fields += [f"`{c['quantity']}`=%s"]; vals += [payload.FinishedGoodsQuantity]
     if payload.Lowstock is not None: fields += [f"`{c['low']}`=%s"]; vals += [payload.Lowstock]
     if not fields: raise HTTPException(status_code=400, detail="No fields to update")
-    q = f"UPDATE `{table}` SET {', '.join(fields)} WHERE `{c['id']}`=%s"
-    vals.append(goods_id)
-    conn = get_conn(); cur = conn.cursor()
-    cur.execute(q, tuple(vals))
-    affected = cur.rowcount
-    cur.close(); conn.close()
-    if affected == 0: raise HTTPException(status_code=404, detail="Finished goods not found")
+    _conditional_write("Finished", f"UPDATE `{table}` SET {', '.join(fields + etag.bump(c))}", vals,
+                       goods_id, token, "Finished goods not found", "U")
+    publish_item_change("Finished", goods_id)
+    new_tag = etag.next_etag(c, token)
+    if new_tag:
+        response.headers["ETag"] = new_tag
     return {"updated": True}
 
-@app.delete("/api/finished-goods/{goods_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_finished_goods(goods_id: int):
-    table, c = get_finished_table_and_cols()
-    q = f"DELETE FROM `{table}` WHERE `{c['id']}`=%s"
-    conn = get_conn(); cur = conn.cursor()
-    cur.execute(q, (goods_id,))
-    affected = cur.rowcount
-    cur.close(); conn.close()
-    if affected == 0: raise HTTPException(status_code=404, detail="Finished goods not found")
+@router.delete("/api/finished-goods/{goods_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[require_perm("inventory:write")])
+def delete_finished_goods(goods_id: int, if_match: Optional[str] = Header(None, alias="If-Match")):
+    token = etag.parse_if_match(if_match)
+    table, _ = get_finished_table_and_cols()
+    _conditional_write("Finished", f"DELETE FROM `{table}`", [], goods_id, token, "Finished goods not found", "D")
+    publish_item_change("Finished", goods_id, "D")
     return
 
 # ================= JOIN VIEW (UI) =================
@@ -347,13 +616,32 @@ def normalize_row_to_item(row: Dict[str, Any], kind: Literal["Raw","Finished"])
         status=status
     )
 
-@app.get("/api/inventory", response_model=List[InventoryItem])
-def get_inventory(
-    type: Optional[Literal["Raw","Finished"]] = Query(None),
-    status_f: Optional[Literal["OK","Low","Out"]] = Query(None, alias="status"),
-    in_stock_only: Optional[bool] = Query(False, alias="inStockOnly"),
-    search: Optional[str] = Query(None)
-):
+# Fast path: same values as normalize_row_to_item, as a tuple in InventoryItem field order
+INV_ID, INV_CODE, INV_NAME, INV_QTY, INV_UNIT, INV_LOW, INV_UPD, INV_TYPE, INV_STATUS = range(9)
+
+INVENTORY_FIELDS = [
+    ("id", "int"), ("code", "str"), ("name", "str"), ("quantity", "int"), ("unit", "str"),
+    ("lowStock", "int"), ("updatedAt", "str"), ("type", "str"), ("status", "str"),
+]
+encode_inventory_row = compile_row_encoder(INVENTORY_FIELDS, name="encode_inventory_row")
+
+def normalize_row_to_tuple(row: Tuple, kind: Literal["Raw","Finished"]) -> Tuple:
+    rid, name, qty, unit, low, upd = row
+    rid = int(rid)
+    qty = int(qty or 0)
+    return (
+        rid,
+        ("RM-" if kind=="Raw" else "FG-") + f"{rid:04d}",
+        name,
+        qty,
+        (unit or "-") if kind=="Raw" else "-",
+        int(low or 0),
+        upd.isoformat() if isinstance(upd, datetime) else str(upd) if upd else None,
+        kind,
+        compute_status(qty, low),
+    )
+
+def _fetch_inventory_rows(dictionary: bool = not FAST_JSON) -> Tuple[List[Any], List[Any]]:
     # RAW: build SELECT with aliases to a unified shape
     r_table, rc = get_raw_table_and_cols()
     r_select = f"""
@@ -377,16 +665,55 @@ def get_inventory(
       FROM `{f_table}`
     """
 
-    conn = get_conn(); cur = conn.cursor(dictionary=True)
+    conn = get_conn(read_only=True); cur = conn.cursor(dictionary=dictionary)
     cur.execute(r_select); raw_rows = cur.fetchall()
     cur.execute(f_select); fin_rows = cur.fetchall()
     cur.close(); conn.close()
+    return raw_rows, fin_rows
+
+@router.get("/api/inventory", response_model=List[InventoryItem], dependencies=[require_perm("inventory:read")])
+def get_inventory(
+    request: Request,
+    type: Optional[Literal["Raw","Finished"]] = Query(None),
+    status_f: Optional[Literal["OK","Low","Out"]] = Query(None, alias="status"),
+    in_stock_only: Optional[bool] = Query(False, alias="inStockOnly"),
+    search: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None, description="Comma-separated subset, e.g. id,name,quantity,status"),
+):
+    return cached(request, (ITEM_SCOPES["Raw"], ITEM_SCOPES["Finished"]),
+                  lambda: _get_inventory(type, status_f, in_stock_only, search, fields))
+
+def _get_inventory(type, status_f, in_stock_only, search, fields):
+    # code/status are derived, so a projection trims the payload, not the SELECT
+    proj = parse_fields(fields, INVENTORY_FIELDS)
+    if ensure_read_model():
+        raw_rows = read_model.rows("Raw") if type != "Finished" else []
+        fin_rows = read_model.rows("Finished") if type != "Raw" else []
+        fast = True
+    else:
+        fast = FAST_JSON or proj is not None
+        raw_rows, fin_rows = _fetch_inventory_rows(dictionary=not fast)
+
+    s = (search or "").strip().lower()
+    if fast:
+        rows = [normalize_row_to_tuple(r, "Raw") for r in raw_rows] + \
+               [normalize_row_to_tuple(g, "Finished") for g in fin_rows]
+        if type or status_f or in_stock_only or s:
+            rows = [t for t in rows
+                    if (not type or t[INV_TYPE] == type)
+                    and (not status_f or t[INV_STATUS] == status_f)
+                    and (not in_stock_only or t[INV_QTY] > 0)
+                    and (not s or s in t[INV_NAME].lower() or s in t[INV_CODE].lower())]
+        rows.sort(key=lambda t: (t[INV_TYPE], t[INV_ID]), reverse=True)
+        if proj:
+            _, pick, encoder = projection(INVENTORY_FIELDS, proj, "inventory")
+            return json_bytes_response(encode_rows(encoder, map(pick, rows)))
+        return json_bytes_response(encode_rows(encode_inventory_row, rows))
 
     items: List[InventoryItem] = [normalize_row_to_item(r, "Raw") for r in raw_rows] + \
                                  [normalize_row_to_item(g, "Finished") for g in fin_rows]
 
     # Optional server-side filters (match frontend)
-    s = (search or "").strip().lower()
     out: List[InventoryItem] = []
     for it in items:
         if type and it.type != type: continue
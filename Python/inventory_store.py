@@ -0,0 +1,190 @@
+# inventory_store.py — Compact column-oriented in-memory copy of RawMaterials / FinishedGoods
+# One ItemColumns per table: typed arrays for the numeric columns, plain lists for text,
+# and a single id → row-position index. No per-row dict or object.
+
+import sys
+import threading
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Sentinels for NULL inside typed arrays
+NULL_INT = -1                      # Lowstock is >= 0 (see RawMatCreate/FinishedCreate)
+NULL_TIME = -(2 ** 63)
+EPOCH = datetime(1970, 1, 1)
+
+# Row shape in/out: (id, name, quantity, unit, lowStock, updatedAt). Rows passed in may carry
+# a 7th value, the RowVersion (etag.py), kept in its own column and read with row_version().
+Row = Tuple[int, str, int, Optional[str], Optional[int], Optional[datetime]]
+
+def _to_micros(dt: Any) -> int:
+    if not isinstance(dt, datetime):
+        return NULL_TIME
+    if dt.tzinfo is not None:
+        dt = dt.replace(tzinfo=None)  # DATETIME columns are naive; keep wall-clock value
+    d = dt - EPOCH
+    return (d.days * 86400 + d.seconds) * 1_000_000 + d.microseconds
+
+def _from_micros(v: int) -> Optional[datetime]:
+    if v == NULL_TIME:
+        return None
+    return EPOCH + timedelta(microseconds=v)
+
+class ItemColumns:
+    """Columns for one inventory table. Not thread-safe on its own; InventoryStore locks."""
+
+    __slots__ = ("ids", "qty", "low", "upd", "ver", "names", "units", "pos")
+
+    def __init__(self):
+        self.ids = array("q")
+        self.qty = array("q")
+        self.low = array("q")
+        self.upd = array("q")
+        self.ver = array("q")
+        self.names: List[str] = []
+        self.units: List[Optional[str]] = []
+        self.pos: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def upsert(self, row: Row) -> None:
+        rid, name, qty, unit, low, upd = row[:6]
+        rid = int(rid)
+        low_v = NULL_INT if low is None else int(low)
+        ver_v = NULL_INT if len(row) < 7 or row[6] is None else int(row[6])
+        unit_v = sys.intern(unit) if isinstance(unit, str) else None  # units repeat: share one object
+        i = self.pos.get(rid)
+        if i is None:
+            self.pos[rid] = len(self.ids)
+            self.ids.append(rid)
+            self.qty.append(int(qty or 0))
+            self.low.append(low_v)
+            self.upd.append(_to_micros(upd))
+            self.ver.append(ver_v)
+            self.names.append(name)
+            self.units.append(unit_v)
+        else:
+            self.qty[i] = int(qty or 0)
+            self.low[i] = low_v
+            self.upd[i] = _to_micros(upd)
+            self.ver[i] = ver_v
+            self.names[i] = name
+            self.units[i] = unit_v
+
+    def remove(self, rid: int) -> bool:
+        i = self.pos.pop(int(rid), None)
+        if i is None:
+            return False
+        last = len(self.ids) - 1
+        if i != last:
+            # swap-with-last keeps the arrays dense
+            self.ids[i] = moved = self.ids[last]
+            self.qty[i] = self.qty[last]
+            self.low[i] = self.low[last]
+            self.upd[i] = self.upd[last]
+            self.ver[i] = self.ver[last]
+            self.names[i] = self.names[last]
+            self.units[i] = self.units[last]
+            self.pos[moved] = i
+        for col in (self.ids, self.qty, self.low, self.upd, self.ver, self.names, self.units):
+            col.pop()
+        return True
+
+    def row_at(self, i: int) -> Row:
+        low = self.low[i]
+        return (self.ids[i], self.names[i], self.qty[i], self.units[i],
+                None if low == NULL_INT else low, _from_micros(self.upd[i]))
+
+    def get(self, rid: int) -> Optional[Row]:
+        i = self.pos.get(int(rid))
+        return None if i is None else self.row_at(i)
+
+    def rows(self) -> List[Row]:
+        return [self.row_at(i) for i in range(len(self.ids))]
+
+    def row_version(self, rid: int) -> Optional[int]:
+        i = self.pos.get(int(rid))
+        if i is None or self.ver[i] == NULL_INT:
+            return None
+        return self.ver[i]
+
+    def memory_bytes(self) -> int:
+        total = sum(sys.getsizeof(a) for a in (self.ids, self.qty, self.low, self.upd, self.ver))
+        total += sys.getsizeof(self.names) + sum(sys.getsizeof(s) for s in self.names)
+        total += sys.getsizeof(self.units) + sum(sys.getsizeof(u) for u in set(self.units) if u is not None)
+        total += sys.getsizeof(self.pos)  # keys are the same small ints stored in ids
+        return total
+
+class InventoryStore:
+    """Raw + Finished columns behind one lock, with a version bumped on every change."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.tables: Dict[str, ItemColumns] = {"Raw": ItemColumns(), "Finished": ItemColumns()}
+        self.loaded = False
+        self.version = 0
+        self.loaded_at: Optional[datetime] = None
+        # (kind, id) written while a full reload is reading the DB; replayed after the swap
+        self.touched: Optional[set] = None
+
+    def begin_load(self) -> None:
+        with self.lock:
+            self.touched = set()
+
+    def replace(self, raw_rows: Iterable[Row], fin_rows: Iterable[Row]) -> set:
+        """Swap in freshly loaded columns; returns keys touched during the load."""
+        raw, fin = ItemColumns(), ItemColumns()
+        for r in raw_rows: raw.upsert(r)
+        for r in fin_rows: fin.upsert(r)
+        with self.lock:
+            self.tables = {"Raw": raw, "Finished": fin}
+            self.loaded = True
+            self.version += 1
+            self.loaded_at = datetime.now(timezone.utc)
+            touched, self.touched = self.touched or set(), None
+        return touched
+
+    def upsert(self, kind: str, row: Row) -> None:
+        with self.lock:
+            self.tables[kind].upsert(row)
+            self.version += 1
+            if self.touched is not None:
+                self.touched.add((kind, int(row[0])))
+
+    def remove(self, kind: str, rid: int) -> None:
+        with self.lock:
+            if self.tables[kind].remove(rid):
+                self.version += 1
+            if self.touched is not None:
+                self.touched.add((kind, int(rid)))
+
+    def get(self, kind: str, rid: int) -> Optional[Row]:
+        with self.lock:
+            return self.tables[kind].get(rid)
+
+    def get_versioned(self, kind: str, rid: int) -> Tuple[Optional[Row], Optional[int]]:
+        """get() plus the row's RowVersion, read under the same lock (for the ETag)."""
+        with self.lock:
+            t = self.tables[kind]
+            return t.get(rid), t.row_version(rid)
+
+    def rows(self, kind: str) -> List[Row]:
+        with self.lock:
+            return self.tables[kind].rows()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            out: Dict[str, Any] = {"loaded": self.loaded, "version": self.version,
+                                   "loaded_at": self.loaded_at.isoformat() if self.loaded_at else None}
+            items = 0
+            total = 0
+            for kind, cols in self.tables.items():
+                n = len(cols)
+                b = cols.memory_bytes()
+                items += n; total += b
+                out[kind] = {"items": n, "bytes": b, "bytes_per_item": round(b / n, 1) if n else 0.0}
+            out["items"] = items
+            out["bytes"] = total
+            out["bytes_per_item"] = round(total / items, 1) if items else 0.0
+            return out
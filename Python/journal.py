@@ -0,0 +1,231 @@
+# journal.py — Write-behind journal for POST /api/transactions (local SQLite, WAL, fsync per append)
+# With TX_JOURNAL=fallback|always an accepted TxCreate payload can be appended here instead of
+# waiting on MySQL: the caller gets 202 with a provisional id (the journal sequence number) as
+# soon as the entry is on disk. One drainer thread replays pending entries into MySQL in
+# sequence order, TX_JOURNAL_BATCH per MySQL transaction (see transaction.replay_journal).
+#
+# Exactly-once: each replayed batch also records "<node>:<seq>" → TransactionID in
+# `tx_journal_applied` inside the same MySQL transaction, so a crash between the MySQL commit
+# and the local "done" mark is resolved on the next pass instead of inserting twice.
+#
+#   GET /api/journal/entries/{seq}   status of one provisional id (pending/done/failed + TransactionID)
+#   GET /api/journal                 lag metrics (mounted in main.py)
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import JSONResponse
+
+from auth import require_perm
+from config import (TX_JOURNAL, TX_JOURNAL_PATH, TX_JOURNAL_BATCH, TX_JOURNAL_DRAIN_MS,
+                    TX_JOURNAL_RETENTION_HOURS)
+
+router = APIRouter()
+
+MODES = ("off", "fallback", "always")
+if TX_JOURNAL not in MODES:
+    raise ValueError(f"TX_JOURNAL must be one of {MODES}, got '{TX_JOURNAL}'")
+
+APPLIED_TABLE = "tx_journal_applied"
+
+# MySQL side, created by migrations.py (version 5) and by the drainer on first use
+DDL = f"""
+CREATE TABLE IF NOT EXISTS `{APPLIED_TABLE}` (
+  JournalId      VARCHAR(64) NOT NULL PRIMARY KEY,
+  TransactionID  INT         NOT NULL,
+  AppliedAt      DATETIME(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3)
+)
+"""
+
+_LOCAL_DDL = (
+    """CREATE TABLE IF NOT EXISTS entries (
+         seq      INTEGER PRIMARY KEY AUTOINCREMENT,
+         payload  TEXT    NOT NULL,
+         created  REAL    NOT NULL,
+         status   TEXT    NOT NULL DEFAULT 'pending',
+         tx_id    INTEGER,
+         error    TEXT,
+         applied  REAL
+       )""",
+    "CREATE INDEX IF NOT EXISTS idx_entries_status ON entries (status, seq)",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+)
+
+# Replays [(journal id, payload)] in order → journal id → (TransactionID, error). Raises when
+# MySQL cannot be reached; the whole batch is then retried after a backoff.
+Applier = Callable[[List[Tuple[str, Dict[str, Any]]]], Dict[str, Tuple[Optional[int], Optional[str]]]]
+
+_db: Optional[sqlite3.Connection] = None
+_node = ""
+_lock = threading.Lock()
+_wake = threading.Event()
+_stop = threading.Event()
+_drainer: Optional[threading.Thread] = None
+
+_stats: Dict[str, Any] = {"appended": 0, "drained": 0, "failed": 0, "batches": 0, "retries": 0,
+                          "last_batch_ms": None, "last_error": None}
+
+def enabled() -> bool:
+    return TX_JOURNAL != "off"
+
+# ================= LOCAL STORE =================
+def _open() -> sqlite3.Connection:
+    global _db, _node
+    if _db is None:
+        with _lock:
+            if _db is None:
+                os.makedirs(os.path.dirname(os.path.abspath(TX_JOURNAL_PATH)), exist_ok=True)
+                db = sqlite3.connect(TX_JOURNAL_PATH, isolation_level=None, check_same_thread=False)
+                db.execute("PRAGMA journal_mode=WAL")
+                db.execute("PRAGMA synchronous=FULL")   # an acknowledged entry survives a power cut
+                for stmt in _LOCAL_DDL:
+                    db.execute(stmt)
+                # stable per journal file, so ids stay unique across restarts and hosts
+                db.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('node', ?)", (uuid.uuid4().hex[:12],))
+                _node = db.execute("SELECT value FROM meta WHERE key='node'").fetchone()[0]
+                _db = db
+    return _db
+
+def journal_id(seq: int) -> str:
+    return f"{_node}:{seq}"
+
+def has_backlog() -> bool:
+    db = _open()
+    with _lock:
+        return db.execute("SELECT 1 FROM entries WHERE status='pending' LIMIT 1").fetchone() is not None
+
+def append(payload: Dict[str, Any]) -> int:
+    """Durably append one payload; returns its sequence number (the provisional id)."""
+    db = _open()
+    with _lock:
+        seq = db.execute("INSERT INTO entries (payload, created) VALUES (?, ?)",
+                         (json.dumps(payload, separators=(",", ":")), time.time())).lastrowid
+    _stats["appended"] += 1
+    _wake.set()
+    return seq
+
+def accepted(seq: int) -> JSONResponse:
+    """202 body for a journaled POST (same shape as the direct 201, id still unknown)."""
+    return JSONResponse(status_code=status.HTTP_202_ACCEPTED,
+                        content={"id": None, "provisional_id": seq, "queued": True,
+                                 "status_url": f"/api/journal/entries/{seq}"})
+
+def _pending(limit: int) -> List[Tuple[int, Dict[str, Any]]]:
+    db = _open()
+    with _lock:
+        rows = db.execute("SELECT seq, payload FROM entries WHERE status='pending' ORDER BY seq LIMIT ?",
+                          (limit,)).fetchall()
+    return [(seq, json.loads(p)) for seq, p in rows]
+
+def _mark(results: List[Tuple[int, Optional[int], Optional[str]]]) -> None:
+    db = _open()
+    now = time.time()
+    with _lock:
+        db.execute("BEGIN")
+        db.executemany(
+            "UPDATE entries SET status=?, tx_id=?, error=?, applied=? WHERE seq=?",
+            [("failed" if err else "done", tx_id, err, now, seq) for seq, tx_id, err in results],
+        )
+        db.execute("COMMIT")
+
+def _prune() -> None:
+    db = _open()
+    with _lock:
+        db.execute("DELETE FROM entries WHERE status='done' AND applied < ?",
+                   (time.time() - TX_JOURNAL_RETENTION_HOURS * 3600,))
+
+# ================= DRAINER =================
+def drain_once(apply: Applier) -> int:
+    """Replay one batch; returns how many entries were settled (done or failed)."""
+    batch = _pending(TX_JOURNAL_BATCH)
+    if not batch:
+        return 0
+    t = time.perf_counter()
+    outcome = apply([(journal_id(seq), payload) for seq, payload in batch])
+    results = []
+    for seq, _ in batch:
+        tx_id, err = outcome.get(journal_id(seq), (None, "not applied"))
+        results.append((seq, tx_id, err))
+    _mark(results)
+    failed = sum(1 for _, _, err in results if err)
+    _stats["drained"] += len(results) - failed
+    _stats["failed"] += failed
+    _stats["batches"] += 1
+    _stats["last_batch_ms"] = round((time.perf_counter() - t) * 1000, 2)
+    return len(results)
+
+def _drain_loop(apply: Applier) -> None:
+    interval = TX_JOURNAL_DRAIN_MS / 1000.0
+    backoff = interval
+    next_prune = time.monotonic() + 60
+    while not _stop.is_set():
+        try:
+            n = drain_once(apply)
+            backoff = interval
+            if time.monotonic() >= next_prune:
+                _prune()
+                next_prune = time.monotonic() + 3600
+            if n >= TX_JOURNAL_BATCH:
+                continue   # more is waiting: no pause between full batches
+            wait = interval
+        except Exception as e:
+            # MySQL down/slow: nothing was marked, the same batch is retried in order
+            _stats["retries"] += 1
+            _stats["last_error"] = str(getattr(e, "detail", None) or getattr(e, "msg", None) or e)
+            backoff = min(backoff * 2, 5.0)
+            wait = backoff
+        _wake.wait(wait)
+        _wake.clear()
+
+def start(apply: Applier) -> None:
+    """Open the journal and start the drainer (idempotent; no-op with TX_JOURNAL=off)."""
+    global _drainer
+    if not enabled() or _drainer is not None:
+        return
+    _open()
+    _drainer = threading.Thread(target=_drain_loop, args=(apply,), name="tx-journal", daemon=True)
+    _drainer.start()
+
+def stop() -> None:
+    _stop.set()
+    _wake.set()
+
+def stats() -> Dict[str, Any]:
+    out: Dict[str, Any] = {"mode": TX_JOURNAL}
+    if not enabled():
+        return out
+    db = _open()
+    with _lock:
+        counts = dict(db.execute("SELECT status, COUNT(*) FROM entries GROUP BY status").fetchall())
+        oldest = db.execute("SELECT MIN(created) FROM entries WHERE status='pending'").fetchone()[0]
+    out.update({
+        "path": TX_JOURNAL_PATH,
+        "node": _node,
+        "pending": counts.get("pending", 0),
+        "failed_total": counts.get("failed", 0),
+        # lag: how long the oldest accepted-but-unapplied transaction has been waiting
+        "oldest_pending_age_seconds": round(time.time() - oldest, 3) if oldest else 0,
+        "drainer_running": _drainer is not None and _drainer.is_alive(),
+        **_stats,
+    })
+    return out
+
+# ================= ROUTES =================
+@router.get("/api/journal/entries/{seq}", dependencies=[require_perm("transactions:read")])
+def get_entry(seq: int):
+    if not enabled():
+        raise HTTPException(status_code=404, detail="Transaction journal is disabled")
+    db = _open()
+    with _lock:
+        row = db.execute("SELECT seq, status, tx_id, error, created, applied FROM entries WHERE seq=?",
+                         (seq,)).fetchone()
+    if not row:
+        raise HTTPException(status_code=404, detail="Journal entry not found")
+    return {"provisional_id": row[0], "status": row[1], "id": row[2], "error": row[3],
+            "created": row[4], "applied": row[5]}
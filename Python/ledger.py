@@ -0,0 +1,114 @@
+# ledger.py — Rolling maintenance for the transaction ledger's hot/archive tiers
+# The hot table keeps the current month plus LEDGER_HOT_MONTHS whole months; `roll` moves
+# everything older into `<table>_archive` (created by migrations.py version 8) in
+# id-ordered batches, one DB transaction per batch. Readers pick tiers in transaction.py from
+# the same cutoff, so a smaller --hot-months than the workers' LEDGER_HOT_MONTHS is refused.
+#
+# Run (cron, e.g. nightly):
+#   python ledger.py roll                      # archive rows older than the hot window
+#   python ledger.py roll --hot-months 6 --dry-run
+#   python ledger.py status
+
+import os
+import sys
+import argparse
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import batch
+import cache_bus
+from config import LEDGER_HOT_MONTHS, LEDGER_ROLL_BATCH
+from db import get_conn
+from repository import repo
+import transaction
+
+hot_cutoff = transaction.hot_cutoff
+
+def roll(hot_months: int = LEDGER_HOT_MONTHS, batch_size: int = LEDGER_ROLL_BATCH,
+         dry_run: bool = False, now: Optional[datetime] = None) -> Dict[str, Any]:
+    if hot_months < LEDGER_HOT_MONTHS:
+        # readers skip the archive for ranges after hot_cutoff(now, LEDGER_HOT_MONTHS)
+        raise SystemExit(f"--hot-months must be at least LEDGER_HOT_MONTHS ({LEDGER_HOT_MONTHS})")
+    table, c = transaction.get_tx_table_and_cols()
+    cutoff = hot_cutoff(now or datetime.now(), hot_months)
+    report: Dict[str, Any] = {"table": table, "cutoff": cutoff.isoformat(), "moved": 0, "batches": 0}
+    if dry_run:
+        conn = get_conn(); cur = conn.cursor()
+        try:
+            cur.execute(f"SELECT COUNT(*) FROM `{table}` WHERE `{c['time']}` < %s", (cutoff,))
+            report["would_move"] = int(cur.fetchone()[0])
+        finally:
+            cur.close(); conn.close()
+        return report
+
+    archive = transaction.get_archive_table(table)
+    if not archive:
+        raise SystemExit(f"No archive table for '{table}': run `python migrations.py migrate` first")
+    report["archive"] = archive
+    conn = get_conn(autocommit=False); cur = conn.cursor()
+    try:
+        cur.execute(f"SELECT * FROM `{table}` LIMIT 0")
+        cur.fetchall()
+        cols = ", ".join(f"`{n}`" for n in cur.column_names)
+        while True:
+            cur.execute(
+                f"SELECT `{c['id']}` FROM `{table}` WHERE `{c['time']}` < %s ORDER BY `{c['id']}` LIMIT %s{repo.for_update}",
+                (cutoff, batch_size),
+            )
+            ids: List[int] = [int(r[0]) for r in cur.fetchall()]
+            if not ids:
+                conn.commit()
+                break
+            in_sql = batch.in_clause(c['id'], len(ids))
+            cur.execute(f"INSERT INTO `{archive}` ({cols}) SELECT {cols} FROM `{table}` WHERE {in_sql}", tuple(ids))
+            cur.execute(f"DELETE FROM `{table}` WHERE {in_sql}", tuple(ids))
+            conn.commit()
+            report["moved"] += len(ids)
+            report["batches"] += 1
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close(); conn.close()
+    # readers re-resolve the archive table (results themselves are unchanged)
+    cache_bus.publish("ledger")
+    return report
+
+def _iso(v: Any) -> Optional[str]:
+    # SQLite aggregates carry no column type: MIN/MAX of a DATETIME come back as text
+    return v.isoformat() if isinstance(v, datetime) else (str(v) if v is not None else None)
+
+def status() -> Dict[str, Any]:
+    table, c = transaction.get_tx_table_and_cols()
+    transaction.clear_tier_cache()
+    out: Dict[str, Any] = {}
+    conn = get_conn(); cur = conn.cursor()
+    try:
+        for t in transaction.tx_tables_for_id(table):
+            cur.execute(f"SELECT COUNT(*), MIN(`{c['time']}`), MAX(`{c['time']}`) FROM `{t}`")
+            n, lo, hi = cur.fetchone()
+            out[t] = {"rows": int(n), "oldest": _iso(lo), "newest": _iso(hi)}
+    finally:
+        cur.close(); conn.close()
+    return out
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Transaction ledger hot/archive maintenance")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("roll", help="move rows older than the hot window into the archive")
+    r.add_argument("--hot-months", type=int, default=LEDGER_HOT_MONTHS)
+    r.add_argument("--batch", type=int, default=LEDGER_ROLL_BATCH)
+    r.add_argument("--dry-run", action="store_true")
+    sub.add_parser("status", help="row counts and time span per tier")
+    args = ap.parse_args()
+
+    if args.cmd == "roll":
+        print(roll(args.hot_months, args.batch, args.dry_run))
+    else:
+        print(status())
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
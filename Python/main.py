@@ -1,62 +1,222 @@
-# main.py — Aggregate FastAPI for inventory.py, Transaction.py, user.py
-import os
-from fastapi import FastAPI
+# main.py — Unified FastAPI app: one router tree over inventory.py, transaction.py, user.py
+import time
+_T_IMPORT = time.perf_counter()
+
+import threading
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+import jwt
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from config import CORS_ORIGINS, DEBUG_LOG_HEADERS, WARMUP_RETRY_SECONDS
+import auth
+import cache_bus
+import compression
+import db
+import idempotency
+import migrations
+import repository
+import singleflight
+import inventory      # /api/raw-materials, /api/finished-goods, /api/inventory, /api/health
+import transaction    # /api/transactions, /api/tx/health
+import user           # /api/users, /api/auth/*, /api/me
+import reorder        # /api/reorder/*
+import bom            # /api/bom/*, /api/production
+import journal        # /api/journal/entries/{seq}
+import sync           # /api/sync
+import dashboard      # /api/dashboard/summary
+import sync_log
+
+IMPORT_SECONDS = time.perf_counter() - _T_IMPORT
 
-# ---- Import sub-apps (giữ nguyên cấu trúc file gốc) ----
-from inventory import app as inventory_app    # /api/raw-materials, /api/finished-goods, /api/inventory, /api/health
-from transaction import app as transaction_app  # /api/inventory_transactions
-from user import app as user_app              # /api/users, /api/auth/*, /api/me
-
-# ---- App chính ----
-app = FastAPI(title="FoodCo Unified API", version="1.0")
-
-# Hợp nhất CORS (chọn tập superset cho tiện dev)
-origins = [
-    "http://localhost",
-    "http://127.0.0.1",
-    "http://localhost:5500", "http://127.0.0.1:5500",
-    "http://localhost:5501", "http://127.0.0.1:5501",
-    "http://localhost:5502", "http://127.0.0.1:5502",
-    "http://localhost:5503", "http://127.0.0.1:5503",
-    "http://localhost:5504", "http://127.0.0.1:5504",
-    "http://localhost:5505", "http://127.0.0.1:5505",
+# ---- Startup state (readiness + timings) ----
+class StartupState:
+    def __init__(self):
+        self.ready = False
+        self.attempts = 0
+        self.error: Optional[str] = None
+        self.phases: Dict[str, float] = {}
+        self.ready_at: Optional[str] = None
+        self.lock = threading.Lock()
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "attempts": self.attempts,
+            "error": self.error,
+            "import_ms": round(IMPORT_SECONDS * 1000, 1),
+            "phases_ms": {k: round(v * 1000, 1) for k, v in self.phases.items()},
+            "ready_at": self.ready_at,
+        }
+
+# Order matters: the pool first, then schema resolution, then caches built on top of it
+WARMUP_PHASES = [
+    ("pool", lambda: (repository.repo.open(), db.ping())),
+    ("schema_inventory", inventory.warm_up),
+    ("schema_transactions", transaction.warm_up),
+    ("schema_users", user.warm_up),
+    ("rbac", auth.warm_up),
+    ("migrations", migrations.warm_up),
+    ("bom", bom.warm_up),
+    ("dashboard", dashboard.warm_up),
+    ("cache_bus", cache_bus.start),
+    ("replicas", db.start_replica_checks),
 ]
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# ---- Gộp routes từ các sub-app vào app chính ----
-# Lưu ý: các path đều đã bắt đầu bằng /api/... trong từng file, không trùng nhau nên merge an toàn.
-app.router.routes.extend(inventory_app.router.routes)
-app.router.routes.extend(transaction_app.router.routes)
-app.router.routes.extend(user_app.router.routes)
-
-# (Tuỳ chọn) Gộp exception handlers (nếu các app con có custom handler)
-for exc, handler in inventory_app.exception_handlers.items():
-    app.add_exception_handler(exc, handler)
-for exc, handler in transaction_app.exception_handlers.items():
-    app.add_exception_handler(exc, handler)
-for exc, handler in user_app.exception_handlers.items():
-    app.add_exception_handler(exc, handler)
-
-# ---- Health gốc (ngoài /api/health của inventory) ----
-@app.get("/")
-def root():
-    return {
-        "ok": True,
-        "service": "FoodCo Unified API",
-        "docs": "/docs",
-        "apis": [
-            "/api/raw-materials", "/api/finished-goods", "/api/inventory",  # inventory.py
-            "/api/inventory_transactions",                                   # Transaction.py
-            "/api/users", "/api/auth/login", "/api/auth/refresh", "/api/me"  # user.py
-        ],
-    }
+
+def warm_up(state: StartupState) -> bool:
+    """Run every warm-up phase; marks the app ready only if all of them succeed."""
+    with state.lock:
+        if state.ready:
+            return True
+        state.attempts += 1
+        for name, fn in WARMUP_PHASES:
+            t = time.perf_counter()
+            try:
+                fn()
+            except Exception as e:
+                detail = getattr(e, "detail", None) or str(e)
+                state.error = f"{name}: {detail}"
+                print(f"[startup] warm-up phase '{name}' failed: {detail}")
+                return False
+            state.phases[name] = time.perf_counter() - t
+        state.error = None
+        state.ready = True
+        state.ready_at = datetime.now(timezone.utc).isoformat()
+        print("[startup]", state.report())
+        return True
+
+def _retry_warm_up(state: StartupState) -> None:
+    while not warm_up(state):
+        time.sleep(WARMUP_RETRY_SECONDS)
+
+# ---- Read-your-writes: remember which session wrote, so its next reads skip replicas ----
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+def session_key(request: Request) -> str:
+    # token subject (not verified here — only used to pick a DB, auth still happens in the handlers)
+    auth = request.headers.get("authorization", "")
+    if auth[:7].lower() == "bearer ":
+        try:
+            sub = jwt.decode(auth[7:].strip(), options={"verify_signature": False}).get("sub")
+            if sub:
+                return f"user:{sub}"
+        except jwt.InvalidTokenError:
+            pass
+    return f"ip:{request.client.host if request.client else '-'}"
+
+class ReadYourWritesMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        key = session_key(request)
+        db.current_session.set(key)
+        response = await call_next(request)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            db.mark_write(key)
+        return response
+
+def create_app() -> FastAPI:
+    state = StartupState()
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # before warm-up: with TX_JOURNAL on, POSTs are accepted even if MySQL is down at boot
+        journal.start(transaction.replay_journal)
+        # serve /ready (503) while the DB is unreachable; keep retrying in the background
+        if not await run_in_threadpool(warm_up, state):
+            threading.Thread(target=_retry_warm_up, args=(state,), name="warm-up", daemon=True).start()
+        yield
+        journal.stop()
+
+    app = FastAPI(title="FoodCo Unified API", version="1.0", lifespan=lifespan)
+    app.state.startup = state
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=CORS_ORIGINS,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    if db.REPLICAS:
+        app.add_middleware(ReadYourWritesMiddleware)
+    if DEBUG_LOG_HEADERS:
+        app.add_middleware(user.LogHeadersMiddleware)
+    app.add_middleware(compression.CompressionMiddleware)   # outermost: compresses everything below
+
+    # Các path đều đã bắt đầu bằng /api/... trong từng file, không trùng nhau
+    app.include_router(inventory.router)
+    app.include_router(transaction.router)
+    app.include_router(user.router)
+    app.include_router(reorder.router)
+    app.include_router(bom.router)
+    app.include_router(journal.router)
+    app.include_router(sync.router)
+    app.include_router(dashboard.router)
+
+    @app.get("/")
+    def root():
+        return {
+            "ok": True,
+            "service": "FoodCo Unified API",
+            "docs": "/docs",
+            "apis": [
+                "/api/raw-materials", "/api/finished-goods", "/api/inventory",  # inventory.py
+                "/api/transactions",                                             # transaction.py
+                "/api/users", "/api/auth/login", "/api/auth/refresh", "/api/me", # user.py
+                "/api/reorder/suggestions",                                      # reorder.py
+                "/api/bom/producible", "/api/production",                        # bom.py
+                "/api/journal",                                                  # journal.py
+                "/api/sync",                                                     # sync.py
+                "/api/dashboard/summary",                                        # dashboard.py
+            ],
+        }
+
+    # Readiness (warm-up finished) — liveness stays at /api/health
+    @app.get("/ready")
+    def ready():
+        report = state.report()
+        return JSONResponse(report, status_code=200 if state.ready else 503)
+
+    @app.get("/api/db/replicas")
+    def replicas():
+        return db.replica_report()
+
+    @app.get("/api/cache/bus")
+    def cache_bus_stats():
+        return cache_bus.stats()
+
+    @app.get("/api/cache/responses")
+    def response_cache_stats():
+        return compression.stats()
+
+    @app.get("/api/cache/singleflight")
+    def singleflight_stats():
+        return singleflight.stats()
+
+    @app.get("/api/idempotency")
+    def idempotency_stats():
+        return idempotency.stats()
+
+    @app.get("/api/journal")
+    def journal_stats():
+        return journal.stats()
+
+    @app.get("/api/sync/stats")
+    def sync_stats():
+        return sync_log.stats()
+
+    @app.get("/api/dashboard")
+    def dashboard_stats():
+        return dashboard.stats()
+
+    return app
+
+app = create_app()
 
 # ---- Dev runner ----
 if __name__ == "__main__":
@@ -0,0 +1,299 @@
+# migrations.py — Versioned schema migrations + index checks for the tables the app owns
+# Applied versions are recorded in `schema_migrations`. Every migration is idempotent
+# (CREATE ... IF NOT EXISTS / create an index only when no index already starts with the
+# same columns), so re-running one after a partial failure is safe. Table and column
+# names come from the same resolvers the routers use.
+#
+# Run:
+#   python migrations.py migrate               # apply pending versions
+#   python migrations.py status                # applied / pending versions + missing indexes
+#   python migrations.py check --min-rows 1000 # EXPLAIN the app's queries; exit 1 on a full scan
+#
+# Against the benchmark schema: MYSQL_DB=FoodCo_Bench python migrations.py check
+
+import os
+import sys
+import argparse
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bom
+import cache_bus
+import etag
+import inventory
+from config import DB_NAME, MIGRATE_ON_STARTUP, MIGRATIONS_CHECK_MIN_ROWS
+from db import get_conn
+import journal
+from repository import repo
+import sync_log
+import transaction
+import user
+
+MIGRATIONS_TABLE = "schema_migrations"
+LOCK_NAME = "foodco_schema_migrations"
+
+DDL = f"""
+CREATE TABLE IF NOT EXISTS `{MIGRATIONS_TABLE}` (
+  Version    INT          NOT NULL PRIMARY KEY,
+  Name       VARCHAR(100) NOT NULL,
+  AppliedAt  DATETIME     NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+# (table, index name, columns)
+IndexSpec = Tuple[str, str, Tuple[str, ...]]
+
+# ================= INDEXES =================
+def table_indexes(cur, table: str) -> Dict[str, Tuple[str, ...]]:
+    """Index name → columns in key order."""
+    cur.execute(
+        "SELECT index_name, column_name FROM information_schema.statistics "
+        "WHERE table_schema=%s AND table_name=%s ORDER BY index_name, seq_in_index",
+        (DB_NAME, table),
+    )
+    out: Dict[str, List[str]] = {}
+    for name, col in cur.fetchall():
+        out.setdefault(name, []).append(col)
+    return {k: tuple(v) for k, v in out.items()}
+
+def has_index(existing: Dict[str, Tuple[str, ...]], columns: Tuple[str, ...]) -> bool:
+    # any index whose leading columns are `columns` serves the same lookups
+    lowered = tuple(c.lower() for c in columns)
+    return any(tuple(c.lower() for c in cols[:len(columns)]) == lowered for cols in existing.values())
+
+def ensure_index(cur, spec: IndexSpec) -> bool:
+    """Create the index unless an equivalent one exists; True when it was created."""
+    table, name, columns = spec
+    if has_index(table_indexes(cur, table), columns):
+        return False
+    cur.execute(f"CREATE INDEX `{name}` ON `{table}` ({', '.join(f'`{c}`' for c in columns)})")
+    return True
+
+def ledger_index_specs() -> List[IndexSpec]:
+    table, c = transaction.get_tx_table_and_cols()
+    specs: List[IndexSpec] = []
+    for t in transaction.tx_tables_for_id(table):
+        specs += [
+            (t, "idx_tx_time", (c['time'],)),
+            (t, "idx_tx_itemtype_time", (c['itemType'], c['time'])),
+            (t, "idx_tx_materials", (c['materialsId'],)),
+            (t, "idx_tx_product", (c['productId'],)),
+            (t, "idx_tx_changedby", (c['changedBy'],)),
+        ]
+    return specs
+
+def user_index_specs(cur) -> List[IndexSpec]:
+    specs: List[IndexSpec] = []
+    for src in user.identity_sources(cur):
+        t = src["table"]
+        specs += [(t, f"idx_{t}_username", (src["username"],)), (t, f"idx_{t}_email", ("Email",))]
+        if src["role"]:
+            specs.append((t, f"idx_{t}_role", (src["role"],)))
+    return specs
+
+def expected_indexes(cur) -> List[IndexSpec]:
+    return ledger_index_specs() + user_index_specs(cur)
+
+def missing_indexes(cur) -> List[IndexSpec]:
+    return [s for s in expected_indexes(cur) if not has_index(table_indexes(cur, s[0]), s[2])]
+
+# ================= MIGRATIONS =================
+def _m1_cache_changes(cur) -> None:
+    cur.execute(cache_bus.DDL)
+
+def _m2_ledger_indexes(cur) -> None:
+    for spec in ledger_index_specs():
+        ensure_index(cur, spec)
+
+def _m3_user_indexes(cur) -> None:
+    for spec in user_index_specs(cur):
+        ensure_index(cur, spec)
+
+def _m4_bill_of_materials(cur) -> None:
+    cur.execute(bom.DDL)
+
+def _m5_tx_journal_applied(cur) -> None:
+    cur.execute(journal.DDL)
+
+def _m6_sync_changes(cur) -> None:
+    cur.execute(sync_log.DDL)
+
+def _m7_row_versions(cur) -> None:
+    # ADD COLUMN with a constant default is an instant (metadata-only) change on MySQL 8
+    table, _ = transaction.get_tx_table_and_cols()
+    tables = [inventory.get_raw_table_and_cols()[0], inventory.get_finished_table_and_cols()[0],
+              table, transaction.get_archive_table(table)]
+    for t in filter(None, tables):
+        if not etag.find_version_column(cur, t):
+            cur.execute(f"ALTER TABLE `{t}` ADD COLUMN RowVersion INT NOT NULL DEFAULT 0")
+
+def _m8_ledger_archive(cur) -> None:
+    # LIKE copies columns (RowVersion included) and indexes, not foreign keys: archived rows
+    # may outlive their item
+    table, _ = transaction.get_tx_table_and_cols()
+    repo.create_table_like(cur, table + transaction.ARCHIVE_SUFFIX, table)
+
+def _m9_cache_changes_origin(cur) -> None:
+    if "origin" not in {c.lower() for c in repo.column_names(cur, cache_bus.CHANGES_TABLE)}:
+        cur.execute(f"ALTER TABLE `{cache_bus.CHANGES_TABLE}` ADD COLUMN Origin VARCHAR(64) NULL AFTER Op")
+
+# Append only: never renumber or edit an applied version, add a new one instead
+MIGRATIONS: List[Tuple[int, str, Callable[[Any], None]]] = [
+    (1, "cache_changes table", _m1_cache_changes),
+    (2, "ledger filter indexes (time, ItemType, MaterialsId, ProductId, ChangedBy)", _m2_ledger_indexes),
+    (3, "user identity indexes (UserName, Email, RoleID)", _m3_user_indexes),
+    (4, "bill_of_materials table", _m4_bill_of_materials),
+    (5, "tx_journal_applied table (write-behind journal replay)", _m5_tx_journal_applied),
+    (6, "sync_changes table (delta sync change log)", _m6_sync_changes),
+    (7, "RowVersion on items and transactions (ETag / If-Match)", _m7_row_versions),
+    (8, "ledger archive table (ledger.py roll)", _m8_ledger_archive),
+    (9, "cache_changes.Origin (skip a worker's own events)", _m9_cache_changes_origin),
+]
+
+def applied_versions(cur) -> Dict[int, str]:
+    cur.execute(DDL)
+    cur.execute(f"SELECT Version, Name FROM `{MIGRATIONS_TABLE}`")
+    return {int(v): n for v, n in cur.fetchall()}
+
+def pending(cur) -> List[Tuple[int, str, Callable[[Any], None]]]:
+    done = applied_versions(cur)
+    return [m for m in MIGRATIONS if m[0] not in done]
+
+def migrate() -> List[int]:
+    """Apply pending migrations in order (one process at a time); returns the versions applied."""
+    applied: List[int] = []
+    conn = get_conn(); cur = conn.cursor()
+    try:
+        cur.execute("SELECT GET_LOCK(%s, 60)", (LOCK_NAME,))
+        if cur.fetchall()[0][0] != 1:
+            raise RuntimeError("Another process is running migrations")
+        try:
+            for version, name, fn in pending(cur):
+                print(f"[migrations] applying {version}: {name}")
+                fn(cur)   # DDL commits implicitly; each step is idempotent
+                cur.execute(f"INSERT INTO `{MIGRATIONS_TABLE}` (Version, Name) VALUES (%s, %s)", (version, name))
+                applied.append(version)
+        finally:
+            cur.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+            cur.fetchall()
+    finally:
+        cur.close(); conn.close()
+    if applied:
+        cache_bus.publish("schema")
+    return applied
+
+def status() -> Dict[str, Any]:
+    conn = get_conn(); cur = conn.cursor()
+    try:
+        done = applied_versions(cur)
+        missing = missing_indexes(cur)
+    finally:
+        cur.close(); conn.close()
+    return {
+        "applied": sorted(done),
+        "pending": [v for v, _, _ in MIGRATIONS if v not in done],
+        "missing_indexes": [f"{t}({', '.join(cols)})" for t, _, cols in missing],
+    }
+
+def warm_up() -> None:
+    """Apply (MIGRATE_ON_STARTUP=1) or just report pending migrations and missing indexes."""
+    if repo.creates_schema:
+        return   # e.g. SQLite: sqlite_backend.SCHEMA already has every table and index
+    if MIGRATE_ON_STARTUP:
+        migrate()
+        return
+    try:
+        report = status()
+    except Exception as e:
+        # reporting only: an account without DDL rights must not keep the app from starting
+        print("[migrations] status unavailable:", getattr(e, "msg", e))
+        return
+    if report["pending"] or report["missing_indexes"]:
+        print("[migrations] schema is behind — run `python migrations.py migrate`:", report)
+
+# ================= EXPLAIN CHECK =================
+def app_queries(cur) -> List[Tuple[str, str, Tuple[Any, ...]]]:
+    """(label, SQL, params) for the filtered reads the routers actually issue."""
+    table, c = transaction.get_tx_table_and_cols()
+    now = datetime.now()
+    week = (now - timedelta(days=7), now + timedelta(days=1))
+    exprs = [(f"`{c[k]}`", name) for k, (name, _) in zip(transaction.TX_COLUMN_KEYS, transaction.TX_FIELDS)]
+    item_type = (transaction.get_item_type_enum(table, c['itemType']) or ["RawMaterials"])[0]
+
+    def tx_list(label: str, conds: List[str], vals: List[Any]) -> Tuple[str, str, Tuple[Any, ...]]:
+        # same tier choice and SQL as list_transactions (from/to are plain ranges there too)
+        tables = transaction.tx_tables(table, c, week[0], week[1])
+        q, params = transaction.tiered_select(tables, exprs, c['id'], "WHERE " + " AND ".join(conds), vals)
+        return label, q, params
+
+    time_range = [f"`{c['time']}` >= %s", f"`{c['time']}` < %s"]
+    queries = [
+        tx_list("transactions: last 7 days", time_range, list(week)),
+        tx_list("transactions: item_type + last 7 days", [f"`{c['itemType']}`=%s"] + time_range, [item_type, *week]),
+        tx_list("transactions: changed_by + last 7 days", [f"`{c['changedBy']}`=%s"] + time_range, [1, *week]),
+    ]
+
+    login_sql = user.identity_login_sql(cur)
+    if login_sql:
+        queries.append(("login: username or email", login_sql, ("bench_user",) * login_sql.count("%s")))
+    for src in user.identity_sources(cur):
+        t = src["table"]
+        queries.append((f"{t}: username/email taken", user.identity_exists_sql(src), ("bench_user", "x@example.com")))
+        queries.append((f"{t}: directory q=prefix",
+                        user.build_user_list_sql(cur, t, "({username} LIKE %s OR {email} LIKE %s)", limit=101),
+                        ("ben%", "ben%")))
+        if src["role"]:
+            queries.append((f"{t}: directory role_id",
+                            user.build_user_list_sql(cur, t, "{role_id} = %s", limit=101), (1,)))
+    return queries
+
+def explain(cur, sql: str, params: Tuple[Any, ...]) -> List[Dict[str, Any]]:
+    cur.execute("EXPLAIN " + sql, params)
+    names = [n.lower() for n in cur.column_names]
+    return [dict(zip(names, r)) for r in cur.fetchall()]
+
+def full_scans(plan: List[Dict[str, Any]], min_rows: int) -> List[Dict[str, Any]]:
+    # derived/union result tables are in-memory, only base tables count
+    return [p for p in plan
+            if str(p.get("type") or "").upper() == "ALL"
+            and not str(p.get("table") or "").startswith("<")
+            and int(p.get("rows") or 0) >= min_rows]
+
+def check(min_rows: int = MIGRATIONS_CHECK_MIN_ROWS) -> int:
+    conn = get_conn(); cur = conn.cursor()
+    failures = 0
+    try:
+        for label, sql, params in app_queries(cur):
+            plan = explain(cur, sql, params)
+            bad = full_scans(plan, min_rows)
+            keys = ", ".join(f"{p.get('table')}:{p.get('key') or p.get('type')}" for p in plan)
+            print(f"{'FAIL' if bad else 'ok  '}  {label:<44} {keys}")
+            for p in bad:
+                print(f"        full scan of {p.get('table')} (~{p.get('rows')} rows)")
+            failures += bool(bad)
+    finally:
+        cur.close(); conn.close()
+    return 1 if failures else 0
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Schema migrations and index checks")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("migrate", help="apply pending migrations")
+    sub.add_parser("status", help="applied/pending versions and missing indexes")
+    ck = sub.add_parser("check", help="EXPLAIN the app's queries; exit 1 on a full table scan")
+    ck.add_argument("--min-rows", type=int, default=MIGRATIONS_CHECK_MIN_ROWS,
+                    help="ignore scans estimated below this many rows (tiny tables)")
+    args = ap.parse_args()
+
+    if args.cmd == "migrate":
+        print({"applied": migrate()})
+        return 0
+    if args.cmd == "status":
+        print(status())
+        return 0
+    return check(args.min_rows)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+# reorder.py — Suggested reorder points / safety stock from the Export history (NumPy)
+# One grouped query per item kind returns (item id, day offset, qty exported that day) for
+# the lookback window; everything after that is array math over all items at once:
+#   μ, σ  = daily mean / standard deviation of exports (days without exports count as 0)
+#   safety stock  = z · σ · √L          (L = lead time in days, z from the service level)
+#   reorder point = μ · L + safety stock
+# GET /api/reorder/suggestions lists them; POST /api/reorder/apply writes them to Lowstock.
+
+from datetime import date, datetime, time, timedelta
+from statistics import NormalDist
+from typing import Any, Dict, List, Literal, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from pydantic import BaseModel, Field
+
+try:
+    import numpy as np  # optional: pip install numpy
+except ImportError:
+    np = None
+
+import cache_bus
+import etag
+from auth import require_perm
+from compression import cached
+from config import REORDER_LOOKBACK_DAYS, REORDER_LEAD_DAYS, REORDER_SERVICE_LEVEL, REORDER_UPDATE_CHUNK
+from db import get_conn
+from fastjson import compile_row_encoder, encode_rows, json_bytes_response
+import batch
+import inventory
+import sync_log
+import transaction
+
+router = APIRouter()
+
+ItemKind = Literal["Raw", "Finished"]
+KINDS: Tuple[ItemKind, ...] = ("Raw", "Finished")
+
+REORDER_FIELDS = [
+    ("ItemType", "str"), ("ItemID", "int"), ("ItemName", "str"), ("Quantity", "int"), ("Lowstock", "int"),
+    ("DailyMean", "float"), ("DailyStd", "float"), ("SafetyStock", "int"), ("ReorderPoint", "int"),
+    ("DaysOfCover", "float"),
+]
+encode_reorder_row = compile_row_encoder(REORDER_FIELDS, name="encode_reorder_row")
+
+def _require_numpy() -> None:
+    if np is None:
+        raise HTTPException(status_code=503, detail="Reorder engine needs NumPy (pip install numpy)")
+
+def _item_table(kind: ItemKind) -> Tuple[str, Dict[str, str]]:
+    return inventory.get_raw_table_and_cols() if kind == "Raw" else inventory.get_finished_table_and_cols()
+
+# ================= ENGINE =================
+def compute(item_ids: "np.ndarray", ex_ids: "np.ndarray", ex_day: "np.ndarray", ex_qty: "np.ndarray",
+            days: int, lead_days: float, z: float, merged: bool = False) -> Dict[str, "np.ndarray"]:
+    """
+    Per-item statistics, aligned with `item_ids` (sorted ascending). ex_* are exports summed
+    per (item, day offset in [0, days)); with `merged` (several ledger tiers concatenated) a
+    pair may repeat and is summed first.
+    """
+    n = len(item_ids)
+    mean = np.zeros(n)
+    var = np.zeros(n)
+    if n and len(ex_ids):
+        pos = np.searchsorted(item_ids, ex_ids)
+        pos_c = np.minimum(pos, n - 1)
+        known = item_ids[pos_c] == ex_ids            # exports of deleted items are ignored
+        pos_c, day, qty = pos_c[known], ex_day[known], ex_qty[known]
+        if merged:
+            key, inv = np.unique(pos_c * days + day, return_inverse=True)
+            daily = np.bincount(inv, weights=qty)    # one value per (item, day)
+            owner = key // days
+        else:
+            daily, owner = qty, pos_c
+        total = np.bincount(owner, weights=daily, minlength=n)
+        total_sq = np.bincount(owner, weights=daily * daily, minlength=n)
+        mean = total / days
+        var = np.maximum(total_sq / days - mean * mean, 0.0)
+        if days > 1:
+            var *= days / (days - 1)                 # sample variance
+    std = np.sqrt(var)
+    safety = z * std * np.sqrt(lead_days)
+    return {
+        "mean": mean,
+        "std": std,
+        "safety": np.ceil(safety - 1e-9).astype(np.int64),
+        "reorder": np.ceil(mean * lead_days + safety - 1e-9).astype(np.int64),
+    }
+
+def _window(days: int) -> Tuple[datetime, datetime]:
+    end = datetime.combine(date.today() + timedelta(days=1), time.min)
+    return end - timedelta(days=days), end
+
+def load_exports(kind: ItemKind, days: int) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray", bool]:
+    """(item ids, day offsets, qty, merged) of Export movements per item and day, from every tier in range."""
+    table, c = transaction.get_tx_table_and_cols()
+    item_col = c['materialsId'] if kind == "Raw" else c['productId']
+    start, end = _window(days)
+    rows: List[Tuple] = []
+    tables = transaction.tx_tables(table, c, start, end)
+    conn = get_conn(read_only=True); cur = conn.cursor()
+    try:
+        for t in tables:
+            # + 0E0 → DOUBLE, so the driver hands back floats instead of Decimals
+            cur.execute(
+                f"SELECT `{item_col}`, DATEDIFF(%s, `{c['time']}`) - 1, SUM(`{c['qty']}`) + 0E0 FROM `{t}` "
+                f"WHERE `{c['txType']}`='Export' AND `{c['time']}` >= %s AND `{c['time']}` < %s "
+                f"AND `{item_col}` IS NOT NULL GROUP BY 1, 2",
+                (end, start, end),
+            )
+            rows.extend(cur.fetchall())
+    finally:
+        cur.close(); conn.close()
+    arr = np.array(rows, dtype=np.float64).reshape(-1, 3)
+    day = np.clip(arr[:, 1].astype(np.int64), 0, days - 1)
+    return arr[:, 0].astype(np.int64), day, arr[:, 2], len(tables) > 1
+
+def load_items(kind: ItemKind) -> Tuple["np.ndarray", List[Tuple]]:
+    table, c = _item_table(kind)
+    conn = get_conn(read_only=True); cur = conn.cursor()
+    try:
+        cur.execute(f"SELECT `{c['id']}`, `{c['name']}`, `{c['quantity']}`, `{c['low']}` FROM `{table}` ORDER BY `{c['id']}`")
+        rows = cur.fetchall()
+    finally:
+        cur.close(); conn.close()
+    return np.array([r[0] for r in rows], dtype=np.int64), rows
+
+def suggestions(kind: ItemKind, days: int, lead_days: float, service_level: float) -> List[Tuple]:
+    """REORDER_FIELDS rows for every item of `kind`."""
+    _require_numpy()
+    z = NormalDist().inv_cdf(service_level)
+    ids, items = load_items(kind)
+    ex_ids, ex_day, ex_qty, merged = load_exports(kind, days)
+    stats = compute(ids, ex_ids, ex_day, ex_qty, days=days, lead_days=lead_days, z=z, merged=merged)
+    mean = np.round(stats["mean"], 4).tolist()
+    std = np.round(stats["std"], 4).tolist()
+    out = []
+    for (item_id, name, qty, low), m, s, ss, rp in zip(items, mean, std, stats["safety"].tolist(), stats["reorder"].tolist()):
+        cover = round(float(qty) / m, 1) if m > 0 and qty is not None else None
+        out.append((kind, item_id, name, qty, low, m, s, ss, rp, cover))
+    return out
+
+def write_back(kind: ItemKind, rows: List[Tuple], only_unset: bool) -> int:
+    """Lowstock := ReorderPoint where it differs (or only where Lowstock is NULL); chunked CASE updates."""
+    changes = [(r[1], r[8]) for r in rows if (r[4] is None if only_unset else r[4] != r[8])]
+    if not changes:
+        return 0
+    table, c = _item_table(kind)
+    bump = "".join(", " + b for b in etag.bump(c))
+    conn = get_conn(autocommit=False); cur = conn.cursor()
+    try:
+        for i in range(0, len(changes), REORDER_UPDATE_CHUNK):
+            part = changes[i:i + REORDER_UPDATE_CHUNK]
+            cases = " ".join(["WHEN %s THEN %s"] * len(part))
+            params = [v for pair in part for v in pair] + [item_id for item_id, _ in part]
+            cur.execute(
+                f"UPDATE `{table}` SET `{c['low']}` = CASE `{c['id']}` {cases} END{bump} "
+                f"WHERE {batch.in_clause(c['id'], len(part))}",
+                tuple(params),
+            )
+            sync_log.record(cur, [(inventory.ITEM_SCOPES[kind], item_id, "U") for item_id, _ in part])
+            conn.commit()   # one DB transaction per chunk, with its sync_log rows
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close(); conn.close()
+    cache_bus.publish(inventory.ITEM_SCOPES[kind])   # whole table: many rows changed
+    return len(changes)
+
+# ================= ROUTES =================
+class ReorderApply(BaseModel):
+    type: Optional[ItemKind] = None
+    lookback_days: int = Field(REORDER_LOOKBACK_DAYS, ge=7, le=730)
+    lead_days: float = Field(REORDER_LEAD_DAYS, gt=0, le=365)
+    service_level: float = Field(REORDER_SERVICE_LEVEL, gt=0.5, lt=1)
+    only_unset: bool = Field(False, description="Fill only items whose Lowstock is NULL")
+
+@router.get("/api/reorder/suggestions", dependencies=[require_perm("inventory:read")])
+def reorder_suggestions(
+    request: Request,
+    type: Optional[ItemKind] = Query(None),
+    lookback_days: int = Query(REORDER_LOOKBACK_DAYS, ge=7, le=730),
+    lead_days: float = Query(REORDER_LEAD_DAYS, gt=0, le=365),
+    service_level: float = Query(REORDER_SERVICE_LEVEL, gt=0.5, lt=1),
+):
+    kinds = (type,) if type else KINDS
+
+    def build():
+        rows: List[Tuple] = []
+        for k in kinds:
+            rows.extend(suggestions(k, lookback_days, lead_days, service_level))
+        return json_bytes_response(encode_rows(encode_reorder_row, rows))
+
+    return cached(request, ("transactions",) + tuple(inventory.ITEM_SCOPES[k] for k in kinds), build)
+
+@router.post("/api/reorder/apply", dependencies=[require_perm("inventory:write")])
+def reorder_apply(payload: ReorderApply) -> Dict[str, Any]:
+    updated: Dict[str, int] = {}
+    for k in ((payload.type,) if payload.type else KINDS):
+        rows = suggestions(k, payload.lookback_days, payload.lead_days, payload.service_level)
+        updated[k] = write_back(k, rows, payload.only_unset)
+    return {"updated": updated}
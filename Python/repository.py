@@ -0,0 +1,169 @@
+# repository.py — Storage backend under the inventory / transaction / user handlers
+# The handlers keep their SQL, written in the subset MySQL and SQLite share (backtick names,
+# %s placeholders, LIMIT, UNION ALL). Everything that differs per engine lives here:
+#   open()                          connect / create what the backend needs at warm-up
+#   table_names / column_names      schema introspection (information_schema vs sqlite_master)
+#   enum_values / primary_key
+#   create_table_like               empty copy of a table (ledger archive tier)
+#   union_member / like_escape      dialect fragments
+#   for_update / now_ms
+# `repo` is the backend chosen by DB_BACKEND; db.get_conn() hands out its connections.
+
+import re
+from abc import ABC, abstractmethod
+from typing import List
+
+from config import DB_BACKEND, DB_NAME
+import db
+import sqlite_backend
+
+BACKENDS = ("mysql", "sqlite")
+if DB_BACKEND not in BACKENDS:
+    raise ValueError(f"DB_BACKEND must be one of {BACKENDS}, got '{DB_BACKEND}'")
+
+def parse_enum(text: str) -> List[str]:
+    """"'a','b'" (the inside of ENUM(...) or IN (...)) → ['a', 'b']."""
+    vals = []
+    cur_val = []
+    in_quote = False
+    for ch in text:
+        if ch == "'":
+            in_quote = not in_quote
+            continue
+        if ch == "," and not in_quote:
+            vals.append("".join(cur_val).strip())
+            cur_val = []
+        else:
+            cur_val.append(ch)
+    if cur_val:
+        vals.append("".join(cur_val).strip())
+    return [v for v in vals if v]
+
+def first(row):
+    """First column of a row from a tuple or a dictionary cursor (handlers pass either)."""
+    return next(iter(row.values())) if isinstance(row, dict) else row[0]
+
+class Repository(ABC):
+    name = ""
+    creates_schema = False        # True: the backend creates every table itself (no migrations.py)
+    for_update = " FOR UPDATE"    # row locks for read-then-write transactions
+    like_escape = ""              # appended after LIKE %s when the pattern escapes with backslash
+    now_ms = "CURRENT_TIMESTAMP(3)"   # the database's clock (one clock for every worker), in ms
+
+    @abstractmethod
+    def open(self) -> None:
+        ...
+
+    @abstractmethod
+    def table_names(self, cur) -> List[str]:
+        ...
+
+    @abstractmethod
+    def column_names(self, cur, table: str) -> List[str]:
+        ...
+
+    @abstractmethod
+    def enum_values(self, cur, table: str, column: str) -> List[str]:
+        ...
+
+    @abstractmethod
+    def primary_key(self, cur, table: str) -> str:
+        ...
+
+    @abstractmethod
+    def create_table_like(self, cur, table: str, source: str) -> None:
+        ...
+
+    def union_member(self, select_sql: str) -> str:
+        """A SELECT with its own ORDER BY/LIMIT, usable as one branch of a UNION ALL."""
+        return f"({select_sql})"
+
+class MySQLRepository(Repository):
+    name = "mysql"
+    # MySQL's default LIKE escape character is already backslash
+
+    def open(self) -> None:
+        db.open_pool()
+
+    def table_names(self, cur) -> List[str]:
+        cur.execute("SELECT table_name FROM information_schema.tables WHERE table_schema=%s", (DB_NAME,))
+        return [first(r) for r in cur.fetchall()]
+
+    def column_names(self, cur, table: str) -> List[str]:
+        cur.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_schema=%s AND table_name=%s "
+            "ORDER BY ordinal_position",
+            (DB_NAME, table),
+        )
+        return [first(r) for r in cur.fetchall()]
+
+    def enum_values(self, cur, table: str, column: str) -> List[str]:
+        cur.execute(
+            "SELECT COLUMN_TYPE FROM information_schema.columns "
+            "WHERE table_schema=%s AND table_name=%s AND column_name=%s",
+            (DB_NAME, table, column),
+        )
+        row = cur.fetchone()
+        s = (first(row) or "").strip() if row else ""  # e.g. "enum('RawMaterial','FinishedProduct')"
+        if not s.lower().startswith("enum(") or not s.endswith(")"):
+            return []
+        return parse_enum(s[s.find("(") + 1:-1])
+
+    def primary_key(self, cur, table: str) -> str:
+        cur.execute(f"SHOW KEYS FROM `{table}` WHERE Key_name='PRIMARY'")
+        rows = cur.fetchall()
+        if not rows:
+            return ""
+        row = rows[0]
+        return row.get("Column_name", "") if isinstance(row, dict) else row[4]
+
+    def create_table_like(self, cur, table: str, source: str) -> None:
+        # LIKE copies columns and indexes, not foreign keys
+        cur.execute(f"CREATE TABLE IF NOT EXISTS `{table}` LIKE `{source}`")
+
+class SQLiteRepository(Repository):
+    name = "sqlite"
+    creates_schema = True         # sqlite_backend.SCHEMA
+    for_update = ""               # one writer at a time: the whole database is the lock
+    like_escape = " ESCAPE '\\'"
+    now_ms = "strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')"
+
+    def open(self) -> None:
+        sqlite_backend.open_db()
+
+    def table_names(self, cur) -> List[str]:
+        cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite\\_%' ESCAPE '\\'")
+        return [first(r) for r in cur.fetchall()]
+
+    def column_names(self, cur, table: str) -> List[str]:
+        cur.execute("SELECT name FROM pragma_table_info(%s) ORDER BY cid", (table,))
+        return [first(r) for r in cur.fetchall()]
+
+    def enum_values(self, cur, table: str, column: str) -> List[str]:
+        # ENUM columns are declared as CHECK (<column> IN ('a','b'))
+        cur.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name=%s", (table,))
+        row = cur.fetchone()
+        m = re.search(rf"CHECK\s*\(\s*[`\"]?{re.escape(column)}[`\"]?\s+IN\s*\(([^)]*)\)", first(row) if row else "", re.I)
+        return parse_enum(m.group(1)) if m else []
+
+    def primary_key(self, cur, table: str) -> str:
+        cur.execute("SELECT name FROM pragma_table_info(%s) WHERE pk=1", (table,))
+        row = cur.fetchone()
+        return first(row) if row else ""
+
+    def create_table_like(self, cur, table: str, source: str) -> None:
+        # same column declarations (and so the same DATETIME/DATE conversions) under the new name
+        cur.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name=%s", (source,))
+        row = cur.fetchone()
+        if not row:
+            cur.execute(f"SELECT * FROM `{source}` LIMIT 0")   # raises "no such table"
+            return
+        sql = first(row)
+        body = sql[sql.index("("):]
+        cur.execute(f"CREATE TABLE IF NOT EXISTS `{table}` {body}")
+
+    def union_member(self, select_sql: str) -> str:
+        # SQLite rejects parenthesised compound members; a subquery keeps the inner LIMIT
+        return f"SELECT * FROM ({select_sql})"
+
+repo: Repository = SQLiteRepository() if DB_BACKEND == "sqlite" else MySQLRepository()
@@ -0,0 +1,75 @@
+# singleflight.py — Coalesce identical concurrent reads into one build
+# While build() for a key is running, other callers with the same key wait for it (at most
+# SINGLEFLIGHT_MAX_WAIT_MS) and share its result, or its exception, instead of running the
+# same queries again. Nothing is kept once the flight lands: reuse over time is the response
+# cache's job (compression.cached, which calls do() on a miss); this covers the burst before
+# the first result exists, and every request when the cache is bypassed (read replicas).
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from fastapi import Response
+
+from config import SINGLEFLIGHT, SINGLEFLIGHT_MAX_WAIT_MS
+
+class _Flight:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+_flights: Dict[Hashable, _Flight] = {}
+_lock = threading.Lock()
+
+_stats: Dict[str, Any] = {"flights": 0, "coalesced": 0, "timeouts": 0, "shared_errors": 0, "max_waiters": 0}
+
+def _count(name: str) -> None:
+    with _lock:
+        _stats[name] += 1
+
+def do(key: Hashable, build: Callable[[], Any]) -> Tuple[Any, bool]:
+    """build() at most once per key at a time → (result, shared with another caller)."""
+    if not SINGLEFLIGHT:
+        return build(), False
+    with _lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+            _stats["flights"] += 1
+        else:
+            flight.waiters += 1
+    if leader:
+        try:
+            flight.result = build()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with _lock:
+                _flights.pop(key, None)
+                _stats["max_waiters"] = max(_stats["max_waiters"], flight.waiters)
+            flight.done.set()
+        return flight.result, False
+    if not flight.done.wait(SINGLEFLIGHT_MAX_WAIT_MS / 1000.0):
+        _count("timeouts")
+        return build(), False
+    if flight.error is not None:
+        _count("shared_errors")
+        raise flight.error
+    _count("coalesced")
+    return flight.result, True
+
+def copy_response(result: Any) -> Any:
+    """A shared Response gets its own instance per request (headers are mutable); data is shared as is."""
+    if not isinstance(result, Response):
+        return result
+    copy = Response(content=bytes(result.body), status_code=result.status_code)
+    copy.raw_headers = list(result.raw_headers)   # keeps repeated headers (Set-Cookie), unlike a dict
+    return copy
+
+def stats() -> Dict[str, Any]:
+    return {"enabled": SINGLEFLIGHT, "max_wait_ms": SINGLEFLIGHT_MAX_WAIT_MS, "in_flight": len(_flights), **_stats}
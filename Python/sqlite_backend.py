@@ -0,0 +1,328 @@
+# sqlite_backend.py — Embedded SQLite storage behind db.get_conn() (DB_BACKEND=sqlite)
+# Connections look like mysql-connector's to the handlers: %s placeholders, cursor(dictionary=True),
+# column_names, lastrowid of a multi-row INSERT = its first id, DATETIME/DATE columns come back
+# as datetime/date, and sqlite3 errors are re-raised as mysql.connector errors with the matching
+# errno (so `except mysql_errors.Error` and ER_NO_SUCH_TABLE checks keep working). MySQL functions
+# the queries use (DATEDIFF) are registered on every connection.
+#
+# One WAL database file, a small pool of open connections (page cache and prepared statements
+# stay warm), and tuned pragmas. SCHEMA creates every table the app uses on first open, with
+# the names/columns of the MySQL schema (bench_load.SCHEMA) after every migrations.py version,
+# plus roles.Permissions (optional on MySQL, read by auth.compile_matrix when present).
+
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence
+
+from mysql.connector import errors as mysql_errors
+from mysql.connector.errorcode import (ER_BAD_FIELD_ERROR, ER_DUP_ENTRY, ER_LOCK_WAIT_TIMEOUT,
+                                       ER_NO_SUCH_TABLE, ER_PARSE_ERROR)
+
+from config import (SQLITE_PATH, SQLITE_POOL_SIZE, SQLITE_SYNCHRONOUS, SQLITE_CACHE_MB, SQLITE_MMAP_MB,
+                    SQLITE_BUSY_MS)
+
+# ENUMs become CHECK (col IN (...)) — repository.SQLiteRepository.enum_values reads them back.
+# ON UPDATE CURRENT_TIMESTAMP becomes a trigger. Times are local wall clock, like MySQL's NOW().
+_NOW = "(datetime('now', 'localtime'))"
+
+# inventory_transactions and its archive tier
+_LEDGER_COLUMNS = f"""(
+         TransactionID    INTEGER PRIMARY KEY AUTOINCREMENT,
+         TransactionType  TEXT NOT NULL CHECK (TransactionType IN ('Import','Export')),
+         ItemType         TEXT NOT NULL CHECK (ItemType IN ('RawMaterials','FinishedGoods')),
+         MaterialsId      INTEGER NULL,
+         ProductId        INTEGER NULL,
+         Qty              DECIMAL(12,2) NOT NULL,
+         BeforeQty        DECIMAL(12,2) NULL,
+         AfterQty         DECIMAL(12,2) NULL,
+         Note             VARCHAR(255) NULL,
+         ChangedBy        INTEGER NOT NULL,
+         TimeUpdate       DATETIME NOT NULL DEFAULT {_NOW},
+         RowVersion       INTEGER NOT NULL DEFAULT 0
+       )"""
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS roles (
+         RoleID       INTEGER PRIMARY KEY AUTOINCREMENT,
+         RoleName     VARCHAR(50) NOT NULL,
+         Permissions  VARCHAR(255) NULL
+       )""",
+    """CREATE TABLE IF NOT EXISTS users (
+         UserID        INTEGER PRIMARY KEY AUTOINCREMENT,
+         UserName      VARCHAR(30)  NOT NULL UNIQUE COLLATE NOCASE,
+         PhoneNumber   VARCHAR(20)  NULL,
+         Email         VARCHAR(100) NOT NULL UNIQUE COLLATE NOCASE,
+         PasswordHash  CHAR(64)     NOT NULL,
+         BirthDate     DATE         NULL,
+         RoleID        INTEGER      NULL,
+         IsActive      INTEGER      NOT NULL DEFAULT 1
+       )""",
+    "CREATE INDEX IF NOT EXISTS idx_users_role ON users (RoleID)",
+    f"""CREATE TABLE IF NOT EXISTS RawMaterials (
+         MaterialsId    INTEGER PRIMARY KEY AUTOINCREMENT,
+         MaterialsName  VARCHAR(100) NOT NULL,
+         Quantity       INTEGER      NOT NULL DEFAULT 0,
+         LowStock       INTEGER      NULL,
+         Unit           VARCHAR(10)  NOT NULL,
+         TimeUpdate     DATETIME     NOT NULL DEFAULT {_NOW},
+         RowVersion     INTEGER      NOT NULL DEFAULT 0
+       )""",
+    f"""CREATE TABLE IF NOT EXISTS FinishedGoods (
+         ProductId    INTEGER PRIMARY KEY AUTOINCREMENT,
+         ProductName  VARCHAR(100) NOT NULL,
+         Quantity     INTEGER      NOT NULL DEFAULT 0,
+         LowStock     INTEGER      NULL,
+         TimeUpdate   DATETIME     NOT NULL DEFAULT {_NOW},
+         RowVersion   INTEGER      NOT NULL DEFAULT 0
+       )""",
+    f"CREATE TABLE IF NOT EXISTS inventory_transactions {_LEDGER_COLUMNS}",
+    # same filter indexes as migrations.py versions 2 and 3
+    "CREATE INDEX IF NOT EXISTS idx_tx_time ON inventory_transactions (TimeUpdate)",
+    "CREATE INDEX IF NOT EXISTS idx_tx_itemtype_time ON inventory_transactions (ItemType, TimeUpdate)",
+    "CREATE INDEX IF NOT EXISTS idx_tx_materials ON inventory_transactions (MaterialsId)",
+    "CREATE INDEX IF NOT EXISTS idx_tx_product ON inventory_transactions (ProductId)",
+    "CREATE INDEX IF NOT EXISTS idx_tx_changedby ON inventory_transactions (ChangedBy)",
+    # ledger.py roll target (migrations.py version 8 on MySQL): same columns and indexes
+    f"CREATE TABLE IF NOT EXISTS inventory_transactions_archive {_LEDGER_COLUMNS}",
+    "CREATE INDEX IF NOT EXISTS idx_txa_time ON inventory_transactions_archive (TimeUpdate)",
+    "CREATE INDEX IF NOT EXISTS idx_txa_itemtype_time ON inventory_transactions_archive (ItemType, TimeUpdate)",
+    "CREATE INDEX IF NOT EXISTS idx_txa_materials ON inventory_transactions_archive (MaterialsId)",
+    "CREATE INDEX IF NOT EXISTS idx_txa_product ON inventory_transactions_archive (ProductId)",
+    "CREATE INDEX IF NOT EXISTS idx_txa_changedby ON inventory_transactions_archive (ChangedBy)",
+    """CREATE TABLE IF NOT EXISTS bill_of_materials (
+         ProductId    INTEGER       NOT NULL,
+         MaterialsId  INTEGER       NOT NULL,
+         QtyPerUnit   DECIMAL(12,4) NOT NULL,
+         PRIMARY KEY (ProductId, MaterialsId)
+       )""",
+    "CREATE INDEX IF NOT EXISTS idx_bom_material ON bill_of_materials (MaterialsId)",
+    f"""CREATE TABLE IF NOT EXISTS tx_journal_applied (
+         JournalId      VARCHAR(64) NOT NULL PRIMARY KEY,
+         TransactionID  INTEGER     NOT NULL,
+         AppliedAt      DATETIME    NOT NULL DEFAULT {_NOW}
+       )""",
+    """CREATE TABLE IF NOT EXISTS sync_changes (
+         Seq        INTEGER     PRIMARY KEY AUTOINCREMENT,
+         Entity     VARCHAR(32) NOT NULL,
+         EntityId   INTEGER     NOT NULL,
+         Op         CHAR(1)     NOT NULL,
+         CreatedAt  DATETIME    NOT NULL
+       )""",
+    "CREATE INDEX IF NOT EXISTS idx_sync_changes_created ON sync_changes (CreatedAt)",
+]
+# Columns added after a file may already exist (CREATE TABLE IF NOT EXISTS skips it): the
+# RowVersion of etag.py (migrations.py version 7 on MySQL)
+ADDED_COLUMNS = [(t, "RowVersion", "INTEGER NOT NULL DEFAULT 0")
+                 for t in ("RawMaterials", "FinishedGoods", "inventory_transactions", "inventory_transactions_archive")]
+for _table, _pk in (("RawMaterials", "MaterialsId"), ("FinishedGoods", "ProductId")):
+    # MySQL's ON UPDATE CURRENT_TIMESTAMP, unless the UPDATE set TimeUpdate itself
+    SCHEMA.append(
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{_table.lower()}_time AFTER UPDATE ON {_table}
+            FOR EACH ROW WHEN NEW.TimeUpdate IS OLD.TimeUpdate
+            BEGIN UPDATE {_table} SET TimeUpdate = {_NOW} WHERE {_pk} = NEW.{_pk}; END"""
+    )
+
+# ================= TYPES =================
+sqlite3.register_adapter(datetime, lambda v: v.isoformat(" "))
+sqlite3.register_adapter(date, lambda v: v.isoformat())
+sqlite3.register_adapter(Decimal, float)
+
+def _to_datetime(b: bytes) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(b.decode())
+    except ValueError:
+        return None
+
+def _to_date(b: bytes) -> Optional[date]:
+    try:
+        return date.fromisoformat(b.decode()[:10])
+    except ValueError:
+        return None
+
+sqlite3.register_converter("DATETIME", _to_datetime)
+sqlite3.register_converter("DATE", _to_date)
+
+# ================= ERRORS =================
+def _translate(e: sqlite3.Error) -> mysql_errors.Error:
+    msg = str(e)
+    low = msg.lower()
+    if isinstance(e, sqlite3.IntegrityError):
+        return mysql_errors.IntegrityError(msg=msg, errno=ER_DUP_ENTRY if "unique" in low else None)
+    if "no such table" in low:
+        return mysql_errors.ProgrammingError(msg=msg, errno=ER_NO_SUCH_TABLE)
+    if "no such column" in low:
+        return mysql_errors.ProgrammingError(msg=msg, errno=ER_BAD_FIELD_ERROR)
+    if "syntax error" in low:
+        return mysql_errors.ProgrammingError(msg=msg, errno=ER_PARSE_ERROR)
+    if "locked" in low or "busy" in low:
+        return mysql_errors.OperationalError(msg=msg, errno=ER_LOCK_WAIT_TIMEOUT)
+    if isinstance(e, sqlite3.OperationalError) and "unable to open" in low:
+        return mysql_errors.InterfaceError(msg=msg)
+    return mysql_errors.DatabaseError(msg=msg)
+
+# %s → ? once per distinct statement (the handlers build a bounded set of them)
+_sql_cache: Dict[str, str] = {}
+
+def _sql(q: str) -> str:
+    out = _sql_cache.get(q)
+    if out is None:
+        out = q.replace("%s", "?")
+        if len(_sql_cache) < 4096:
+            _sql_cache[q] = out
+    return out
+
+_INSERT = re.compile(r"^\s*insert\b", re.I)
+
+# ================= CONNECTIONS =================
+class Cursor:
+    def __init__(self, conn: "Connection", dictionary: bool = False):
+        self._conn = conn
+        self._cur = conn.raw.cursor()
+        self._dictionary = dictionary
+        self.column_names: tuple = ()
+        self.lastrowid: Optional[int] = None
+        self.rowcount = -1
+
+    def execute(self, sql: str, params: Sequence[Any] = ()) -> None:
+        self._conn.begin()
+        try:
+            self._cur.execute(_sql(sql), tuple(params or ()))
+        except sqlite3.Error as e:
+            raise _translate(e) from e
+        self.column_names = tuple(d[0] for d in self._cur.description) if self._cur.description else ()
+        self.rowcount = self._cur.rowcount
+        self.lastrowid = self._cur.lastrowid
+        if self.rowcount > 1 and _INSERT.match(sql):
+            # MySQL reports the FIRST id of a multi-row INSERT; rowids of one statement are consecutive
+            self.lastrowid -= self.rowcount - 1
+
+    def executemany(self, sql: str, seq: Sequence[Sequence[Any]]) -> None:
+        self._conn.begin()
+        try:
+            self._cur.executemany(_sql(sql), seq)
+        except sqlite3.Error as e:
+            raise _translate(e) from e
+        self.column_names = ()
+        self.rowcount = self._cur.rowcount
+        self.lastrowid = self._cur.lastrowid
+
+    def _row(self, r):
+        return dict(zip(self.column_names, r)) if self._dictionary and r is not None else r
+
+    def fetchone(self):
+        return self._row(self._cur.fetchone())
+
+    def fetchall(self) -> List[Any]:
+        rows = self._cur.fetchall()
+        return [dict(zip(self.column_names, r)) for r in rows] if self._dictionary else rows
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self) -> None:
+        self._cur.close()
+
+class Connection:
+    """Pooled sqlite3 connection; autocommit=False opens a transaction on the first statement."""
+
+    def __init__(self, raw: sqlite3.Connection, autocommit: bool = True):
+        self.raw = raw
+        self.autocommit = autocommit
+
+    def begin(self) -> None:
+        if not self.autocommit and not self.raw.in_transaction:
+            self.raw.execute("BEGIN")
+
+    def cursor(self, dictionary: bool = False, **_: Any) -> Cursor:
+        return Cursor(self, dictionary)
+
+    def commit(self) -> None:
+        if self.raw.in_transaction:
+            try:
+                self.raw.execute("COMMIT")
+            except sqlite3.Error as e:
+                raise _translate(e) from e
+
+    def rollback(self) -> None:
+        if self.raw.in_transaction:
+            self.raw.execute("ROLLBACK")
+
+    def close(self) -> None:
+        # like pool_reset_session: nothing left open leaks into the next borrower
+        raw, self.raw = self.raw, None
+        if raw is None:
+            return
+        if raw.in_transaction:
+            raw.execute("ROLLBACK")
+        _release(raw)
+
+_idle: List[sqlite3.Connection] = []
+_idle_lock = threading.Lock()
+_ready = False
+_stats = {"opened": 0, "reused": 0}
+
+def _datediff(a: Any, b: Any) -> Optional[int]:
+    """MySQL DATEDIFF(a, b): whole days between the date parts (reorder.load_exports)."""
+    if a is None or b is None:
+        return None
+    return (date.fromisoformat(str(a)[:10]) - date.fromisoformat(str(b)[:10])).days
+
+def _new_raw() -> sqlite3.Connection:
+    raw = sqlite3.connect(SQLITE_PATH, isolation_level=None, check_same_thread=False,
+                          detect_types=sqlite3.PARSE_DECLTYPES, timeout=SQLITE_BUSY_MS / 1000.0)
+    raw.create_function("DATEDIFF", 2, _datediff, deterministic=True)
+    raw.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    raw.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_MB * 1024}")   # negative = KiB
+    raw.execute(f"PRAGMA mmap_size={SQLITE_MMAP_MB * 1024 * 1024}")
+    raw.execute("PRAGMA temp_store=MEMORY")
+    raw.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_MS}")
+    _stats["opened"] += 1
+    return raw
+
+def _release(raw: sqlite3.Connection) -> None:
+    with _idle_lock:
+        if len(_idle) < SQLITE_POOL_SIZE:
+            _idle.append(raw)
+            return
+    raw.close()
+
+def open_db() -> str:
+    """Create the file and schema once (idempotent); returns the database path."""
+    global _ready
+    if not _ready:
+        with _idle_lock:
+            if not _ready:
+                try:
+                    raw = _new_raw()
+                    raw.execute("PRAGMA journal_mode=WAL")   # persistent: readers never block the writer
+                    for ddl in SCHEMA:
+                        raw.execute(ddl)
+                    for table, col, decl in ADDED_COLUMNS:
+                        have = {r[0].lower() for r in raw.execute("SELECT name FROM pragma_table_info(?)", (table,))}
+                        if have and col.lower() not in have:
+                            raw.execute(f"ALTER TABLE {table} ADD COLUMN {col} {decl}")
+                    raw.execute("PRAGMA optimize")
+                except sqlite3.Error as e:
+                    raise _translate(e) from e
+                _idle.append(raw)
+                _ready = True
+    return SQLITE_PATH
+
+def connect(autocommit: bool = True) -> Connection:
+    open_db()
+    with _idle_lock:
+        raw = _idle.pop() if _idle else None
+    if raw is None:
+        try:
+            raw = _new_raw()
+        except sqlite3.Error as e:
+            raise _translate(e) from e
+    else:
+        _stats["reused"] += 1
+    return Connection(raw, autocommit)
+
+def stats() -> Dict[str, Any]:
+    return {"path": SQLITE_PATH, "idle": len(_idle), **_stats}
@@ -0,0 +1,69 @@
+# sync.py — Delta sync for offline-capable clients: GET /api/sync?since=<cursor>
+# 1. GET /api/sync (no since) → {"cursor": N, "reset": true}; download the full lists after it
+# 2. GET /api/sync?since=N     → what changed after N, per entity:
+#      {"cursor": M, "more": false,
+#       "raw_materials":  {"upserts": [RAW_FIELDS rows], "deletes": [ids]},
+#       "finished_goods": {...}, "transactions": {...}}
+#    Several changes to one id collapse into its current row (or a delete). Repeat with
+#    since=M while "more" is true. 410 = the cursor is older than the kept log → step 1.
+
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Query
+
+from auth import require_perm
+from config import SYNC_PAGE_SIZE
+from fastjson import encode_rows, json_bytes_response
+import inventory
+import sync_log
+import transaction
+
+router = APIRouter()
+
+def _collapse(rows: List[Tuple[int, str, int, str]]) -> Dict[str, Tuple[List[int], List[int]]]:
+    """entity → (ids to re-read, ids deleted); the last op per id wins."""
+    last: Dict[str, Dict[int, str]] = {e: {} for e in sync_log.ENTITIES}
+    for _, entity, entity_id, op in rows:
+        if entity in last:
+            ops = last[entity]
+            ops.pop(int(entity_id), None)   # re-insert so dict order follows the latest change
+            ops[int(entity_id)] = op
+    return {e: ([i for i, op in ops.items() if op != "D"], [i for i, op in ops.items() if op == "D"])
+            for e, ops in last.items()}
+
+def _section(entity: str, upsert_ids: List[int], deletes: List[int]) -> bytes:
+    rows: List[tuple] = []
+    if upsert_ids:
+        if entity == "transactions":
+            rows, gone = transaction.fetch_tx_by_ids(upsert_ids)
+            data = encode_rows(transaction.encode_tx_row, rows)
+        else:
+            kind = "Raw" if entity == "raw_materials" else "Finished"
+            rows, gone = inventory.fetch_items_by_ids(kind, upsert_ids)
+            if kind == "Raw":
+                data = encode_rows(inventory.encode_raw_material_row, map(inventory._raw_out, rows))
+            else:
+                data = encode_rows(inventory.encode_finished_goods_row, map(inventory._finished_out, rows))
+        deletes = deletes + gone   # changed, then deleted before any 'D' row was written
+    else:
+        data = b"[]"
+    return (f'"{entity}":{{"upserts":'.encode() + data
+            + b',"deletes":' + ("[" + ",".join(map(str, sorted(deletes))) + "]").encode() + b"}")
+
+@router.get("/api/sync", dependencies=[require_perm("inventory:read"), require_perm("transactions:read")])
+def sync(
+    since: Optional[int] = Query(None, ge=0, description="Cursor from the previous response; omit to start"),
+    limit: int = Query(SYNC_PAGE_SIZE, ge=1, le=5000),
+):
+    sync_log.maybe_prune()
+    if since is None:
+        return {"cursor": sync_log.head(), "reset": True}
+
+    rows, more, oldest = sync_log.read(since, limit)
+    if oldest is not None and since + 1 < oldest:
+        raise HTTPException(status_code=410, detail="Cursor is older than the change log; sync again without since")
+    cursor = int(rows[-1][0]) if rows else since
+    parts = [_section(e, ups, dels) for e, (ups, dels) in _collapse(rows).items()]
+    body = (f'{{"cursor":{cursor},"more":{"true" if more else "false"},'.encode()
+            + b",".join(parts) + b"}")
+    return json_bytes_response(body)
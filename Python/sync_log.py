@@ -0,0 +1,135 @@
+# sync_log.py — Append-only change log behind GET /api/sync (see sync.py)
+# Every write handler for items or transactions appends (entity, id, op) here on its own cursor,
+# before its commit: the change and its log row commit or roll back together, so a tombstone
+# cannot be lost. CreatedAt comes from the database's clock, never a worker's. Seq
+# (AUTO_INCREMENT) is the client's cursor; a row with op 'D' is the tombstone of a hard delete.
+# Rows older than SYNC_RETENTION_DAYS are pruned, and a cursor older than the oldest kept row
+# must re-download the lists.
+
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from mysql.connector import errors as mysql_errors
+from mysql.connector.errorcode import ER_NO_SUCH_TABLE
+
+from config import SYNC_RETENTION_DAYS, SYNC_SETTLE_MS
+from db import get_conn
+from repository import repo
+
+SYNC_TABLE = "sync_changes"
+
+# Entities clients can sync = the cache-bus scopes of the same tables
+ENTITIES = ("raw_materials", "finished_goods", "transactions")
+
+# created by migrations.py (version 6); sqlite_backend.SCHEMA has its own copy
+DDL = f"""
+CREATE TABLE IF NOT EXISTS `{SYNC_TABLE}` (
+  Seq        BIGINT AUTO_INCREMENT PRIMARY KEY,
+  Entity     VARCHAR(32) NOT NULL,
+  EntityId   BIGINT      NOT NULL,
+  Op         CHAR(1)     NOT NULL,
+  CreatedAt  DATETIME(3) NOT NULL,
+  KEY idx_sync_changes_created (CreatedAt)
+)
+"""
+
+# (entity, id, op) with op in I/U/D
+Change = Tuple[str, int, str]
+
+_stats: Dict[str, Any] = {"recorded": 0, "missing_table": False, "pruned": 0}
+_next_prune = 0.0
+_prune_lock = threading.Lock()
+
+def record(cur, changes: Iterable[Tuple[str, Optional[int], str]]) -> None:
+    """Append changes in one INSERT on `cur`, inside the caller's DB transaction."""
+    rows = [(e, int(i), op) for e, i, op in changes if i is not None]
+    if not rows:
+        return
+    try:
+        cur.execute(
+            f"INSERT INTO `{SYNC_TABLE}` (Entity, EntityId, Op, CreatedAt) VALUES "
+            + ", ".join([f"(%s, %s, %s, {repo.now_ms})"] * len(rows)),
+            tuple(v for r in rows for v in r),
+        )
+    except mysql_errors.ProgrammingError as e:
+        if e.errno != ER_NO_SUCH_TABLE:
+            raise
+        # before migrations.py version 6 there is no log to keep (and /api/sync fails loudly)
+        if not _stats["missing_table"]:
+            print("[sync] no sync_changes table — run `python migrations.py migrate`")
+        _stats["missing_table"] = True
+        return
+    _stats["recorded"] += len(rows)
+
+def _settled(cur) -> datetime:
+    """Newest CreatedAt a page may include: the database's now minus SYNC_SETTLE_MS."""
+    cur.execute(f"SELECT {repo.now_ms}")
+    now = cur.fetchone()[0]
+    if isinstance(now, str):
+        now = datetime.fromisoformat(now)   # SQLite: expressions carry no column type
+    return now - timedelta(milliseconds=SYNC_SETTLE_MS)
+
+def read(since: int, limit: int) -> Tuple[List[Tuple[int, str, int, str]], bool, Optional[int]]:
+    """
+    (rows after `since` in Seq order, more pages waiting, oldest kept Seq). Rows younger than
+    SYNC_SETTLE_MS are held back: concurrent inserts can commit out of Seq order, and a cursor
+    must never move past a Seq that is still invisible. Always read on the primary: a lagging
+    replica could show a higher Seq before a lower, already settled one.
+    """
+    conn = get_conn(); cur = conn.cursor()
+    try:
+        settled = _settled(cur)
+        cur.execute(f"SELECT MIN(Seq) FROM `{SYNC_TABLE}`")
+        oldest = cur.fetchone()[0]
+        cur.execute(
+            f"SELECT Seq, Entity, EntityId, Op FROM `{SYNC_TABLE}` WHERE Seq > %s AND CreatedAt <= %s "
+            f"ORDER BY Seq LIMIT %s",
+            (since, settled, limit + 1),
+        )
+        rows = cur.fetchall()
+    finally:
+        cur.close(); conn.close()
+    return rows[:limit], len(rows) > limit, int(oldest) if oldest is not None else None
+
+def head() -> int:
+    """Cursor to start from after a full download (the newest settled Seq, on the primary)."""
+    conn = get_conn(); cur = conn.cursor()
+    try:
+        cur.execute(f"SELECT MAX(Seq) FROM `{SYNC_TABLE}` WHERE CreatedAt <= %s", (_settled(cur),))
+        row = cur.fetchone()
+    finally:
+        cur.close(); conn.close()
+    return int(row[0]) if row and row[0] is not None else 0
+
+def prune() -> int:
+    cutoff = datetime.now() - timedelta(days=SYNC_RETENTION_DAYS)
+    conn = get_conn(); cur = conn.cursor()
+    try:
+        cur.execute(f"SELECT MAX(Seq) FROM `{SYNC_TABLE}` WHERE CreatedAt < %s", (cutoff,))
+        row = cur.fetchone()
+        if not row or row[0] is None:
+            return 0
+        cur.execute(f"DELETE FROM `{SYNC_TABLE}` WHERE Seq <= %s", (row[0],))
+        n = cur.rowcount
+    finally:
+        cur.close(); conn.close()
+    _stats["pruned"] += n
+    return n
+
+def maybe_prune() -> None:
+    """prune() at most once an hour per process (called from the sync route)."""
+    global _next_prune
+    if time.monotonic() < _next_prune or not _prune_lock.acquire(blocking=False):
+        return
+    try:
+        _next_prune = time.monotonic() + 3600
+        prune()
+    except Exception as e:
+        print("[sync] prune failed:", getattr(e, "msg", e))
+    finally:
+        _prune_lock.release()
+
+def stats() -> Dict[str, Any]:
+    return {"retention_days": SYNC_RETENTION_DAYS, "settle_ms": SYNC_SETTLE_MS, **_stats}
@@ -0,0 +1,77 @@
+# conftest.py — The whole app on a throwaway SQLite file (DB_BACKEND=sqlite)
+# Env is set before any app module is imported (config.py reads it at import time).
+
+import hashlib
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+_tmp = tempfile.mkdtemp(prefix="foodco-tests-")
+os.environ.update(
+    DB_BACKEND="sqlite",
+    SQLITE_PATH=os.path.join(_tmp, "foodco.sqlite3"),
+    TX_JOURNAL_PATH=os.path.join(_tmp, "tx_journal.sqlite3"),
+    SYNC_SETTLE_MS="0",
+    DASHBOARD_RECONCILE_SECONDS="0",
+)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+
+import sqlite_backend
+
+ADMIN = ("admin_user", "admin_password_123")
+VIEWER = ("viewer_user", "viewer_password_123")
+
+def _seed() -> None:
+    conn = sqlite_backend.connect(); cur = conn.cursor()
+    cur.execute("INSERT INTO roles (RoleName) VALUES ('Admin'), ('Viewer')")
+    admin_role = cur.lastrowid
+    for (name, password), role in ((ADMIN, admin_role), (VIEWER, admin_role + 1)):
+        cur.execute("INSERT INTO users (UserName, Email, PasswordHash, RoleID, IsActive) VALUES (%s,%s,%s,%s,1)",
+                    (name, f"{name}@example.com", hashlib.sha256(password.encode("utf-8")).hexdigest(), role))
+    cur.execute("INSERT INTO RawMaterials (MaterialsName, Quantity, LowStock, Unit) VALUES "
+                "('Flour', 100, 10, 'kg'), ('Sugar', 50, 5, 'kg'), ('Salt', 0, 1, 'kg')")
+    cur.execute("INSERT INTO FinishedGoods (ProductName, Quantity, LowStock) VALUES ('Bread', 20, 5), ('Cake', 3, 5)")
+    now = datetime.now().replace(microsecond=0)
+    cur.executemany(
+        """INSERT INTO inventory_transactions
+           (TransactionType, ItemType, MaterialsId, ProductId, Qty, BeforeQty, AfterQty, Note, ChangedBy, TimeUpdate)
+           VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)""",
+        [("Import", "RawMaterials", 1, None, 10, 90, 100, None, 1, now - timedelta(days=d)) for d in (0, 1, 2, 40)]
+        + [("Export", "FinishedGoods", None, 1, 2, 22, 20, None, 1, now - timedelta(days=d)) for d in (0, 3)],
+    )
+    cur.close(); conn.close()
+
+_seed()
+
+import main
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(main.app) as c:
+        yield c
+
+def login(client, who) -> dict:
+    r = client.post("/api/auth/login", json={"identifier": who[0], "password": who[1]})
+    assert r.status_code == 200, r.text
+    return {"Authorization": "Bearer " + r.json()["access_token"]}
+
+@pytest.fixture(scope="session")
+def auth(client):
+    return login(client, ADMIN)
+
+@pytest.fixture
+def interleaved_ids(client):
+    # another writer's row after every insert, as with innodb_autoinc_lock_mode=2
+    conn = sqlite_backend.connect(); cur = conn.cursor()
+    cur.execute("""CREATE TRIGGER test_interleave AFTER INSERT ON inventory_transactions
+                   WHEN NEW.Note IS NOT 'other writer'
+                   BEGIN INSERT INTO inventory_transactions (TransactionType, ItemType, MaterialsId, Qty, Note, ChangedBy)
+                         VALUES ('Import', 'RawMaterials', 3, 1, 'other writer', 3); END""")
+    yield
+    cur.execute("DROP TRIGGER test_interleave")
+    cur.execute("DELETE FROM inventory_transactions WHERE Note='other writer'")
+    cur.close(); conn.close()
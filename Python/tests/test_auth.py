@@ -0,0 +1,70 @@
+import pytest
+from fastapi import HTTPException
+
+import auth
+import user
+from config import RBAC_DEFAULT_PERMISSIONS
+from conftest import ADMIN, VIEWER, login
+
+NEW_ITEM = {"MaterialName": "Yeast", "MaterialQuantity": 1, "Unit": "kg"}
+
+def bearer(token: str) -> dict:
+    return {"Authorization": "Bearer " + token}
+
+def test_require_perm_without_token_is_401(client):
+    r = client.get("/api/raw-materials")
+    assert r.status_code == 401
+    assert r.headers["www-authenticate"] == "Bearer"
+
+def test_require_perm_rejects_refresh_token(client):
+    r = client.post("/api/auth/login", json={"identifier": ADMIN[0], "password": ADMIN[1]})
+    assert client.get("/api/raw-materials", headers=bearer(r.json()["refresh_token"])).status_code == 401
+
+def test_require_perm_without_perms_claim_is_401(client):
+    token, _, _ = user.create_token(sub="1", kind="access", extra_claims={"username": ADMIN[0]})
+    r = client.get("/api/raw-materials", headers=bearer(token))
+    assert r.status_code == 401
+    assert "refresh" in r.json()["detail"]
+
+def test_require_perm_missing_permission_is_403(client):
+    viewer = login(client, VIEWER)
+    assert client.get("/api/raw-materials", headers=viewer).status_code == 200
+    r = client.post("/api/raw-materials", headers=viewer, json=NEW_ITEM)
+    assert r.status_code == 403
+    assert r.json()["detail"] == "Missing permission: inventory:write"
+
+def test_compile_matrix_defaults_only_unlisted_roles():
+    m = auth.compile_matrix([(1, "Admin", None), (2, "Packer", None), (3, "Packer", "inventory:read")])
+    assert m == {1: auth.PERMISSIONS, 2: tuple(RBAC_DEFAULT_PERMISSIONS), 3: ("inventory:read",)}
+
+def test_role_claims_unknown_role_gets_nothing(client):
+    assert auth.role_claims(None)["perms"] == []
+    assert auth.role_claims(9999)["perms"] == []
+
+@pytest.fixture
+def roles_unreadable(monkeypatch):
+    monkeypatch.setattr(auth, "_load_matrix", lambda: None)
+    auth.clear_matrix()
+    yield
+    monkeypatch.undo()
+    auth.clear_matrix()
+
+def test_role_matrix_fails_closed(roles_unreadable):
+    with pytest.raises(HTTPException) as e:
+        auth.role_claims(1)
+    assert e.value.status_code == 503
+
+def test_login_and_refresh_are_503_without_roles(client, monkeypatch):
+    refresh = client.post("/api/auth/login", json={"identifier": ADMIN[0], "password": ADMIN[1]}).json()["refresh_token"]
+    monkeypatch.setattr(auth, "_load_matrix", lambda: None)
+    auth.clear_matrix()
+    try:
+        assert client.post("/api/auth/login", json={"identifier": ADMIN[0], "password": ADMIN[1]}).status_code == 503
+        assert client.post("/api/auth/refresh", json={"refresh_token": refresh}).status_code == 503
+    finally:
+        monkeypatch.undo()
+        auth.clear_matrix()
+    # the failed refresh did not rotate (revoke) the token
+    r = client.post("/api/auth/refresh", json={"refresh_token": refresh})
+    assert r.status_code == 200
+    assert auth.decode_token(r.json()["access_token"])["perms"] == list(auth.PERMISSIONS)
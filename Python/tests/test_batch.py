@@ -0,0 +1,31 @@
+import pytest
+from fastapi import HTTPException
+
+import batch
+
+def test_parse_ids(monkeypatch):
+    assert batch.parse_ids(" 3,1,,3, 2 ") == [3, 1, 2]
+    monkeypatch.setattr(batch, "BATCH_MAX_IDS", 2)
+    for bad in ("", " , ", "1,x", "1,2,3"):
+        with pytest.raises(HTTPException) as e:
+            batch.parse_ids(bad)
+        assert e.value.status_code == 400
+
+@pytest.mark.parametrize("url, key", [
+    ("/api/raw-materials/batch", "MaterialID"),
+    ("/api/finished-goods/batch", "GoodsID"),
+    ("/api/transactions/batch", "TransactionID"),
+    ("/api/users/batch", "user_id"),
+])
+def test_batch_keeps_request_order_and_lists_missing(client, auth, url, key):
+    r = client.get(url, headers=auth, params={"ids": "2,99999,1,2"})
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert [x[key] for x in body["data"]] == [2, 1]
+    assert body["missing"] == [99999]
+
+def test_batch_rows_match_the_single_reads(client, auth):
+    rows = client.get("/api/raw-materials/batch", headers=auth, params={"ids": "1,2"}).json()["data"]
+    assert rows == [client.get(f"/api/raw-materials/{i}", headers=auth).json()["data"] for i in (1, 2)]
+    txs = client.get("/api/transactions/batch", headers=auth, params={"ids": "3"}).json()["data"]
+    assert txs == [client.get("/api/transactions/3", headers=auth).json()]
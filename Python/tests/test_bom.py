@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+import bom
+import sqlite_backend
+
+def test_production_reports_the_real_ids(client, auth, interleaved_ids):
+    r = client.put("/api/bom/2", headers=auth, json={"components": [
+        {"MaterialsId": 1, "QtyPerUnit": 2}, {"MaterialsId": 2, "QtyPerUnit": 0.5}]})
+    assert r.status_code == 200, r.text
+    r = client.post("/api/production", headers=auth, json={"ProductId": 2, "Units": 2, "ChangedBy": 1, "Note": "run"})
+    assert r.status_code == 201, r.text
+    ids = r.json()["transactions"]
+    conn = sqlite_backend.connect(); cur = conn.cursor()
+    try:
+        cur.execute(f"SELECT TransactionID, TransactionType, MaterialsId, ProductId, Qty, Note FROM inventory_transactions "
+                    f"WHERE TransactionID IN ({','.join(map(str, ids))}) ORDER BY TransactionID")
+        rows = [(t, m, p, float(q), n) for _, t, m, p, q, n in cur.fetchall()]
+    finally:
+        cur.close(); conn.close()
+    assert rows == [("Export", 1, None, 4.0, "run"), ("Export", 2, None, 1.0, "run"), ("Import", None, 2, 2.0, "run")]
+
+def test_production_without_stock_is_409(client, auth):
+    client.put("/api/bom/1", headers=auth, json={"components": [{"MaterialsId": 3, "QtyPerUnit": 1}]})
+    r = client.post("/api/production", headers=auth, json={"ProductId": 1, "Units": 1, "ChangedBy": 1})
+    assert r.status_code == 409
+    assert r.json()["detail"]["shortages"][0]["MaterialsId"] == 3
+
+def test_max_producible_matches_a_per_product_loop():
+    np = pytest.importorskip("numpy")
+    rng = random.Random(7)
+    rows = [(p, m, rng.choice([0.5, 1, 2.5, 3])) for p in range(1, 40) for m in rng.sample(range(1, 30), rng.randint(1, 5))]
+    stock = {m: rng.choice([-2, 0, 1, 7, 40, 1000]) for m in range(1, 25)}   # 25..29 have no stock row
+    g = bom.BomGraph(rows)
+    units, limiting = g.max_producible(np.array(list(stock)), np.array(list(stock.values()), dtype=float))
+    for p, u, lim in zip(g.product_ids.tolist(), units.tolist(), limiting.tolist()):
+        ratios = {m: max(stock.get(m, 0), 0) / q for m, q in g.components[p]}
+        assert u == int(min(ratios.values()) + 1e-9)
+        assert ratios[lim] == min(ratios.values())
+
+def test_producible_endpoint(client, auth):
+    pytest.importorskip("numpy")
+    assert client.put("/api/bom/1", headers=auth, json={"components": [
+        {"MaterialsId": 1, "QtyPerUnit": 3}, {"MaterialsId": 2, "QtyPerUnit": 2}]}).status_code == 200
+    flour, sugar = [x["MaterialQuantity"] for x in
+                    client.get("/api/raw-materials/batch", headers=auth, params={"ids": "1,2"}).json()["data"]]
+    got = client.get("/api/bom/producible", headers=auth, params={"ids": "1,99"}).json()
+    assert got == [{"ProductId": 1, "MaxUnits": min(flour // 3, sugar // 2), "LimitingMaterialsId": 1 if flour / 3 <= sugar / 2 else 2},
+                   {"ProductId": 99, "MaxUnits": None, "LimitingMaterialsId": None}]
+
+def test_bom_validation(client, auth):
+    dup = {"components": [{"MaterialsId": 1, "QtyPerUnit": 1}, {"MaterialsId": 1, "QtyPerUnit": 2}]}
+    assert client.put("/api/bom/1", headers=auth, json=dup).status_code == 422
+    unknown = {"components": [{"MaterialsId": 9999, "QtyPerUnit": 1}]}
+    assert client.put("/api/bom/1", headers=auth, json=unknown).status_code == 400
+    assert client.put("/api/bom/9999", headers=auth, json={"components": [{"MaterialsId": 1, "QtyPerUnit": 1}]}).status_code == 404
+
+def test_a_graph_loaded_across_a_bom_write_is_not_installed(client, monkeypatch):
+    load = bom._load_rows
+    def racing_load():
+        rows = load()
+        bom.clear_graph("1")          # a PUT /api/bom lands after the rows were read
+        return rows
+    bom.clear_graph()
+    monkeypatch.setattr(bom, "_load_rows", racing_load)
+    assert bom.get_graph() is not None and bom._graph is None
+    monkeypatch.setattr(bom, "_load_rows", load)
+    assert bom.get_graph() is bom._graph is not None
@@ -0,0 +1,50 @@
+import pytest
+
+import cache_bus
+import sqlite_backend
+
+@pytest.fixture
+def events():
+    seen = []
+    cache_bus.subscribe("test_scope", seen.append)
+    return seen
+
+def test_publish_runs_local_subscribers_and_bumps_the_version(events):
+    v = cache_bus.version("test_scope")
+    cache_bus.publish("test_scope", 7)
+    cache_bus.publish("test_scope")
+    assert events == ["7", None] and cache_bus.version("test_scope") == v + 2
+
+def test_a_failing_subscriber_does_not_stop_the_others(events):
+    def broken(key):
+        raise RuntimeError("subscriber bug")
+    cache_bus.subscribe("test_scope_2", broken)
+    cache_bus.subscribe("test_scope_2", events.append)
+    cache_bus.publish("test_scope_2", 1)
+    assert events == ["1"]
+
+def test_poll_replays_other_workers_settled_events(client, events, monkeypatch):
+    # the change table as publish() fills it (the DDL itself is MySQL-only)
+    monkeypatch.setattr(cache_bus, "CACHE_BUS_SETTLE_MS", 0)
+    conn = sqlite_backend.connect(); cur = conn.cursor()
+    cur.execute("CREATE TABLE cache_changes (Seq INTEGER PRIMARY KEY AUTOINCREMENT, TableName TEXT, ItemKey TEXT, "
+                "Op TEXT, Origin TEXT, CreatedAt TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')))")
+    try:
+        cur.executemany("INSERT INTO cache_changes (TableName, ItemKey, Op, Origin) VALUES (%s,%s,%s,%s)",
+                        [("test_scope", "1", "I", "w2"), ("other_scope", "2", "U", "w2"),
+                         ("test_scope", "3", "U", cache_bus.WORKER_ID), ("test_scope", None, "U", "w2")])
+        last = cache_bus._poll_once(0)
+        assert events == ["1", None] and last == 4      # this worker's own row is skipped, not re-run
+        assert cache_bus._poll_once(last) == last and events == ["1", None]
+        v = cache_bus.version("test_scope")
+        cache_bus._dispatch_all()          # after a polling gap every subscribed scope is invalidated
+        assert events[-1] is None and cache_bus.version("test_scope") == v + 1
+        # a row younger than the settle window waits: a lower Seq may still be uncommitted
+        monkeypatch.setattr(cache_bus, "CACHE_BUS_SETTLE_MS", 60_000)
+        cur.execute("INSERT INTO cache_changes (TableName, ItemKey, Op, Origin) VALUES ('test_scope', '5', 'U', 'w2')")
+        assert cache_bus._poll_once(last) == last and "5" not in events
+        monkeypatch.setattr(cache_bus, "CACHE_BUS_SETTLE_MS", 0)
+        assert cache_bus._poll_once(last) == 5 and events[-1] == "5"
+    finally:
+        cur.execute("DROP TABLE cache_changes")
+        cur.close(); conn.close()
@@ -0,0 +1,49 @@
+import gzip
+
+import compression
+
+GZIP = {"Accept-Encoding": "gzip"}
+
+def test_negotiate():
+    best = "br" if compression.brotli is not None else "gzip"
+    assert compression.negotiate("gzip, deflate") == "gzip"
+    assert compression.negotiate("br;q=0, gzip;q=0.5") == "gzip"
+    assert compression.negotiate("gzip;q=0") == "identity"
+    assert compression.negotiate("*") == best
+    assert compression.negotiate("*, gzip;q=0") == ("br" if best == "br" else "identity")
+    assert compression.negotiate("identity") == "identity"
+
+def test_response_cache_versions_and_size_bound():
+    cache = compression.ResponseCache(max_bytes=40)
+    cache.put(("a",), (1,), 200, "gzip", b"x" * 10)
+    assert cache.get(("a",), (1,)) == ((1,), 200, "gzip", b"x" * 10)
+    assert cache.get(("a",), (2,)) is None and cache.stats["stale"] == 1
+    cache.put(("big",), (1,), 200, "gzip", b"x" * 11)        # over max_bytes // 4: not kept
+    assert cache.get(("big",), (1,)) is None
+    cache.put(("b",), (1,), 200, "gzip", b"y" * 10)
+    cache.get(("a",), (1,))                                 # a is now the most recent
+    for k in ("c", "d", "e"):
+        cache.put((k,), (1,), 200, "gzip", b"z" * 10)
+    assert cache.bytes == 40 and cache.stats["evicted"] == 1
+    assert cache.get(("b",), (1,)) is None and cache.get(("a",), (1,)) is not None
+
+def test_list_is_compressed_cached_and_invalidated(client, auth):
+    plain = client.get("/api/transactions", headers={**auth, "Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers and len(plain.content) >= compression.COMPRESS_MIN_BYTES
+
+    r = client.get("/api/transactions", headers={**auth, **GZIP})
+    assert r.headers["content-encoding"] == "gzip" and "Accept-Encoding" in r.headers["vary"]
+    assert r.json() == plain.json()
+    hits = compression.response_cache.stats["hits"]
+    assert client.get("/api/transactions", headers={**auth, **GZIP}).json() == plain.json()
+    assert compression.response_cache.stats["hits"] == hits + 1
+
+    client.post("/api/transactions", headers=auth, json={
+        "TransactionType": "Import", "ItemType": "RawMaterials", "MaterialsId": 1, "Qty": 1, "ChangedBy": 1})
+    assert len(client.get("/api/transactions", headers={**auth, **GZIP}).json()) == len(plain.json()) + 1
+
+def test_middleware_compresses_large_bodies_only(client, auth):
+    r = client.get("/api/transactions/1", headers={**auth, **GZIP})
+    assert "content-encoding" not in r.headers and "Accept-Encoding" in r.headers["vary"]
+    body = b"[" + b",".join([b'{"a":1}'] * 500) + b"]"
+    assert gzip.decompress(compression.compress(body, "gzip")) == body
@@ -0,0 +1,39 @@
+import dashboard
+
+def summary(client, auth):
+    r = client.get("/api/dashboard/summary", headers=auth)
+    assert r.status_code == 200, r.text
+    body = r.json()
+    body.pop("reconciledAt")
+    return body
+
+def test_events_keep_the_counters_equal_to_a_recount(client, auth):
+    before = summary(client, auth)
+    assert not dashboard.summary.stale
+
+    new_id = client.post("/api/raw-materials", headers=auth,
+                         json={"MaterialName": "Fennel", "MaterialQuantity": 0, "Lowstock": 5, "Unit": "g"}).json()["id"]
+    r = client.post("/api/transactions", headers=auth, json={
+        "TransactionType": "Import", "ItemType": "RawMaterials", "MaterialsId": new_id, "Qty": 7, "ChangedBy": 1})
+    assert r.status_code == 201, r.text
+    tx_id = r.json()["id"]
+    assert client.put("/api/finished-goods/2", headers=auth, json={"FinishedGoodsQuantity": 0}).status_code == 200
+
+    after = summary(client, auth)
+    assert not dashboard.summary.stale   # applied per event, no recount
+    raw = after["items"]["Raw"]
+    assert raw["total"] == before["items"]["Raw"]["total"] + 1
+    assert after["today"]["Import"]["count"] == before["today"]["Import"]["count"] + 1
+    assert after["today"]["Import"]["qty"] == before["today"]["Import"]["qty"] + 7
+    assert after["recent"][0]["TransactionID"] == tx_id
+    assert after["items"]["Finished"]["Out"] == before["items"]["Finished"]["Out"] + 1
+
+    dashboard.recount()
+    assert summary(client, auth) == after
+
+def test_bulk_event_marks_the_counters_stale(client, auth):
+    summary(client, auth)
+    dashboard._on_change("Raw")(None)
+    assert dashboard.summary.stale
+    summary(client, auth)
+    assert not dashboard.summary.stale
@@ -0,0 +1,74 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+import etag
+
+C = {"id": "MaterialID", "time": "TimeUpdate", "version": "RowVersion"}
+
+class RowCursor:
+    """Answers check_miss's read-back with a fixed row per table (None = not there)."""
+    def __init__(self, rows):
+        self.rows, self.row = rows, None
+    def execute(self, q, params=None):
+        self.row = self.rows.get(q.split("FROM `")[1].split("`")[0])
+    def fetchone(self):
+        return self.row
+
+def status_of(fn, *args) -> int:
+    with pytest.raises(HTTPException) as e:
+        fn(*args)
+    return e.value.status_code
+
+def test_parse_if_match():
+    assert etag.parse_if_match(None) is None
+    assert etag.parse_if_match(" * ") is None
+    assert etag.parse_if_match('"v3"') == ("v", 3)
+    assert etag.parse_if_match('"t2025-01-02T03:04:05"') == ("t", datetime(2025, 1, 2, 3, 4, 5))
+    for bad in ('W/"v3"', "v3", '"vx"', '"x1"', '""'):
+        assert status_of(etag.parse_if_match, bad) == 412
+
+def test_if_match_can_be_required(monkeypatch):
+    monkeypatch.setattr(etag, "REQUIRE_IF_MATCH", True)
+    assert status_of(etag.parse_if_match, None) == 428
+    assert etag.parse_if_match("*") is None
+
+def test_matches():
+    t = datetime(2025, 1, 2, 3, 4, 5)
+    assert etag.matches(("v", 3), 3, t) and not etag.matches(("v", 3), 4, t)
+    assert not etag.matches(("v", 3), None, t)
+    assert etag.matches(("t", t), None, t) and not etag.matches(("t", t), None, t.replace(second=6))
+
+def test_check_miss_tells_gone_changed_and_no_op_apart():
+    token = ("v", 2)
+    assert status_of(etag.check_miss, RowCursor({}), ["hot", "archive"], C, 1, token, "gone") == 404
+    assert status_of(etag.check_miss, RowCursor({"archive": (3, None)}), ["hot", "archive"], C, 1, token, "gone") == 412
+    assert etag.check_miss(RowCursor({"archive": (2, None)}), ["hot", "archive"], C, 1, token, "gone") is None
+
+def test_if_match_flow(client, auth):
+    new_id = client.post("/api/raw-materials", headers=auth,
+                         json={"MaterialName": "Nutmeg", "MaterialQuantity": 2, "Unit": "g"}).json()["id"]
+    url = f"/api/raw-materials/{new_id}"
+    tag = client.get(url, headers=auth).headers["ETag"]
+    assert tag == '"v0"'
+
+    r = client.put(url, headers={**auth, "If-Match": tag}, json={"MaterialQuantity": 3})
+    assert r.status_code == 200 and r.headers["ETag"] == '"v1"'
+    assert client.get(url, headers=auth).headers["ETag"] == '"v1"'
+    assert client.put(url, headers={**auth, "If-Match": tag}, json={"MaterialQuantity": 9}).status_code == 412
+    assert client.delete(url, headers={**auth, "If-Match": tag}).status_code == 412
+    assert client.get(url, headers=auth).json()["data"]["MaterialQuantity"] == 3
+
+    assert client.delete(url, headers={**auth, "If-Match": '"v1"'}).status_code == 204
+    assert client.put(url, headers={**auth, "If-Match": '"v1"'}, json={"MaterialQuantity": 1}).status_code == 404
+
+def test_transaction_if_match(client, auth):
+    url = "/api/transactions/2"
+    tag = client.get(url, headers=auth).headers["ETag"]
+    stale = f'"v{int(tag[2:-1]) - 1}"'
+    assert client.put(url, headers={**auth, "If-Match": stale}, json={"Note": "stale"}).status_code == 412
+    r = client.put(url, headers={**auth, "If-Match": tag}, json={"Note": "checked"})
+    assert r.status_code == 200, r.text
+    assert client.get(url, headers=auth).json()["Note"] == "checked"
+    assert client.put(url, headers={**auth, "If-Match": tag}, json={"Note": "again"}).status_code == 412
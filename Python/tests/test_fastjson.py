@@ -0,0 +1,82 @@
+import json
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import List
+
+import pytest
+from pydantic import TypeAdapter
+
+import fastjson
+import inventory
+import transaction
+import user
+
+NAIVE = datetime(2025, 3, 9, 7, 5, 3)
+UTC = datetime(2025, 3, 9, 7, 5, 3, 120000, tzinfo=timezone.utc)
+HANOI = datetime(2025, 3, 9, 14, 5, 3, 7, tzinfo=timezone(timedelta(hours=7)))
+UNICODE = 'Đồ ăn "ngon" \\ tab\t ctrl\x01   😀'
+
+def response_model_bytes(model, rows) -> bytes:
+    # what FastAPI sends for response_model=List[model]: json-mode dump, then JSONResponse.render
+    adapter = TypeAdapter(List[model])
+    content = adapter.dump_python(adapter.validate_python(rows), mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
+def tx(i, **over):
+    row = {"TransactionID": i, "TransactionType": "Import", "ItemType": "RawMaterials",
+           "MaterialsId": 1, "ProductId": None, "Qty": Decimal("5.00"), "BeforeQty": Decimal("0"),
+           "AfterQty": Decimal("5.00"), "Note": None, "ChangedBy": 1, "TimeUpdate": NAIVE}
+    row.update(over)
+    return row
+
+TX_ROWS = [
+    tx(1),
+    tx(2, MaterialsId=None, ProductId=7, BeforeQty=None, AfterQty=None, TimeUpdate=None),
+    tx(3, Qty=Decimal("0.10"), BeforeQty=Decimal("-0"), AfterQty=Decimal("1234567.891"), TimeUpdate=UTC),
+    tx(4, Qty=2.5, BeforeQty=Decimal("1E+3"), AfterQty=Decimal("0.3333333333333333"), TimeUpdate=HANOI),
+    tx(5, Note=UNICODE, TimeUpdate=NAIVE.replace(microsecond=1)),
+]
+
+def user_row(i, **over):
+    row = {"user_id": i, "table_used": "users", "username": f"user_{i}", "email": f"user_{i}@example.com",
+           "phone": "0900000000", "birthdate": date(1990, 1, 1), "role_id": 1, "role_name": "Admin",
+           "is_active": True}
+    row.update(over)
+    return row
+
+USER_ROWS = [
+    user_row(1),
+    user_row(2, phone=None, birthdate=None, role_id=None, role_name=None, is_active=None),
+    user_row(3, table_used="user", username=UNICODE, role_name="Quản lý", is_active=0),
+    user_row(4, birthdate=datetime(2000, 2, 29), is_active=1),
+]
+
+INVENTORY_ROWS = [
+    ((1, "Flour", Decimal("100.00"), "kg", 10, NAIVE), "Raw"),
+    ((2, UNICODE, None, None, None, None), "Raw"),
+    ((3, "Bánh mì", 4, None, Decimal("5"), UTC), "Finished"),
+    ((4, "Zero", 0, "l", 0, HANOI), "Raw"),
+]
+
+@pytest.mark.parametrize("model, encoder, rows", [
+    (transaction.TxOut, transaction.encode_tx_row, TX_ROWS),
+    (user.UserItem, user.encode_user_row, USER_ROWS),
+], ids=["TxOut", "UserItem"])
+def test_row_encoder_matches_response_model(model, encoder, rows):
+    got = fastjson.encode_rows(encoder, [tuple(r.values()) for r in rows])
+    assert got == response_model_bytes(model, rows)
+
+def test_inventory_encoder_matches_response_model():
+    keys = ("id", "name", "quantity", "unit", "lowStock", "updatedAt")
+    items = [inventory.normalize_row_to_item(dict(zip(keys, r)), kind) for r, kind in INVENTORY_ROWS]
+    got = fastjson.encode_rows(inventory.encode_inventory_row,
+                               [inventory.normalize_row_to_tuple(r, kind) for r, kind in INVENTORY_ROWS])
+    assert got == response_model_bytes(inventory.InventoryItem, items)
+
+def test_projection_keeps_declared_key_order():
+    idx = fastjson.parse_fields("TimeUpdate, TransactionID", transaction.TX_FIELDS)
+    _, pick, encoder = fastjson.projection(transaction.TX_FIELDS, idx, "test_tx")
+    got = fastjson.encode_rows(encoder, [pick(tuple(r.values())) for r in TX_ROWS[2:4]])
+    assert json.loads(got) == [{"TransactionID": 3, "TimeUpdate": "2025-03-09T07:05:03.120000Z"},
+                               {"TransactionID": 4, "TimeUpdate": "2025-03-09T14:05:03.000007+07:00"}]
@@ -0,0 +1,33 @@
+import pytest
+
+def rows_of(body):
+    return body["data"] if isinstance(body, dict) else body
+
+@pytest.mark.parametrize("url, fields", [
+    ("/api/raw-materials", "MaterialName,MaterialID"),
+    ("/api/finished-goods", "FinishedGoodsQuantity,GoodsID"),
+    ("/api/transactions", "TimeUpdate,TransactionID,Qty"),
+    ("/api/inventory", "status,id,name"),
+    ("/api/users", "username"),
+])
+def test_fields_projects_the_full_list(client, auth, url, fields):
+    full = client.get(url, headers=auth)
+    part = client.get(url, headers=auth, params={"fields": fields})
+    assert full.status_code == part.status_code == 200, part.text
+    got = rows_of(part.json())
+    assert got
+    keys = [k for k in rows_of(full.json())[0] if k in fields.split(",") or (url == "/api/users" and k == "user_id")]
+    assert [list(r) for r in got] == [keys] * len(got)   # declared order, not request order
+    assert got == [{k: r[k] for k in keys} for r in rows_of(full.json())]
+
+@pytest.mark.parametrize("url", ["/api/raw-materials", "/api/transactions", "/api/inventory", "/api/users"])
+def test_unknown_field_is_400(client, auth, url):
+    r = client.get(url, headers=auth, params={"fields": "nope"})
+    assert r.status_code == 400 and "nope" in r.json()["detail"]
+
+def test_lookup_lists_every_item_and_follows_writes(client, auth):
+    raw = {x["MaterialID"]: x["MaterialName"] for x in rows_of(client.get("/api/raw-materials", headers=auth).json())}
+    assert {(i, n) for i, n, k in client.get("/api/lookup/items?type=Raw", headers=auth).json()} == set(raw.items())
+    new_id = client.post("/api/raw-materials", headers=auth,
+                         json={"MaterialName": "Caraway", "MaterialQuantity": 1, "Unit": "g"}).json()["id"]
+    assert [new_id, "Caraway", "Raw"] in client.get("/api/lookup/items", headers=auth).json()
@@ -0,0 +1,120 @@
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+import idempotency
+import sqlite_backend
+
+class Handler:
+    def __init__(self, result=None, fail=False, gate=None):
+        self.calls, self.result, self.fail, self.gate = 0, result, fail, gate
+    def __call__(self):
+        self.calls += 1
+        if self.gate:
+            self.gate.wait(5)
+        if self.fail:
+            raise HTTPException(status_code=400, detail="boom")
+        return self.result
+
+def test_replay_returns_the_first_response():
+    store = idempotency.IdempotencyStore()
+    h = Handler({"id": 7, "name": "Đường"})
+    assert store.run("s", "k1", {"a": 1}, h, 201) == {"id": 7, "name": "Đường"}
+    again = store.run("s", "k1", {"a": 1}, h, 201)
+    assert h.calls == 1
+    assert again.status_code == 201 and again.headers[idempotency.REPLAY_HEADER] == "true"
+    assert again.body == '{"id":7,"name":"Đường"}'.encode("utf-8")
+    # keys are per scope
+    store.run("other", "k1", {"a": 1}, h, 201)
+    assert h.calls == 2
+
+def test_same_key_with_another_payload_is_422():
+    store = idempotency.IdempotencyStore()
+    store.run("s", "k1", {"a": 1}, Handler({}))
+    with pytest.raises(HTTPException) as e:
+        store.run("s", "k1", {"a": 2}, Handler({}))
+    assert e.value.status_code == 422 and store.stats["mismatches"] == 1
+
+def test_no_key_always_runs_and_bad_keys_are_400():
+    store = idempotency.IdempotencyStore()
+    h = Handler({})
+    store.run("s", None, {}, h); store.run("s", "", {}, h)
+    assert h.calls == 2
+    for bad in ("   ", "k" * (idempotency.MAX_KEY_LENGTH + 1)):
+        with pytest.raises(HTTPException) as e:
+            store.run("s", bad, {}, h)
+        assert e.value.status_code == 400
+
+def test_failures_are_not_remembered():
+    store = idempotency.IdempotencyStore()
+    with pytest.raises(HTTPException):
+        store.run("s", "k1", {}, Handler(fail=True))
+    ok = Handler({"id": 1})
+    assert store.run("s", "k1", {}, ok) == {"id": 1} and ok.calls == 1
+
+def test_expiry_and_eviction(monkeypatch):
+    store = idempotency.IdempotencyStore(max_keys=2, ttl_seconds=10)
+    clock = [100.0]
+    monkeypatch.setattr(idempotency.time, "monotonic", lambda: clock[0])
+    for k in ("a", "b", "c"):
+        store.run("s", k, {}, Handler({}))
+    assert store.report()["keys"] == 2 and store.stats["evicted"] == 1
+    assert list(store.entries) == [("s", None, "b"), ("s", None, "c")]
+    clock[0] += 11
+    h = Handler({})
+    store.run("s", "b", {}, h)
+    assert h.calls == 1 and store.stats["expired"] == 2
+
+def test_in_flight_keys_are_not_evicted():
+    store = idempotency.IdempotencyStore(max_keys=1)
+    gate = threading.Event()
+    first = Handler({"id": 1}, gate=gate)
+    t = threading.Thread(target=store.run, args=("s", "slow", {}, first))
+    t.start()
+    while not store.entries:
+        pass
+    store.run("s", "fast", {}, Handler({}))        # over max_keys, but "slow" is still running
+    assert ("s", None, "slow") in store.entries
+    threading.Timer(0.05, gate.set).start()
+    retry = store.run("s", "slow", {}, Handler({"id": 2}))   # waits for the first run, not a second one
+    t.join()
+    assert first.calls == 1 and retry.body == b'{"id":1}'
+
+def test_keys_are_per_principal():
+    store = idempotency.IdempotencyStore()
+    alice, bob = Handler({"owner": "alice"}), Handler({"owner": "bob"})
+    store.run("s", "k", {}, alice, principal="1")
+    assert store.run("s", "k", {}, bob, principal="2") == {"owner": "bob"}
+    assert store.run("s", "k", {}, bob, principal="1").body == b'{"owner":"alice"}'
+    assert alice.calls == bob.calls == 1
+
+def test_concurrent_replay_waits_for_the_first_request():
+    store = idempotency.IdempotencyStore()
+    gate = threading.Event()
+    first = Handler({"id": 1}, gate=gate)
+    out = {}
+    t = threading.Thread(target=lambda: out.setdefault("first", store.run("s", "k", {}, first)))
+    t.start()
+    while not store.entries:
+        pass
+    threading.Timer(0.05, gate.set).start()
+    second = store.run("s", "k", {}, Handler({"id": 2}))
+    t.join()
+    assert out["first"] == {"id": 1} and second.body == b'{"id":1}'
+    assert first.calls == 1 and store.stats["waited"] == 1
+
+def test_create_endpoint_replays(client, auth):
+    headers = {**auth, "Idempotency-Key": "create-saffron"}
+    body = {"MaterialName": "Saffron", "MaterialQuantity": 1, "Unit": "g"}
+    first = client.post("/api/raw-materials", headers=headers, json=body)
+    again = client.post("/api/raw-materials", headers=headers, json=body)
+    assert first.status_code == again.status_code == 201
+    assert again.json() == first.json() and again.headers[idempotency.REPLAY_HEADER] == "true"
+    assert client.post("/api/raw-materials", headers=headers, json={**body, "MaterialQuantity": 2}).status_code == 422
+    conn = sqlite_backend.connect(); cur = conn.cursor()
+    try:
+        cur.execute("SELECT COUNT(*) FROM RawMaterials WHERE MaterialsName='Saffron'")
+        assert cur.fetchone()[0] == 1
+    finally:
+        cur.close(); conn.close()
@@ -0,0 +1,50 @@
+import pytest
+
+import sqlite_backend
+import user
+from conftest import ADMIN
+
+@pytest.fixture
+def legacy_user_table(client):
+    conn = sqlite_backend.connect(); cur = conn.cursor()
+    cur.execute("CREATE TABLE user (UserID INTEGER PRIMARY KEY, Username TEXT, Email TEXT, PasswordHash TEXT)")
+    cur.executemany("INSERT INTO user (UserID, Username, Email, PasswordHash) VALUES (%s,%s,%s,%s)", [
+        (50, "legacy_login", "legacy_login@example.com", user.hash_sha256("legacy_password_1")),
+        (51, ADMIN[0], "shadow@example.com", user.hash_sha256("shadow_password_1")),
+    ])
+    user.clear_schema_cache()
+    yield
+    cur.execute("DROP TABLE user")
+    cur.close(); conn.close()
+    user.clear_schema_cache()
+
+def lookup(identifier):
+    conn = sqlite_backend.connect(); cur = conn.cursor(dictionary=True)
+    try:
+        return user.find_identity(cur, identifier)
+    finally:
+        cur.close(); conn.close()
+
+def test_find_identity_by_username_or_email(client):
+    by_name, by_email = lookup(ADMIN[0]), lookup(f"{ADMIN[0]}@example.com")
+    assert by_name == by_email and by_name["username"] == ADMIN[0]
+    assert by_name["password_hash"] == user.hash_sha256(ADMIN[1])
+    assert lookup("nobody@example.com") is None
+
+def test_users_table_wins_and_legacy_users_log_in(client, legacy_user_table):
+    assert lookup(ADMIN[0])["email"] == f"{ADMIN[0]}@example.com"
+    assert lookup("shadow@example.com")["user_id"] == 51
+    r = client.post("/api/auth/login", json={"identifier": "legacy_login@example.com", "password": "legacy_password_1"})
+    assert r.status_code == 200, r.text
+    assert client.post("/api/auth/login", json={"identifier": ADMIN[0], "password": "shadow_password_1"}).status_code == 401
+
+def test_uniqueness_checks(client):
+    conn = sqlite_backend.connect(); cur = conn.cursor(dictionary=True)
+    try:
+        assert user.username_or_email_exists(cur, "users", ADMIN[0], "free@example.com")
+        assert user.username_or_email_exists(cur, "users", "free_name", f"{ADMIN[0]}@example.com")
+        assert not user.username_or_email_exists(cur, "users", "free_name", "free@example.com")
+        admin_id = lookup(ADMIN[0])["user_id"]
+        assert not user.username_or_email_exists(cur, "users", ADMIN[0], "free@example.com", exclude_pk=("UserID", admin_id))
+    finally:
+        cur.close(); conn.close()
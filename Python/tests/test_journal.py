@@ -0,0 +1,38 @@
+import uuid
+
+import sqlite_backend
+import transaction
+
+def entry(note: str, **over):
+    data = {"TransactionType": "Import", "ItemType": "RawMaterials", "MaterialsId": 3,
+            "Qty": 2, "Note": note, "ChangedBy": 1, **over}
+    return (uuid.uuid4().hex, data)
+
+def notes_by_id(ids):
+    conn = sqlite_backend.connect(); cur = conn.cursor()
+    try:
+        cur.execute(f"SELECT TransactionID, Note FROM inventory_transactions "
+                    f"WHERE TransactionID IN ({','.join(map(str, ids))})")
+        return dict(cur.fetchall())
+    finally:
+        cur.close(); conn.close()
+
+def test_replay_reports_the_real_ids(interleaved_ids):
+    entries = [entry(f"journal {i}") for i in range(4)]
+    out = transaction.replay_journal(entries)
+    ids = [out[jid][0] for jid, _ in entries]
+    assert all(err is None for _, err in out.values())
+    assert notes_by_id(ids) == {tx_id: data["Note"] for tx_id, (_, data) in zip(ids, entries)}
+
+def test_replay_is_idempotent_and_isolates_bad_entries(client):
+    good, bad = entry("once"), entry("bad", ItemType="FinishedGoods")   # no ProductId
+    first = transaction.replay_journal([good, bad])
+    assert first[good[0]][1] is None
+    assert first[bad[0]][0] is None and "ProductId" in first[bad[0]][1]
+    # a pass that died after the commit replays the same entry: same id, no second row
+    again = transaction.replay_journal([good])
+    assert again[good[0]] == first[good[0]]
+    conn = sqlite_backend.connect(); cur = conn.cursor()
+    cur.execute("SELECT COUNT(*) FROM inventory_transactions WHERE Note='once'")
+    assert cur.fetchone()[0] == 1
+    cur.close(); conn.close()
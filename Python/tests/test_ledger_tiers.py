@@ -0,0 +1,76 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+import sqlite_backend
+import transaction
+from config import LEDGER_HOT_MONTHS
+
+def test_hot_cutoff_whole_months():
+    assert transaction.hot_cutoff(datetime(2026, 5, 17, 13, 0), 3) == datetime(2026, 2, 1)
+    assert transaction.hot_cutoff(datetime(2026, 2, 1), 3) == datetime(2025, 11, 1)
+    assert transaction.hot_cutoff(datetime(2026, 2, 1), 0) == datetime(2026, 2, 1)
+
+def test_tx_tables_follow_cutoff(client):
+    table, c = transaction.get_tx_table_and_cols()
+    archive = transaction.get_archive_table(table)
+    assert archive == table + transaction.ARCHIVE_SUFFIX
+    cutoff = transaction.hot_cutoff(datetime.now(), LEDGER_HOT_MONTHS)
+    assert transaction.tx_tables(table, c) == [table, archive]
+    assert transaction.tx_tables(table, c, start=cutoff) == [table]
+    assert transaction.tx_tables(table, c, start=cutoff - timedelta(seconds=1)) == [table, archive]
+    # the hot table may still hold rows older than the cutoff until the next roll
+    assert transaction.tx_tables(table, c, end=cutoff - timedelta(days=30)) == [table, archive]
+
+def test_rows_archived_by_another_process_stay_visible(client, auth):
+    table, c = transaction.get_tx_table_and_cols()
+    archive = transaction.get_archive_table(table)
+    now = datetime.now().replace(microsecond=0)
+    conn = sqlite_backend.connect(); cur = conn.cursor()
+    ids = []
+    for days in (200, 150):
+        cur.execute(f"""INSERT INTO `{table}` (TransactionType, ItemType, MaterialsId, Qty, ChangedBy, TimeUpdate)
+                        VALUES ('Import', 'RawMaterials', 2, 1, 2, %s)""", (now - timedelta(days=days),))
+        ids.append(cur.lastrowid)
+    transaction.clear_tier_cache()   # as in a worker started after these rows were written
+    assert client.get("/api/transactions", headers=auth).status_code == 200
+    # a cron roll: no cache-bus event reaches this process
+    in_sql = ",".join(map(str, ids))
+    cur.execute(f"INSERT INTO `{archive}` SELECT * FROM `{table}` WHERE TransactionID IN ({in_sql})")
+    cur.execute(f"DELETE FROM `{table}` WHERE TransactionID IN ({in_sql})")
+    cur.close(); conn.close()
+
+    since = (date.today() - timedelta(days=170)).isoformat()
+    r = client.get(f"/api/transactions?from_date={since}&changed_by=2", headers=auth)
+    assert r.status_code == 200
+    assert [t["TransactionID"] for t in r.json()] == [ids[1]]
+
+def test_roll_refuses_a_shorter_hot_window():
+    import ledger
+    with pytest.raises(SystemExit):
+        ledger.roll(hot_months=LEDGER_HOT_MONTHS - 1)
+
+def test_archive_is_resolved_not_created(client):
+    from repository import repo
+    assert transaction.get_archive_table("RawMaterials") == ""
+    conn = sqlite_backend.connect(); cur = conn.cursor()
+    try:
+        assert "RawMaterials_archive" not in repo.table_names(cur)
+    finally:
+        cur.close(); conn.close()
+
+def test_roll_moves_old_rows_to_the_archive(client, auth):
+    import ledger
+    table, _ = transaction.get_tx_table_and_cols()
+    conn = sqlite_backend.connect(); cur = conn.cursor()
+    cur.execute(f"""INSERT INTO `{table}` (TransactionType, ItemType, MaterialsId, Qty, ChangedBy, TimeUpdate)
+                    VALUES ('Export', 'RawMaterials', 1, 1, 4, %s)""", (datetime.now() - timedelta(days=300),))
+    tx_id = cur.lastrowid
+    cur.close(); conn.close()
+
+    assert ledger.roll(dry_run=True)["would_move"] >= 1
+    report = ledger.roll(batch_size=1)
+    assert report["moved"] >= 1 and report["archive"] == table + transaction.ARCHIVE_SUFFIX
+    assert ledger.status()[report["archive"]]["rows"] >= 1
+    r = client.get("/api/transactions?changed_by=4", headers=auth)
+    assert [t["TransactionID"] for t in r.json()] == [tx_id]
+    assert client.get(f"/api/transactions/{tx_id}", headers=auth).status_code == 200
@@ -0,0 +1,57 @@
+import pytest
+
+import migrations
+import sqlite_backend
+
+def sqlite_indexes(cur, table):
+    """migrations.table_indexes() for SQLite (information_schema is MySQL-only)."""
+    cur.execute(f"SELECT name FROM pragma_index_list('{table}')")
+    out = {}
+    for (name,) in cur.fetchall():
+        cur.execute(f"SELECT name FROM pragma_index_info('{name}') ORDER BY seqno")
+        out[name] = tuple(r[0] for r in cur.fetchall())
+    return out
+
+@pytest.fixture
+def cur(client):
+    conn = sqlite_backend.connect(); c = conn.cursor()
+    yield c
+    c.close(); conn.close()
+
+def test_versions_are_append_only():
+    versions = [v for v, _, _ in migrations.MIGRATIONS]
+    assert versions == list(range(1, len(versions) + 1))
+
+def test_has_index_matches_leading_columns():
+    existing = {"PRIMARY": ("TransactionID",), "idx": ("ItemType", "TimeUpdate")}
+    assert migrations.has_index(existing, ("itemtype",))
+    assert migrations.has_index(existing, ("ItemType", "TimeUpdate"))
+    assert not migrations.has_index(existing, ("TimeUpdate",))
+    assert not migrations.has_index(existing, ("ItemType", "TimeUpdate", "Qty"))
+
+def test_ensure_index_creates_only_missing_ones(cur, monkeypatch):
+    monkeypatch.setattr(migrations, "table_indexes", sqlite_indexes)
+    cur.execute("CREATE TABLE test_idx (a INTEGER, b INTEGER)")
+    try:
+        assert migrations.ensure_index(cur, ("test_idx", "idx_test_ab", ("a", "b")))
+        assert not migrations.ensure_index(cur, ("test_idx", "idx_test_a", ("a",)))
+        assert sqlite_indexes(cur, "test_idx") == {"idx_test_ab": ("a", "b")}
+    finally:
+        cur.execute("DROP TABLE test_idx")
+
+def test_sqlite_schema_has_every_expected_index(cur):
+    missing = [s for s in migrations.expected_indexes(cur)
+               if not migrations.has_index(sqlite_indexes(cur, s[0]), s[2])]
+    assert missing == []
+
+def test_checked_queries_run_against_the_schema(cur):
+    for label, sql, params in migrations.app_queries(cur):
+        cur.execute(sql, params)
+        cur.fetchall()
+
+def test_full_scans():
+    plan = [{"table": "inventory_transactions", "type": "ALL", "rows": 5000},
+            {"table": "users", "type": "ref", "rows": 1},
+            {"table": "<union1,2>", "type": "ALL", "rows": 9000},
+            {"table": "roles", "type": "ALL", "rows": 3}]
+    assert [p["table"] for p in migrations.full_scans(plan, 100)] == ["inventory_transactions"]
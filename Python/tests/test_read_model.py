@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import compression
+import inventory
+from inventory_store import InventoryStore, ItemColumns
+
+T = datetime(2025, 5, 6, 7, 8, 9, 123456)
+
+def test_columns_round_trip_and_remove():
+    cols = ItemColumns()
+    rows = [(1, "Flour", 10, "kg", 5, T, 3), (2, "Salt", 0, None, None, None), (3, "Yeast", 2, "g", 0,
+            T.replace(tzinfo=timezone(timedelta(hours=7))))]
+    for r in rows:
+        cols.upsert(r)
+    assert cols.get(1) == rows[0][:6] and cols.row_version(1) == 3
+    assert cols.get(2) == rows[1] and cols.row_version(2) is None
+    assert cols.get(3)[5] == T     # wall-clock value of an aware datetime
+    cols.upsert((1, "Flour", 11, "kg", 5, T))
+    assert cols.get(1)[2] == 11 and len(cols) == 3
+    assert cols.remove(1) and not cols.remove(1)
+    assert cols.get(1) is None and cols.get(3)[1] == "Yeast" and cols.get(2)[1] == "Salt"
+    assert sorted(r[0] for r in cols.rows()) == [2, 3]
+
+def test_writes_during_a_load_are_reported():
+    store = InventoryStore()
+    store.begin_load()
+    store.upsert("Raw", (9, "x", 1, None, None, None))
+    store.remove("Finished", 4)
+    assert store.replace([], []) == {("Raw", 9), ("Finished", 4)}
+    assert store.loaded and store.get("Raw", 9) is None   # the caller re-reads the touched rows
+
+def enable(monkeypatch) -> InventoryStore:
+    # a fresh store, loaded on first use; the response cache is off so every GET takes the read path
+    monkeypatch.setattr(compression.response_cache, "max_bytes", 0)
+    monkeypatch.setattr(inventory, "READ_MODEL_ENABLED", True)
+    monkeypatch.setattr(inventory, "READ_MODEL_RECONCILE_SECONDS", 0)
+    monkeypatch.setattr(inventory, "read_model", InventoryStore())
+    inventory._lookup_cache.clear()
+    return inventory.read_model
+
+@pytest.fixture
+def read_model(monkeypatch, client):
+    store = enable(monkeypatch)
+    assert inventory.ensure_read_model()
+    return store
+
+URLS = ["/api/inventory", "/api/raw-materials", "/api/finished-goods", "/api/raw-materials/1",
+        "/api/finished-goods/2", "/api/raw-materials?fields=MaterialName", "/api/lookup/items"]
+
+def test_memory_reads_match_database_reads(client, auth, monkeypatch):
+    monkeypatch.setattr(compression.response_cache, "max_bytes", 0)
+    from_db = {u: client.get(u, headers=auth) for u in URLS}
+    store = enable(monkeypatch)
+    for u in URLS:
+        r = client.get(u, headers=auth)
+        assert r.status_code == 200 and r.json() == from_db[u].json(), u
+        assert r.headers.get("etag") == from_db[u].headers.get("etag")
+    assert store.loaded
+
+def test_writes_are_applied_to_the_read_model(client, auth, read_model):
+    new_id = client.post("/api/raw-materials", headers=auth,
+                         json={"MaterialName": "Sumac", "MaterialQuantity": 4, "Unit": "g"}).json()["id"]
+    assert read_model.get("Raw", new_id)[1] == "Sumac"
+    client.put(f"/api/raw-materials/{new_id}", headers=auth, json={"MaterialQuantity": 6})
+    got = client.get(f"/api/raw-materials/{new_id}", headers=auth)
+    assert got.json()["data"]["MaterialQuantity"] == 6 and got.headers["etag"] == '"v1"'
+    client.delete(f"/api/raw-materials/{new_id}", headers=auth)
+    assert read_model.get("Raw", new_id) is None
+    assert client.get(f"/api/raw-materials/{new_id}", headers=auth).status_code == 404
@@ -0,0 +1,17 @@
+from datetime import datetime
+
+import pytest
+import sqlite_backend
+
+pytest.importorskip("numpy")
+
+def test_datediff_matches_mysql():
+    assert sqlite_backend._datediff("2026-03-02 00:00:00", "2026-02-27 23:59:59") == 3
+    assert sqlite_backend._datediff(datetime(2026, 1, 1), "2026-01-01 12:00:00") == 0
+    assert sqlite_backend._datediff(None, "2026-01-01") is None
+
+def test_suggestions_on_sqlite(client, auth):
+    r = client.get("/api/reorder/suggestions?type=Finished&lookback_days=30", headers=auth)
+    assert r.status_code == 200, r.text
+    bread = next(x for x in r.json() if x["ItemID"] == 1)
+    assert bread["DailyMean"] == pytest.approx(4 / 30, abs=1e-4)   # two Exports of 2 in the seed data
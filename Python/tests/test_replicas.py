@@ -0,0 +1,119 @@
+import pytest
+from mysql.connector import errors as mysql_errors
+from starlette.requests import Request
+
+import db
+import main
+
+class FakeConn:
+    autocommit = True
+    def __init__(self, host, status=None, failing=()):
+        self.host, self.status, self.failing = host, status, failing
+    def cursor(self, dictionary=False):
+        return self
+    def execute(self, q, params=None):
+        if q in self.failing:
+            raise mysql_errors.ProgrammingError(msg="syntax")
+        self.last = q
+    def fetchone(self):
+        return self.status
+    def fetchall(self):
+        return []
+    def close(self):
+        pass
+
+@pytest.fixture
+def routing(monkeypatch):
+    """MySQL mode with one replica; connections are FakeConn(host)."""
+    rep = db.Replica(0, "reader:secret@replica-1:3307/foodco_ro")
+    rep.healthy = True
+    rep.down = False
+    def checkout(factory, args):
+        if rep.down and args["host"] == rep.args["host"]:
+            raise mysql_errors.InterfaceError(msg="gone")
+        return FakeConn(args["host"])
+    monkeypatch.setattr(db, "DB_BACKEND", "mysql")
+    monkeypatch.setattr(db, "REPLICAS", [rep])
+    monkeypatch.setattr(db, "_checkout", checkout)
+    monkeypatch.setattr(db, "_last_write", {})
+    monkeypatch.setattr(db, "_connect_args", lambda: {"host": "primary"})
+    return rep
+
+def test_replica_dsn():
+    rep = db.Replica(0, "reader:p%40ss@replica-1:3307/foodco_ro")
+    assert rep.name == "replica-1:3307"
+    assert rep.args == {"host": "replica-1", "port": 3307, "user": "reader", "password": "p@ss", "database": "foodco_ro"}
+    bare = db.Replica(1, "replica-2")
+    assert bare.args["port"] == 3306 and bare.args["database"] == db.DB_NAME and bare.args["user"] == db.DB_USER
+
+def test_reads_go_to_the_replica_and_writes_to_the_primary(routing):
+    assert db.get_conn(read_only=True).host == "replica-1"
+    assert db.get_conn().host == "primary"
+    routing.healthy = False
+    assert db.get_conn(read_only=True).host == "primary"
+
+def test_a_session_that_wrote_reads_from_the_primary(routing):
+    token = db.current_session.set("user:1")
+    try:
+        db.mark_write("user:1")
+        assert db.get_conn(read_only=True).host == "primary"
+        db.current_session.set("user:2")
+        assert db.get_conn(read_only=True).host == "replica-1"
+    finally:
+        db.current_session.reset(token)
+
+def test_an_unreachable_replica_leaves_the_rotation(routing):
+    routing.down = True
+    assert db.get_conn(read_only=True).host == "primary"
+    assert not routing.healthy and "gone" in routing.error
+
+@pytest.mark.parametrize("status, failing, healthy", [
+    ({"Seconds_Behind_Source": 0}, (), True),
+    ({"Seconds_Behind_Master": 1}, ("SHOW REPLICA STATUS",), True),    # MySQL < 8.0.22
+    ({"Seconds_Behind_Source": 10 ** 6}, (), False),
+    ({"Seconds_Behind_Source": None}, (), False),                        # replication stopped
+    (None, (), False),                                                   # not a replica
+])
+def test_lag_check(monkeypatch, status, failing, healthy):
+    rep = db.Replica(0, "replica-1")
+    monkeypatch.setattr(db, "_checkout", lambda factory, args: FakeConn(args["host"], status, failing))
+    db.check_replica(rep)
+    assert rep.healthy is healthy and (rep.error is None) is healthy
+
+def test_session_key():
+    def request(headers):
+        return Request({"type": "http", "headers": [(k.encode(), v.encode()) for k, v in headers.items()],
+                        "client": ("10.0.0.9", 1234)})
+    token = main.user.create_token("42", "access")[0]
+    assert main.session_key(request({"authorization": f"Bearer {token}"})) == "user:42"
+    assert main.session_key(request({"authorization": "Bearer not-a-jwt"})) == "ip:10.0.0.9"
+    assert main.session_key(request({})) == "ip:10.0.0.9"
+
+def test_dashboard_re_reads_a_changed_row_on_the_primary(client, routing, monkeypatch):
+    import dashboard
+    hosts = []
+    checkout = db._checkout
+    def record(factory, args):
+        hosts.append(args["host"])
+        return checkout(factory, args)
+    monkeypatch.setattr(db, "_checkout", record)
+    try:
+        dashboard._refresh_tx(1)
+        dashboard._refresh_item("Raw", 1)
+    finally:
+        dashboard.summary.stale = True   # FakeConn found nothing: recount before the next read
+    assert hosts and set(hosts) == {"primary"}
+
+def test_a_pinned_session_does_not_join_other_sessions_flights(routing, monkeypatch):
+    import compression
+    keys = []
+    monkeypatch.setattr(compression.singleflight, "do", lambda key, build: (keys.append(key), (build(), False))[1])
+    request = Request({"type": "http", "path": "/api/inventory", "query_string": b"", "headers": []})
+    token = db.current_session.set("user:1")
+    try:
+        compression.cached(request, ("raw_materials",), lambda: "replica rows")
+        db.mark_write("user:1")
+        compression.cached(request, ("raw_materials",), lambda: "primary rows")
+    finally:
+        db.current_session.reset(token)
+    assert keys[0] != keys[1]
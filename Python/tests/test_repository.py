@@ -0,0 +1,24 @@
+import pytest
+
+import repository
+import sqlite_backend
+from repository import repo
+
+def test_repository_is_abstract():
+    with pytest.raises(TypeError):
+        repository.Repository()
+
+def test_backends_implement_every_method():
+    repository.MySQLRepository()
+    repository.SQLiteRepository()
+
+@pytest.mark.parametrize("dictionary", [False, True])
+def test_introspection_reads_tuple_and_dict_cursors(dictionary):
+    conn = sqlite_backend.connect(); cur = conn.cursor(dictionary=dictionary)
+    try:
+        assert "users" in repo.table_names(cur)
+        assert repo.column_names(cur, "roles")[:2] == ["RoleID", "RoleName"]
+        assert repo.primary_key(cur, "users") == "UserID"
+        assert "RawMaterials" in repo.enum_values(cur, "inventory_transactions", "ItemType")
+    finally:
+        cur.close(); conn.close()
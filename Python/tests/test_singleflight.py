@@ -0,0 +1,66 @@
+import threading
+
+import pytest
+from fastapi import Response
+
+import singleflight
+
+def run_together(n, key, build):
+    """n callers of do(key, build) started together → their (result, shared) or exception."""
+    out, start = [None] * n, threading.Barrier(n)
+    def call(i):
+        start.wait()
+        try:
+            out[i] = singleflight.do(key, build)
+        except Exception as e:
+            out[i] = e
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(n)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    return out
+
+def slow(result=None, error=None):
+    calls = []
+    def build():
+        calls.append(1)
+        threading.Event().wait(0.2)   # long enough for every caller to join the flight
+        if error:
+            raise error
+        return result
+    return build, calls
+
+def test_concurrent_callers_share_one_build():
+    build, calls = slow(result=["rows"])
+    out = run_together(4, ("test", 1), build)
+    assert len(calls) == 1
+    assert all(r == ["rows"] for r, _ in out)
+    assert sorted(shared for _, shared in out) == [False, True, True, True]
+
+def test_an_error_is_shared_and_not_kept():
+    build, calls = slow(error=RuntimeError("db down"))
+    out = run_together(3, ("test", 2), build)
+    assert len(calls) == 1 and all(isinstance(e, RuntimeError) for e in out)
+    assert singleflight.do(("test", 2), lambda: "fresh") == ("fresh", False)
+
+def test_a_slow_flight_is_not_waited_for_past_the_limit(monkeypatch):
+    monkeypatch.setattr(singleflight, "SINGLEFLIGHT_MAX_WAIT_MS", 20)
+    build, calls = slow(result="slow")
+    out = run_together(2, ("test", 3), build)
+    assert len(calls) == 2 and [shared for _, shared in out] == [False, False]
+
+def test_disabled_always_builds(monkeypatch):
+    monkeypatch.setattr(singleflight, "SINGLEFLIGHT", False)
+    build, calls = slow(result=1)
+    run_together(2, ("test", 4), build)
+    assert len(calls) == 2
+
+def test_shared_responses_are_copied():
+    r = Response(content=b"[]", media_type="application/json", headers={"X-A": "1"})
+    c = singleflight.copy_response(r)
+    assert c is not r and c.body == b"[]" and c.headers["x-a"] == "1"
+    c.headers["X-B"] = "2"
+    assert "x-b" not in r.headers
+    r.set_cookie("a", "1"); r.set_cookie("b", "2")
+    assert len(singleflight.copy_response(r).headers.getlist("set-cookie")) == 2
+    data = {"a": 1}
+    assert singleflight.copy_response(data) is data
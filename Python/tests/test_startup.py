@@ -0,0 +1,32 @@
+from fastapi.testclient import TestClient
+
+import main
+
+def test_ready_reports_every_phase(client):
+    r = client.get("/ready")
+    assert r.status_code == 200
+    body = r.json()
+    assert body["ready"] is True and body["error"] is None
+    assert list(body["phases_ms"]) == [name for name, _ in main.WARMUP_PHASES]
+
+def test_failed_phase_keeps_the_app_unready_until_a_retry_succeeds(monkeypatch):
+    calls = []
+    def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("db unreachable")
+    monkeypatch.setattr(main, "WARMUP_PHASES", [("pool", lambda: None), ("schema", flaky), ("after", lambda: None)])
+    state = main.StartupState()
+    assert main.warm_up(state) is False
+    assert state.error == "schema: db unreachable" and not state.ready and "after" not in state.phases
+    assert main.warm_up(state) is True
+    assert state.ready and state.error is None and state.attempts == 2 and state.ready_at
+    assert main.warm_up(state) is True and state.attempts == 2   # ready: nothing runs again
+
+def test_ready_is_503_before_warm_up():
+    app = main.create_app()
+    probe = TestClient(app)              # no lifespan: warm-up has not run
+    r = probe.get("/ready")
+    assert r.status_code == 503 and r.json()["ready"] is False
+    assert main.warm_up(app.state.startup)
+    assert probe.get("/ready").status_code == 200
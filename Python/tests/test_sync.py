@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from mysql.connector import errors as mysql_errors
+
+import main
+import sqlite_backend
+import sync
+import sync_log
+
+def test_collapse_keeps_the_last_op_per_id():
+    rows = [(1, "raw_materials", 5, "I"), (2, "raw_materials", 6, "U"), (3, "raw_materials", 5, "D"),
+            (4, "transactions", 9, "D"), (5, "transactions", 9, "I"), (6, "bom", 1, "U")]
+    out = sync._collapse(rows)
+    assert out["raw_materials"] == ([6], [5])
+    assert out["transactions"] == ([9], [])
+    assert out["finished_goods"] == ([], [])
+    assert "bom" not in out
+
+def test_delta_sync_round_trip(client, auth):
+    start = client.get("/api/sync", headers=auth).json()
+    assert start["reset"] is True
+    new_id = client.post("/api/raw-materials", headers=auth,
+                         json={"MaterialName": "Cocoa", "MaterialQuantity": 4, "Unit": "kg"}).json()["id"]
+    assert client.put(f"/api/raw-materials/{new_id}", headers=auth, json={"MaterialQuantity": 5}).status_code == 200
+    gone = client.post("/api/finished-goods", headers=auth,
+                       json={"FinishedGoodsName": "Tart", "FinishedGoodsQuantity": 1}).json()["id"]
+    assert client.delete(f"/api/finished-goods/{gone}", headers=auth).status_code == 204
+
+    r = client.get(f"/api/sync?since={start['cursor']}", headers=auth)
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert [(x["MaterialID"], x["MaterialQuantity"]) for x in body["raw_materials"]["upserts"]] == [(new_id, 5)]
+    assert body["finished_goods"] == {"upserts": [], "deletes": [gone]}
+    assert body["more"] is False and body["cursor"] > start["cursor"]
+    assert client.get(f"/api/sync?since={body['cursor']}", headers=auth).json()["cursor"] == body["cursor"]
+
+def test_log_rows_use_the_database_clock(client, auth):
+    client.post("/api/raw-materials", headers=auth, json={"MaterialName": "Mace", "MaterialQuantity": 1, "Unit": "g"})
+    conn = sqlite_backend.connect(); cur = conn.cursor()
+    try:
+        cur.execute("SELECT CreatedAt FROM sync_changes ORDER BY Seq DESC LIMIT 1")
+        created = cur.fetchone()[0]
+    finally:
+        cur.close(); conn.close()
+    assert isinstance(created, datetime) and created.microsecond % 1000 == 0
+    assert abs(datetime.now() - created) < timedelta(seconds=5)
+
+def test_failed_log_write_rolls_back_the_change(client, auth, monkeypatch):
+    def broken(cur, changes):
+        raise mysql_errors.DatabaseError(msg="sync_changes unavailable")
+    monkeypatch.setattr(sync_log, "record", broken)
+    r = client.post("/api/raw-materials", headers=auth, json={"MaterialName": "Anise", "MaterialQuantity": 1, "Unit": "g"})
+    assert r.status_code == 400
+    lenient = TestClient(main.app, raise_server_exceptions=False)
+    assert lenient.delete("/api/raw-materials/2", headers=auth).status_code == 500
+    monkeypatch.undo()
+    conn = sqlite_backend.connect(); cur = conn.cursor()
+    try:
+        cur.execute("SELECT MaterialsName FROM RawMaterials")
+        names = {r[0] for r in cur.fetchall()}
+    finally:
+        cur.close(); conn.close()
+    assert "Anise" not in names and "Sugar" in names
+
+def test_cursor_older_than_the_log_is_410(client, auth):
+    client.post("/api/raw-materials", headers=auth, json={"MaterialName": "Clove", "MaterialQuantity": 1, "Unit": "g"})
+    conn = sqlite_backend.connect(); cur = conn.cursor()
+    try:
+        cur.execute("SELECT MAX(Seq) FROM sync_changes")
+        newest = cur.fetchone()[0]
+        cur.execute("DELETE FROM sync_changes WHERE Seq < %s", (newest,))   # as after a prune
+    finally:
+        cur.close(); conn.close()
+    assert client.get(f"/api/sync?since={newest - 2}", headers=auth).status_code == 410
+    assert client.get(f"/api/sync?since={newest - 1}", headers=auth).status_code == 200
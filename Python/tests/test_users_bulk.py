@@ -0,0 +1,32 @@
+import pytest
+import sqlite_backend
+
+@pytest.fixture
+def interleaved_users(client):
+    conn = sqlite_backend.connect(); cur = conn.cursor()
+    cur.execute("""CREATE TRIGGER test_interleave_users AFTER INSERT ON users
+                   WHEN NEW.UserName NOT LIKE 'other%'
+                   BEGIN INSERT INTO users (UserName, Email, PasswordHash)
+                         VALUES ('other' || NEW.UserID, 'other' || NEW.UserID || '@example.com', ''); END""")
+    yield
+    cur.execute("DROP TRIGGER test_interleave_users")
+    cur.execute("DELETE FROM users WHERE UserName LIKE 'other%'")
+    cur.close(); conn.close()
+
+def new_user(name: str, **over):
+    return {"username": name, "email": f"{name}@example.com", "password": "password_123", **over}
+
+def test_bulk_create_reports_the_real_ids(client, auth, interleaved_users):
+    batch = [new_user("bulk_a"), new_user("bulk_b"), new_user("Bulk_C")]
+    r = client.post("/api/users/bulk", headers=auth, json=batch)
+    assert r.status_code == 200, r.text
+    results = r.json()["results"]
+    assert [x["status"] for x in results] == ["created"] * 3
+    for x in results:
+        got = client.get(f"/api/users/{x['user_id']}", headers=auth).json()
+        assert got["username"] == x["username"]
+
+def test_bulk_create_reports_each_rejected_row(client, auth):
+    batch = [new_user("bulk_d"), new_user("x"), new_user("BULK_D"), new_user("admin_user")]
+    results = client.post("/api/users/bulk", headers=auth, json=batch).json()["results"]
+    assert [x["status"] for x in results] == ["created", "invalid", "duplicate", "exists"]
@@ -1,69 +1,40 @@
 # transaction.py — FastAPI CRUD for inventory transactions (Pydantic v2)
-# Run: uvicorn transaction:app --reload --port 8001
+# Routes are mounted by main.create_app(); run: uvicorn main:app --reload --port 8001
 
-import os
-from datetime import datetime, timezone, date
+from datetime import datetime, timezone, date, time, timedelta
+from time import monotonic
 from typing import Optional, List, Literal, Dict, Any, Tuple
 
-from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, status, Query
-from fastapi.middleware.cors import CORSMiddleware
+from fastapi import APIRouter, Header, HTTPException, Request, Response, status, Query
 from pydantic import BaseModel, Field, field_validator, model_validator
-import mysql.connector
 from mysql.connector import errors as mysql_errors
 
-# ================= ENV / DB =================
-load_dotenv()
-DB_HOST = os.getenv("MYSQL_HOST", "127.0.0.1")
-DB_PORT = int(os.getenv("MYSQL_PORT", "3306"))
-DB_USER = os.getenv("MYSQL_USER", "root")
-DB_PASS = os.getenv("MYSQL_PASSWORD", "")
-DB_NAME = os.getenv("MYSQL_DB", "FoodCo_Management")
-
-def get_conn():
-    try:
-        conn = mysql.connector.connect(
-            host=DB_HOST, port=DB_PORT, user=DB_USER, password=DB_PASS, database=DB_NAME
-        )
-        conn.autocommit = True
-        return conn
-    except mysql_errors.Error as e:
-        raise HTTPException(status_code=500, detail=f"DB connection error: {e.msg}")
-
-# ================= APP =================
-app = FastAPI(title="Transactions API", version="1.1 (enum-aware)")
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[
-        "http://localhost:5500","http://127.0.0.1:5500",
-        "http://localhost:5501","http://127.0.0.1:5501",
-        "http://localhost:5502","http://127.0.0.1:5502",
-        "http://localhost:5503","http://127.0.0.1:5503",
-        "http://localhost","http://127.0.0.1",
-    ],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+from config import DB_NAME, LEDGER_HOT_MONTHS
+from db import DBUnavailable, get_conn
+from repository import repo
+from fastjson import FAST_JSON, compile_row_encoder, encode_rows, json_bytes_response, parse_fields, projection
+import batch
+import cache_bus
+import etag
+from auth import require_perm
+from compression import cached
+import idempotency
+import inventory
+import journal
+import sync_log
+
+router = APIRouter()
 
 # ================= HELPERS (schema resolution) =================
 def resolve_table_name(cur, candidates: List[str]) -> str:
-    cur.execute(
-        "SELECT table_name FROM information_schema.tables WHERE table_schema=%s",
-        (DB_NAME,),
-    )
-    existing = {r[0].lower(): r[0] for r in cur.fetchall()}
+    existing = {t.lower(): t for t in repo.table_names(cur)}
     for cand in candidates:
         if cand.lower() in existing:
             return existing[cand.lower()]
     return ""
 
 def resolve_column_names(cur, table: str, wanted: Dict[str, List[str]]) -> Dict[str, str]:
-    cur.execute(
-        "SELECT column_name FROM information_schema.columns WHERE table_schema=%s AND table_name=%s",
-        (DB_NAME, table),
-    )
-    cols = {r[0].lower(): r[0] for r in cur.fetchall()}
+    cols = {c.lower(): c for c in repo.column_names(cur, table)}
     out: Dict[str, str] = {}
     missing = []
     for key, cands in wanted.items():
@@ -80,14 +51,22 @@ def resolve_column_names(cur, table: str, wanted: Dict[str, List[str]]) -> Dict[
         raise HTTPException(status_code=500, detail=f"Column(s) {missing} not found in table '{table}'")
     return out
 
+# Resolved ledger table/columns and ItemType enum — resolved once (warm-up) instead of per request
+_schema_cache: Dict[str, Any] = {}
+
+def clear_schema_cache() -> None:
+    _schema_cache.clear()
+
 def get_tx_table_and_cols() -> Tuple[str, Dict[str, str]]:
+    cached = _schema_cache.get("tx")
+    if cached:
+        return cached
     conn = get_conn(); cur = conn.cursor()
     table = resolve_table_name(cur, ["inventory_transactions", "InventoryTransactions", "transactions", "Transactions"])
-    cur.close(); conn.close()
     if not table:
+        cur.close(); conn.close()
         raise HTTPException(status_code=500, detail="Table inventory_transactions not found")
 
-    conn = get_conn(); cur = conn.cursor()
     cols = resolve_column_names(cur, table, {
         "id":          ["TransactionID", "transaction_id", "id"],
         "txType":      ["TransactionType", "transaction_type", "Type"],
@@ -101,39 +80,29 @@ def get_tx_table_and_cols() -> Tuple[str, Dict[str, str]]:
         "changedBy":   ["ChangedBy", "UserID", "changed_by"],
         "time":        ["TimeUpdate", "time_update", "updated_at", "timestamp", "CreatedAt", "created_at"],
     })
+    cols["version"] = etag.find_version_column(cur, table)
     cur.close(); conn.close()
+    _schema_cache["tx"] = (table, cols)
     return table, cols
 
 # ---------- ENUM helpers (read actual enum list & coerce value) ----------
 def get_enum_values(cur, table: str, column: str) -> List[str]:
-    cur.execute("""
-        SELECT COLUMN_TYPE
-        FROM information_schema.columns
-        WHERE table_schema=%s AND table_name=%s AND column_name=%s
-    """, (DB_NAME, table, column))
-    row = cur.fetchone()
-    if not row or not row[0]:
-        return []
-    coltype = row[0]  # e.g. "enum('RawMaterial','FinishedProduct')"
-    s = coltype.strip()
-    if not s.lower().startswith("enum(") or not s.endswith(")"):
-        return []
-    inside = s[s.find("(")+1:-1]
-    vals = []
-    cur_val = []
-    in_quote = False
-    for ch in inside:
-        if ch == "'":
-            in_quote = not in_quote
-            continue
-        if ch == "," and not in_quote:
-            vals.append("".join(cur_val).strip())
-            cur_val = []
-        else:
-            cur_val.append(ch)
-    if cur_val:
-        vals.append("".join(cur_val).strip())
-    return [v for v in vals if v]
+    # e.g. ['RawMaterial', 'FinishedProduct']; [] when the column is not an ENUM
+    return repo.enum_values(cur, table, column)
+
+def get_item_type_enum(table: str, column: str) -> List[str]:
+    """Cached get_enum_values for the ItemType column (no connection on a hit)."""
+    key = ("enum", table, column)
+    cached = _schema_cache.get(key)
+    if cached is not None:
+        return cached
+    conn = get_conn(); cur = conn.cursor()
+    try:
+        allowed = get_enum_values(cur, table, column)
+    finally:
+        cur.close(); conn.close()
+    _schema_cache[key] = allowed
+    return allowed
 
 def coerce_item_type_for_db(requested: str, allowed: List[str]) -> str:
     """Map Raw/RawMaterial/RawMaterials and Finished/FinishedProduct/FinishedGoods
@@ -170,6 +139,100 @@ def coerce_item_type_for_db(requested: str, allowed: List[str]) -> str:
 def is_raw_item(mapped_item_type: str) -> bool:
     return mapped_item_type.strip().lower().startswith("raw")
 
+# ---------- Cache invalidation (stock is moved by the ledger) ----------
+def tx_item_refs(table: str, c: Dict[str, str], tx_id: int) -> List[Tuple[str, int]]:
+    """Items a stored transaction points at, as (kind, id)."""
+    row = None
+    conn = get_conn(); cur = conn.cursor()
+    try:
+        for t in tx_tables_for_id(table):
+            cur.execute(f"SELECT `{c['materialsId']}`, `{c['productId']}` FROM `{t}` WHERE `{c['id']}`=%s", (tx_id,))
+            row = cur.fetchone()
+            if row:
+                break
+    finally:
+        cur.close(); conn.close()
+    if not row:
+        return []
+    refs = []
+    if row[0] is not None: refs.append(("Raw", int(row[0])))
+    if row[1] is not None: refs.append(("Finished", int(row[1])))
+    return refs
+
+def _item_scopes(refs: List[Tuple[str, Optional[int]]]) -> set:
+    return {(inventory.ITEM_SCOPES[kind], item_id) for kind, item_id in refs if item_id is not None}
+
+def record_tx_changes(cur, tx_ids: List[int], op: str, refs: List[Tuple[str, Optional[int]]]) -> None:
+    """sync_log rows for the transactions and the items whose stock they moved (caller's DB transaction)."""
+    sync_log.record(cur, [("transactions", i, op) for i in tx_ids] + [(scope, i, "U") for scope, i in _item_scopes(refs)])
+
+def publish_tx_changes(tx_ids: List[int], op: str, refs: List[Tuple[str, Optional[int]]]) -> None:
+    """Cache-bus events for the transactions and the items whose stock they moved (after the commit)."""
+    cache_bus.publish("transactions", tx_ids[0] if len(tx_ids) == 1 else None, op)
+    for scope, item_id in _item_scopes(refs):
+        cache_bus.publish(scope, item_id, "U")
+
+def publish_tx_change(tx_id: int, op: str, refs: List[Tuple[str, Optional[int]]]) -> None:
+    publish_tx_changes([tx_id], op, refs)
+
+cache_bus.subscribe("schema", lambda key: clear_schema_cache())
+
+# ================= TIERS (hot table + archive) =================
+# ledger.py roll moves rows older than hot_cutoff(now, LEDGER_HOT_MONTHS) into `<table>_archive`.
+# The cutoff only moves forward, so every archived row is older than today's cutoff no matter
+# when the last roll ran: a range starting at or after it never has to touch the archive.
+# The hot table is always read (rows stay there until a roll, and writes may be backdated).
+ARCHIVE_SUFFIX = "_archive"
+ARCHIVE_RECHECK_SECONDS = 60
+
+def hot_cutoff(now: datetime, hot_months: int) -> datetime:
+    """First instant kept hot: 00:00 on the 1st of the month `hot_months` before `now`'s."""
+    m = now.year * 12 + (now.month - 1) - max(hot_months, 0)
+    return datetime(m // 12, m % 12 + 1, 1)
+
+def get_archive_table(table: str) -> str:
+    """`<table>_archive` once migrations.py (version 8) has created it, else "" (checked again
+    after ARCHIVE_RECHECK_SECONDS, so workers notice a migration run from another process)."""
+    key = ("archive", table)
+    cached = _schema_cache.get(key)
+    if cached is not None and (cached[0] or monotonic() < cached[1]):
+        return cached[0]
+    conn = get_conn(); cur = conn.cursor()
+    try:
+        archive = resolve_table_name(cur, [table + ARCHIVE_SUFFIX])
+    finally:
+        cur.close(); conn.close()
+    _schema_cache[key] = (archive, monotonic() + ARCHIVE_RECHECK_SECONDS)
+    return archive
+
+def clear_tier_cache(key: Optional[str] = None) -> None:
+    for k in [k for k in _schema_cache if isinstance(k, tuple) and k[0] == "archive"]:
+        _schema_cache.pop(k, None)
+
+cache_bus.subscribe("ledger", clear_tier_cache)
+
+def tx_tables(table: str, c: Dict[str, str], start: Optional[datetime] = None,
+              end: Optional[datetime] = None) -> List[str]:
+    """Tiers that can hold rows with start <= time < end (newest tier first)."""
+    archive = get_archive_table(table)
+    if archive and (start is None or start < hot_cutoff(datetime.now(), LEDGER_HOT_MONTHS)):
+        return [table, archive]
+    return [table]
+
+def tx_tables_for_id(table: str) -> List[str]:
+    archive = get_archive_table(table)
+    return [table, archive] if archive else [table]
+
+def tiered_select(tables: List[str], exprs: List[Tuple[str, str]], id_col: str,
+                  where_sql: str, vals: List[Any]) -> Tuple[str, Tuple[Any, ...]]:
+    """SELECT expr AS alias ... over one tier, or a UNION ALL of them, newest id first."""
+    cols = ", ".join(f"{e} AS `{a}`" for e, a in exprs)
+    if len(tables) == 1:
+        return f"SELECT {cols} FROM `{tables[0]}` {where_sql} ORDER BY `{id_col}` DESC", tuple(vals)
+    parts = " UNION ALL ".join(f"SELECT {cols}, `{id_col}` AS `_order_id` FROM `{t}` {where_sql}" for t in tables)
+    outer = ", ".join(f"u.`{a}`" for _, a in exprs)
+    return f"SELECT {outer} FROM ({parts}) AS u ORDER BY u.`_order_id` DESC", tuple(vals) * len(tables)
+
 # ================= MODELS =================
 ItemTypeIn = Literal["Raw", "RawMaterial", "RawMaterials", "Finished", "FinishedProduct", "FinishedGoods"]
 TxTypeIn   = Literal["Import", "Export"]
@@ -245,20 +308,45 @@ class TxOut(BaseModel):
     ChangedBy: int
     TimeUpdate: Optional[datetime] = None
 
+# Same key order / json-mode rendering as TxOut (SELECT column order below)
+TX_FIELDS = [
+    ("TransactionID", "int"), ("TransactionType", "str"), ("ItemType", "str"),
+    ("MaterialsId", "int"), ("ProductId", "int"), ("Qty", "float"),
+    ("BeforeQty", "float"), ("AfterQty", "float"), ("Note", "str"),
+    ("ChangedBy", "int"), ("TimeUpdate", "datetime"),
+]
+# resolved-column keys (get_tx_table_and_cols) in TX_FIELDS order
+TX_COLUMN_KEYS = ["id", "txType", "itemType", "materialsId", "productId", "qty",
+                  "beforeQty", "afterQty", "note", "changedBy", "time"]
+encode_tx_row = compile_row_encoder(TX_FIELDS, name="encode_tx_row")
+
+def warm_up() -> None:
+    """Resolve the ledger table/columns, its ItemType enum and the archive tier once."""
+    table, c = get_tx_table_and_cols()
+    get_item_type_enum(table, c['itemType'])
+    get_archive_table(table)
+
 # ================= HEALTH =================
-@app.get("/api/tx/health")
+@router.get("/api/tx/health")
 def health():
     return {"ok": True, "db": DB_NAME, "time": datetime.now(timezone.utc).isoformat()}
 
 # ================= CRUD =================
-@app.get("/api/transactions", response_model=List[TxOut])
+@router.get("/api/transactions", response_model=List[TxOut], dependencies=[require_perm("transactions:read")])
 def list_transactions(
+    request: Request,
     tx_type: Optional[TxTypeIn] = Query(None, alias="type"),
     item_type: Optional[ItemTypeIn] = Query(None),
     from_date: Optional[date] = Query(None),
     to_date: Optional[date] = Query(None),
     changed_by: Optional[int] = Query(None),
+    fields: Optional[str] = Query(None, description="Comma-separated subset, e.g. TransactionID,Qty,TimeUpdate"),
 ):
+    return cached(request, ("transactions",),
+                  lambda: _list_transactions(tx_type, item_type, from_date, to_date, changed_by, fields))
+
+def _list_transactions(tx_type, item_type, from_date, to_date, changed_by, fields):
+    proj = parse_fields(fields, TX_FIELDS)
     table, c = get_tx_table_and_cols()
     where, vals = [], []
     if tx_type:
@@ -266,44 +354,76 @@ def list_transactions(
     if item_type:
         where.append(f"`{c['itemType']}`=%s")
         # map item_type from request to DB enum value
-        conn = get_conn(); cur = conn.cursor()
+        allowed = get_item_type_enum(table, c['itemType'])
+        vals.append(coerce_item_type_for_db(_normalize_item_type(item_type), allowed))
+    if changed_by is not None:
+        where.append(f"`{c['changedBy']}`=%s"); vals.append(changed_by)
+    # plain range on the column (index-friendly), not DATE(col)
+    start = datetime.combine(from_date, time.min) if from_date else None
+    end = datetime.combine(to_date + timedelta(days=1), time.min) if to_date else None
+    if start:
+        where.append(f"`{c['time']}` >= %s"); vals.append(start)
+    if end:
+        where.append(f"`{c['time']}` < %s"); vals.append(end)
+
+    where_sql = ('WHERE ' + ' AND '.join(where)) if where else ''
+    tables = tx_tables(table, c, start, end)
+    if proj:
+        # sparse fieldset: only these columns are selected and encoded (always via fastjson)
+        _, _, encoder = projection(TX_FIELDS, proj, "tx")
+        exprs = [(f"`{c[TX_COLUMN_KEYS[i]]}`", TX_FIELDS[i][0]) for i in proj]
+        q, params = tiered_select(tables, exprs, c['id'], where_sql, vals)
+        conn = get_conn(read_only=True); cur = conn.cursor()
         try:
-            allowed = get_enum_values(cur, table, c['itemType'])
-            mapped = coerce_item_type_for_db(_normalize_item_type(item_type), allowed)
-            vals.append(mapped)
+            cur.execute(q, params)
+            rows = cur.fetchall()
         finally:
             cur.close(); conn.close()
-    if changed_by is not None:
-        where.append(f"`{c['changedBy']}`=%s"); vals.append(changed_by)
-    if from_date:
-        where.append(f"DATE(`{c['time']}`) >= %s"); vals.append(from_date.isoformat())
-    if to_date:
-        where.append(f"DATE(`{c['time']}`) <= %s"); vals.append(to_date.isoformat())
+        return json_bytes_response(encode_rows(encoder, rows))
 
-    q = f"""
-      SELECT `{c['id']}`   AS TransactionID,
-             `{c['txType']}` AS TransactionType,
-             `{c['itemType']}` AS ItemType,
-             `{c['materialsId']}` AS MaterialsId,
-             `{c['productId']}`   AS ProductId,
-             `{c['qty']}`         AS Qty,
-             `{c['beforeQty']}`   AS BeforeQty,
-             `{c['afterQty']}`    AS AfterQty,
-             `{c['note']}`        AS Note,
-             `{c['changedBy']}`   AS ChangedBy,
-             `{c['time']}`        AS TimeUpdate
-      FROM `{table}`
-      {('WHERE ' + ' AND '.join(where)) if where else ''}
-      ORDER BY `{c['id']}` DESC
-    """
-    conn = get_conn(); cur = conn.cursor(dictionary=True)
-    cur.execute(q, tuple(vals))
+    exprs = [(f"`{c[k]}`", name) for k, (name, _) in zip(TX_COLUMN_KEYS, TX_FIELDS)]
+    q, params = tiered_select(tables, exprs, c['id'], where_sql, vals)
+    conn = get_conn(read_only=True); cur = conn.cursor(dictionary=not FAST_JSON)
+    cur.execute(q, params)
     rows = cur.fetchall()
     cur.close(); conn.close()
+    if FAST_JSON:
+        # tuples → JSON bytes directly (skips List[TxOut] re-validation)
+        return json_bytes_response(encode_rows(encode_tx_row, rows))
     return rows
 
-@app.get("/api/transactions/{tx_id}", response_model=TxOut)
-def get_transaction(tx_id: int):
+def fetch_tx_by_ids(wanted: List[int], primary: bool = False) -> Tuple[List[Any], List[int]]:
+    """
+    Rows (TX_FIELDS order) for `wanted` in request order + the ids not found in either tier.
+    primary=True reads the primary, never a replica (re-reads right after a write).
+    """
+    table, c = get_tx_table_and_cols()
+    cols = ", ".join(f"`{c[k]}`" for k in TX_COLUMN_KEYS)
+    found: Dict[int, Any] = {}
+    conn = get_conn(read_only=not primary); cur = conn.cursor()
+    try:
+        # hot tier first; only ids it did not have are looked up in the archive
+        for t in tx_tables_for_id(table):
+            todo = [i for i in wanted if i not in found]
+            if not todo:
+                break
+            cur.execute(f"SELECT {cols} FROM `{t}` WHERE {batch.in_clause(c['id'], len(todo))}", tuple(todo))
+            found.update(batch.index_rows(cur.fetchall()))
+    finally:
+        cur.close(); conn.close()
+    return batch.in_request_order(wanted, found)
+
+# declared before /{tx_id} so "batch" is not parsed as an id
+@router.get("/api/transactions/batch", dependencies=[require_perm("transactions:read")])
+def get_transactions_batch(ids: str = Query(..., description="Comma-separated TransactionIDs, e.g. 3,1,2")):
+    rows, missing = fetch_tx_by_ids(batch.parse_ids(ids))
+    if FAST_JSON:
+        return json_bytes_response(batch.encode_batch(encode_rows(encode_tx_row, rows), missing))
+    keys = list(TxOut.model_fields)
+    return {"data": [TxOut(**dict(zip(keys, r))) for r in rows], "missing": missing}
+
+@router.get("/api/transactions/{tx_id}", response_model=TxOut, dependencies=[require_perm("transactions:read")])
+def get_transaction(tx_id: int, response: Response):
     table, c = get_tx_table_and_cols()
     q = f"""
       SELECT `{c['id']}` AS TransactionID, `{c['txType']}` AS TransactionType,
@@ -311,28 +431,47 @@ def get_transaction(tx_id: int):
              `{c['productId']}` AS ProductId, `{c['qty']}` AS Qty,
              `{c['beforeQty']}` AS BeforeQty, `{c['afterQty']}` AS AfterQty,
              `{c['note']}` AS Note, `{c['changedBy']}` AS ChangedBy,
-             `{c['time']}` AS TimeUpdate
-      FROM `{table}` WHERE `{c['id']}`=%s
+             `{c['time']}` AS TimeUpdate, {etag.version_sql(c)} AS _version
+      FROM `{{table}}` WHERE `{c['id']}`=%s
     """
-    conn = get_conn(); cur = conn.cursor(dictionary=True)
-    cur.execute(q, (tx_id,))
-    row = cur.fetchone()
+    row = None
+    conn = get_conn(read_only=True); cur = conn.cursor(dictionary=True)
+    for t in tx_tables_for_id(table):
+        cur.execute(q.format(table=t), (tx_id,))
+        row = cur.fetchone()
+        if row:
+            break
     cur.close(); conn.close()
     if not row:
         raise HTTPException(status_code=404, detail="Transaction not found")
+    response.headers["ETag"] = etag.make(row.pop("_version"), row["TimeUpdate"])
     return row
 
-@app.post("/api/transactions", status_code=status.HTTP_201_CREATED)
-def create_transaction(payload: TxCreate):
+@router.post("/api/transactions", status_code=status.HTTP_201_CREATED)
+def create_transaction(payload: TxCreate, idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+                       claims: Dict[str, Any] = require_perm("transactions:write")):
+    # a replayed POST (retry after 401/refresh, network retry) must not write a second ledger row
+    return idempotency.run("transactions", idempotency_key, payload,
+                           lambda: _post_transaction(payload), status.HTTP_201_CREATED, claims.get("sub"))
+
+def _post_transaction(payload: TxCreate):
+    # while the journal has a backlog, new rows queue behind it so the ledger keeps POST order
+    if journal.TX_JOURNAL == "always" or (journal.enabled() and journal.has_backlog()):
+        return journal.accepted(journal.append(payload.model_dump(mode="json")))
+    try:
+        return _insert_transaction(payload)
+    except DBUnavailable:
+        # nothing reached MySQL, so deferring cannot duplicate the row
+        if not journal.enabled():
+            raise
+        return journal.accepted(journal.append(payload.model_dump(mode="json")))
+
+def _insert_transaction(payload: TxCreate) -> Dict[str, Any]:
     table, c = get_tx_table_and_cols()
 
     # Map ItemType from request → actual DB enum value
-    conn = get_conn(); cur = conn.cursor()
-    try:
-        allowed = get_enum_values(cur, table, c['itemType'])
-        mapped_item_type = coerce_item_type_for_db(payload.ItemType, allowed)
-    finally:
-        cur.close(); conn.close()
+    allowed = get_item_type_enum(table, c['itemType'])
+    mapped_item_type = coerce_item_type_for_db(payload.ItemType, allowed)
 
     fields = [c['txType'], c['itemType'], c['qty'], c['changedBy']]
     placeholders = ["%s", "%s", "%s", "%s"]
@@ -348,18 +487,147 @@ def create_transaction(payload: TxCreate):
         fields.append(c['note']); placeholders.append("%s"); values.append(payload.Note)
 
     q = f"INSERT INTO `{table}`({', '.join('`'+f+'`' for f in fields)}) VALUES ({', '.join(placeholders)})"
-    conn = get_conn(); cur = conn.cursor()
+    refs = [("Raw", payload.MaterialsId) if is_raw_item(mapped_item_type) else ("Finished", payload.ProductId)]
+    conn = get_conn(autocommit=False); cur = conn.cursor()
     try:
         cur.execute(q, tuple(values))
         new_id = cur.lastrowid
+        record_tx_changes(cur, [new_id], "I", refs)
+        conn.commit()
     except mysql_errors.Error as e:
+        conn.rollback()
         raise HTTPException(status_code=400, detail=e.msg)
     finally:
         cur.close(); conn.close()
+    publish_tx_change(new_id, "I", refs)
     return {"id": new_id}
 
-@app.put("/api/transactions/{tx_id}")
-def update_transaction(tx_id: int, payload: TxUpdate):
+# Multi-row ledger INSERT (production runs, journal replay): every row sets the same columns
+TX_INSERT_KEYS = ["txType", "itemType", "materialsId", "productId", "qty", "note", "changedBy"]
+
+def tx_insert_sql(table: str, c: Dict[str, str], n: int) -> str:
+    row = "(" + ", ".join(["%s"] * len(TX_INSERT_KEYS)) + ")"
+    return (f"INSERT INTO `{table}` ({', '.join(f'`{c[k]}`' for k in TX_INSERT_KEYS)}) "
+            f"VALUES {', '.join([row] * n)}")
+
+def tx_insert_values(payload: TxCreate, mapped_item_type: str) -> Tuple[Any, ...]:
+    raw = is_raw_item(mapped_item_type)
+    return (payload.TransactionType, mapped_item_type, payload.MaterialsId if raw else None,
+            None if raw else payload.ProductId, payload.Qty, payload.Note, payload.ChangedBy)
+
+_journal_table_ready = False
+
+def _is_data_error(e: Exception) -> bool:
+    # rejected rows (constraint, bad value) vs. a lost/slow connection, which is retried
+    return isinstance(e, mysql_errors.DatabaseError) and not isinstance(e, mysql_errors.OperationalError)
+
+def replay_journal(entries: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, Tuple[Optional[int], Optional[str]]]:
+    """journal.Applier: insert journaled TxCreate payloads in order, recording each journal id."""
+    table, c = get_tx_table_and_cols()
+    allowed = get_item_type_enum(table, c['itemType'])
+    out: Dict[str, Tuple[Optional[int], Optional[str]]] = {}
+    rows: List[Tuple[str, Tuple[Any, ...]]] = []
+    for jid, data in entries:
+        try:
+            p = TxCreate(**data)
+            rows.append((jid, tx_insert_values(p, coerce_item_type_for_db(p.ItemType, allowed))))
+        except HTTPException as e:
+            out[jid] = (None, str(e.detail))
+        except ValueError as e:
+            out[jid] = (None, str(e))
+
+    global _journal_table_ready
+    conn = get_conn(autocommit=False); cur = conn.cursor()
+    try:
+        if not _journal_table_ready:
+            if not repo.creates_schema:
+                cur.execute(journal.DDL)   # normally already created by migrations.py
+            _journal_table_ready = True
+        if rows:
+            jids = [jid for jid, _ in rows]
+            cur.execute(f"SELECT JournalId, TransactionID FROM `{journal.APPLIED_TABLE}` "
+                        f"WHERE {batch.in_clause('JournalId', len(jids))}", tuple(jids))
+            for jid, tx_id in cur.fetchall():
+                out[jid] = (int(tx_id), None)   # committed by an earlier pass that died before marking
+            rows = [r for r in rows if r[0] not in out]
+        try:
+            _insert_journaled(cur, table, c, rows, out)
+            conn.commit()
+        except mysql_errors.Error as e:
+            conn.rollback()
+            if not _is_data_error(e):
+                raise
+            # one bad row must not block the rest: retry row by row, failing only the culprits
+            for r in rows:
+                try:
+                    _insert_journaled(cur, table, c, [r], out)
+                    conn.commit()
+                except mysql_errors.Error as e1:
+                    conn.rollback()
+                    if not _is_data_error(e1):
+                        raise
+                    out[r[0]] = (None, e1.msg)
+    finally:
+        cur.close(); conn.close()
+
+    inserted = [(jid, v) for jid, v in rows if out[jid][1] is None]
+    if inserted:
+        publish_tx_changes([out[jid][0] for jid, _ in inserted], "I", _journal_refs(inserted))
+    return out
+
+def _insert_journaled(cur, table: str, c: Dict[str, str], rows: List[Tuple[str, Tuple[Any, ...]]],
+                      out: Dict[str, Tuple[Optional[int], Optional[str]]]) -> None:
+    if not rows:
+        return
+    # one INSERT per row: a multi-row INSERT's ids are only consecutive with
+    # innodb_autoinc_lock_mode<2 and auto_increment_increment=1 (still one DB transaction)
+    sql = tx_insert_sql(table, c, 1)
+    ids: List[int] = []
+    for _, vals in rows:
+        cur.execute(sql, vals)
+        ids.append(int(cur.lastrowid))
+    cur.execute(
+        f"INSERT INTO `{journal.APPLIED_TABLE}` (JournalId, TransactionID) VALUES "
+        + ", ".join(["(%s, %s)"] * len(rows)),
+        tuple(v for (jid, _), tx_id in zip(rows, ids) for v in (jid, tx_id)),
+    )
+    record_tx_changes(cur, ids, "I", _journal_refs(rows))
+    for (jid, _), tx_id in zip(rows, ids):
+        out[jid] = (tx_id, None)
+
+def _journal_refs(rows: List[Tuple[str, Tuple[Any, ...]]]) -> List[Tuple[str, Optional[int]]]:
+    # TX_INSERT_KEYS order: materialsId, productId at 2, 3
+    return [("Raw", v[2]) if v[2] is not None else ("Finished", v[3]) for _, v in rows]
+
+def _conditional_write(head_sql: str, vals: List[Any], tx_id: int, token: Optional[etag.Token],
+                       op: str, refs: List[Tuple[str, Optional[int]]]) -> None:
+    """`head_sql` WHERE id=%s [AND version/time = If-Match] on the tier holding the row, plus its
+    sync_log rows in the same DB transaction; 404 / 412."""
+    table, c = get_tx_table_and_cols()
+    tables = tx_tables_for_id(table)
+    cond, params = etag.where(c, token)
+    conn = get_conn(autocommit=False); cur = conn.cursor()
+    try:
+        for t in tables:
+            cur.execute(f"{head_sql.format(table=t)} WHERE `{c['id']}`=%s{cond}", (*vals, tx_id, *params))
+            if cur.rowcount:
+                break
+        else:
+            if token is None:
+                raise HTTPException(status_code=404, detail="Transaction not found")
+            etag.check_miss(cur, tables, c, tx_id, token, "Transaction not found")
+        record_tx_changes(cur, [tx_id], op, refs)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close(); conn.close()
+
+@router.put("/api/transactions/{tx_id}", dependencies=[require_perm("transactions:write")])
+def update_transaction(tx_id: int, payload: TxUpdate, response: Response,
+                       if_match: Optional[str] = Header(None, alias="If-Match")):
+    token = etag.parse_if_match(if_match)
     table, c = get_tx_table_and_cols()
     fields: List[str] = []
     vals: List[Any] = []
@@ -370,12 +638,8 @@ def update_transaction(tx_id: int, payload: TxUpdate):
     mapped_item_type: Optional[str] = None
     if payload.ItemType is not None:
         # Map ItemType to DB enum value
-        conn = get_conn(); cur = conn.cursor()
-        try:
-            allowed = get_enum_values(cur, table, c['itemType'])
-            mapped_item_type = coerce_item_type_for_db(payload.ItemType, allowed)
-        finally:
-            cur.close(); conn.close()
+        allowed = get_item_type_enum(table, c['itemType'])
+        mapped_item_type = coerce_item_type_for_db(payload.ItemType, allowed)
 
         fields.append(f"`{c['itemType']}`=%s"); vals.append(mapped_item_type)
         # flip the opposite foreign key to NULL
@@ -398,24 +662,19 @@ def update_transaction(tx_id: int, payload: TxUpdate):
     if not fields:
         raise HTTPException(status_code=400, detail="No fields to update")
 
-    q = f"UPDATE `{table}` SET {', '.join(fields)} WHERE `{c['id']}`=%s"
-    vals.append(tx_id)
-    conn = get_conn(); cur = conn.cursor()
-    cur.execute(q, tuple(vals))
-    affected = cur.rowcount
-    cur.close(); conn.close()
-    if affected == 0:
-        raise HTTPException(status_code=404, detail="Transaction not found")
+    refs = tx_item_refs(table, c, tx_id) + [("Raw", payload.MaterialsId), ("Finished", payload.ProductId)]
+    _conditional_write(f"UPDATE `{{table}}` SET {', '.join(fields + etag.bump(c))}", vals, tx_id, token, "U", refs)
+    publish_tx_change(tx_id, "U", refs)
+    new_tag = etag.next_etag(c, token)
+    if new_tag:
+        response.headers["ETag"] = new_tag
     return {"updated": True}
 
-@app.delete("/api/transactions/{tx_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_transaction(tx_id: int):
+@router.delete("/api/transactions/{tx_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[require_perm("transactions:write")])
+def delete_transaction(tx_id: int, if_match: Optional[str] = Header(None, alias="If-Match")):
+    token = etag.parse_if_match(if_match)
     table, c = get_tx_table_and_cols()
-    q = f"DELETE FROM `{table}` WHERE `{c['id']}`=%s"
-    conn = get_conn(); cur = conn.cursor()
-    cur.execute(q, (tx_id,))
-    affected = cur.rowcount
-    cur.close(); conn.close()
-    if affected == 0:
-        raise HTTPException(status_code=404, detail="Transaction not found")
+    refs = tx_item_refs(table, c, tx_id)
+    _conditional_write("DELETE FROM `{table}`", [], tx_id, token, "D", refs)
+    publish_tx_change(tx_id, "D", refs)
     return
@@ -1,63 +1,43 @@
-import os
+# user.py — Users CRUD + JWT auth (/api/users, /api/auth/*, /api/me)
+# Routes are mounted by main.create_app(); run: uvicorn main:app --reload --port 8001
+import csv
+import io
+import json
 import re
-import uuid
 import time
+import uuid
 import hashlib
 import jwt  # PyJWT
-from datetime import timezone
-from datetime import date, datetime, timedelta
-from typing import List, Optional, Literal, Any, Dict, Tuple 
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional, Literal, Any, Dict, Tuple
 from starlette.middleware.base import BaseHTTPMiddleware
-from datetime import datetime, timezone
 
-from dotenv import load_dotenv
 import mysql.connector
-from mysql.connector import errors as mysql_errors
-from fastapi import FastAPI, HTTPException, Depends, status, Header, Request
+from fastapi import APIRouter, HTTPException, Depends, status, Header, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
-from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field, validator
-
-print("Now UTC:", datetime.now(timezone.utc).isoformat())
-
-# ------------------ Load env ------------------
-load_dotenv()
-DB_HOST = os.getenv("MYSQL_HOST", "127.0.0.1")
-DB_PORT = int(os.getenv("MYSQL_PORT", "3306"))
-DB_USER = os.getenv("MYSQL_USER", "root")
-DB_PASS = os.getenv("MYSQL_PASSWORD", "")
-DB_NAME = os.getenv("MYSQL_DB", "FoodCo_Management")
-
-# JWT env
-JWT_SECRET = os.getenv("JWT_SECRET", "change_me_super_secret")
-JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_MINUTES", "60"))
-REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_DAYS", "7"))
+from pydantic import BaseModel, Field, ValidationError, validator
+
+import cache_bus
+from auth import REVOKED_JTI, decode_token, ensure_not_revoked, require_perm, role_claims
+from compression import cached
+import batch
+import db
+import idempotency
+from repository import repo
+from config import (
+    JWT_SECRET, JWT_ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS,
+    USERS_PAGE_SIZE, USERS_PAGE_MAX, ROLES_CACHE_SECONDS,
+    BULK_USERS_MAX, BULK_USERS_MAX_BYTES, BULK_INSERT_CHUNK,
+)
+from fastjson import FAST_JSON, compile_row_encoder, encode_rows, json_bytes_response, parse_fields, projection
 
 # ------------------ Regex -----------------
 USERNAME_RE = re.compile(r"^[a-zA-Z0-9_]{3,30}$")
 EMAIL_RE = re.compile(r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$")
 
-# ------------------ FastAPI -----------------
-
-app = FastAPI(title="FoodCo API", version="1.0")
-
-# CORS: allow frontend at these origins to call API
-origins = [
-    "http://localhost:5500",      # VS Code Live Server
-    "http://127.0.0.1:5500",
-    # add more if you run on other ports:
-    # "http://localhost:3000",
-    # "http://localhost:5173",
-]
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:5500", "http://127.0.0.1:5500"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# ------------------ Router -----------------
+router = APIRouter()
 
 
 # ------------------ Schemas -----------------
@@ -122,58 +102,46 @@ class LogoutResponse(BaseModel):
 
 # ------------------ DB Helpers -----------------
 def _now() -> datetime:
-    now = datetime.now(timezone.utc)
-    print("[DEBUG] UTC now:", now.isoformat())
-    return now
+    return datetime.now(timezone.utc)
 
-def decode_token(token: str) -> dict:
-    try:
-        now = datetime.now(timezone.utc).timestamp()
-        print("[DEBUG] Server time (epoch):", now)
-        return jwt.decode(
-            token,
-            JWT_SECRET,
-            algorithms=[JWT_ALGORITHM],
-            leeway=60  
-        )
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.InvalidTokenError as e:
-        print("[JWT Decode Error]", str(e))
-        raise HTTPException(status_code=401, detail="Invalid token")
-def get_conn():
-    return mysql.connector.connect(
-        host=DB_HOST, port=DB_PORT, user=DB_USER, password=DB_PASS, database=DB_NAME
-    )
+def get_conn(read_only: bool = False):
+    # handlers here commit/rollback explicitly
+    return db.get_conn(autocommit=False, read_only=read_only)
+
+# Table existence / DESCRIBE / PK results, resolved once per process (warm-up primes them)
+_schema_cache: Dict[Tuple[str, str], Any] = {}
+
+def clear_schema_cache() -> None:
+    _schema_cache.clear()
 
 def table_exists(cur, table_name: str) -> bool:
-    cur.execute("SHOW TABLES LIKE %s", (table_name,))
-    return cur.fetchone() is not None
+    key = ("exists", table_name)
+    if key not in _schema_cache:
+        _schema_cache[key] = table_name in repo.table_names(cur)
+    return _schema_cache[key]
 
 def get_columns(cur, table_name: str) -> set:
-    cur.execute(f"DESCRIBE `{table_name}`")
-    rows = cur.fetchall() or []
-    if not rows:
-        return set()
-    if not isinstance(rows[0], dict):
-        return {r[0] for r in rows}
-    return {r.get("Field") for r in rows if "Field" in r}
+    key = ("columns", table_name)
+    if key in _schema_cache:
+        return _schema_cache[key]
+    cols = set(repo.column_names(cur, table_name))
+    _schema_cache[key] = cols
+    return cols
 
 def get_users_pk(cur) -> str:
+    key = ("pk", "users")
+    if key not in _schema_cache:
+        _schema_cache[key] = _resolve_users_pk(cur)
+    return _schema_cache[key]
+
+def _resolve_users_pk(cur) -> str:
     # Prefer common column names
     cols = get_columns(cur, "users")
     if "UserID" in cols: return "UserID"
     if "user_id" in cols: return "user_id"
     if "id" in cols: return "id"
     # Thử đọc từ khóa chính
-    cur.execute("SHOW KEYS FROM `users` WHERE Key_name='PRIMARY'")
-    row = cur.fetchone()
-    if row:
-        if isinstance(row, dict):
-            return row.get("Column_name", "UserID")
-        elif len(row) >= 5:
-            return row[4]
-    return "UserID"
+    return repo.primary_key(cur, "users") or "UserID"
 
 def find_user_location(cur, user_id: int) -> Tuple[str, str]:
     has_users = table_exists(cur, "users")
@@ -232,32 +200,78 @@ def get_user_item(cur, table_name: str, pk: str, user_id: int) -> Optional[dict]
 
     return None
 
-def username_or_email_exists(cur, table_name: str, username: str, email: str, exclude_pk: Optional[Tuple[str, int]] = None) -> bool:
-    if table_name == "users":
-        pk = get_users_pk(cur)
-        q = f"SELECT 1 FROM `users` WHERE (UserName=%s OR Email=%s)"
-        params = [username, email]
-        if exclude_pk:
-            q += f" AND `{pk}`<>%s"
-            params.append(exclude_pk[1])
-        q += " LIMIT 1"
-        cur.execute(q, tuple(params))
-        return cur.fetchone() is not None
+# ------------------ Identity lookup -----------------
+# Login and uniqueness checks: one statement of equality probes (UNION ALL) instead of
+# `UserName=%s OR Email=%s`, so each branch can use its own index. Table layouts are
+# resolved once and cached with the rest of the schema.
+def identity_sources(cur) -> List[Dict[str, Optional[str]]]:
+    key = ("identity", "sources")
+    if key in _schema_cache:
+        return _schema_cache[key]
+    sources = []
+    for table_name in ("users", "user"):   # `users` wins when both tables know the identifier
+        if not table_exists(cur, table_name):
+            continue
+        cols = get_columns(cur, table_name)
+        if table_name == "users":
+            pk = get_users_pk(cur)
+            uname_col = "UserName" if "UserName" in cols else "Username"
+            phone_col = "PhoneNumber" if "PhoneNumber" in cols else None
+        else:
+            pk = "UserID"
+            uname_col = "Username" if "Username" in cols else "UserName"
+            phone_col = "Phonenumber" if "Phonenumber" in cols else ("PhoneNumber" if "PhoneNumber" in cols else None)
+        sources.append({
+            "table": table_name, "pk": pk, "username": uname_col, "phone": phone_col,
+            "role": "RoleID" if "RoleID" in cols else None,
+            "active": "IsActive" if "IsActive" in cols else None,
+        })
+    _schema_cache[key] = sources
+    return sources
+
+def identity_login_sql(cur) -> Optional[str]:
+    key = ("identity", "login")
+    if key not in _schema_cache:
+        parts = []
+        for rank, src in enumerate(identity_sources(cur)):
+            select = (
+                f"SELECT {rank} AS src, u.`{src['pk']}` AS user_id, u.`{src['username']}` AS username, "
+                f"u.Email AS email, {'u.`' + src['phone'] + '`' if src['phone'] else 'NULL'} AS phone, "
+                f"u.PasswordHash AS password_hash, {'u.RoleID' if src['role'] else 'NULL'} AS role_id, "
+                f"{'u.IsActive' if src['active'] else 'NULL'} AS is_active FROM `{src['table']}` u"
+            )
+            parts.append(repo.union_member(f"{select} WHERE u.`{src['username']}`=%s LIMIT 1"))
+            parts.append(repo.union_member(f"{select} WHERE u.Email=%s LIMIT 1"))
+        _schema_cache[key] = (" UNION ALL ".join(parts) + " ORDER BY src LIMIT 1") if parts else None
+    return _schema_cache[key]
+
+def find_identity(cur, identifier: str) -> Optional[dict]:
+    """User row (dict cursor) whose username or email equals `identifier`; one query."""
+    sql = identity_login_sql(cur)
+    if not sql:
+        return None
+    cur.execute(sql, (identifier,) * sql.count("%s"))
+    rows = cur.fetchall()
+    if not rows:
+        return None
+    row = rows[0]
+    row.pop("src", None)
+    return row
 
-    if table_name == "user":
-        cols = get_columns(cur, "user")
-        uname_col = "Username" if "Username" in cols else "UserName"
-        pk = "UserID"
-        q = f"SELECT 1 FROM `user` WHERE ({uname_col}=%s OR Email=%s)"
-        params = [username, email]
-        if exclude_pk:
-            q += f" AND `{pk}`<>%s"
-            params.append(exclude_pk[1])
-        q += " LIMIT 1"
-        cur.execute(q, tuple(params))
-        return cur.fetchone() is not None
+def identity_exists_sql(src: Dict[str, Optional[str]], exclude: bool = False) -> str:
+    excl = f" AND u.`{src['pk']}`<>%s" if exclude else ""
+    return (repo.union_member(f"SELECT 1 FROM `{src['table']}` u WHERE u.`{src['username']}`=%s{excl} LIMIT 1")
+            + " UNION ALL "
+            + repo.union_member(f"SELECT 1 FROM `{src['table']}` u WHERE u.Email=%s{excl} LIMIT 1") + " LIMIT 1")
 
-    return False
+def username_or_email_exists(cur, table_name: str, username: str, email: str, exclude_pk: Optional[Tuple[str, int]] = None) -> bool:
+    src = next((x for x in identity_sources(cur) if x["table"] == table_name), None)
+    if src is None:
+        return False
+    q = identity_exists_sql(src, exclude=bool(exclude_pk))
+    params = [username, exclude_pk[1], email, exclude_pk[1]] if exclude_pk else [username, email]
+    cur.execute(q, tuple(params))
+    return bool(cur.fetchall())
 
 # ------------------ Password helpers -----------------
 def hash_sha256(plain: str) -> str:
@@ -267,89 +281,213 @@ def verify_password(plain: str, hashed: str) -> bool:
     return hash_sha256(plain) == hashed
 
 # ------------------ CRUD APIs -----------------
-@app.get("/api/users", response_model=List[UserItem])
-def list_user():
+# Fixed column order (== UserItem field order) so rows can be encoded positionally
+USER_ROW_FIELDS = [
+    ("user_id", "int"), ("table_used", "str"), ("username", "str"), ("email", "str"),
+    ("phone", "str"), ("birthdate", "date"), ("role_id", "int"), ("role_name", "str"),
+    ("is_active", "bool"),
+]
+encode_user_row = compile_row_encoder(USER_ROW_FIELDS, name="encode_user_row")
+ROLE_NAME_POS = 7  # role_name: selected as RoleID, then mapped through the cached roles table
+
+USER_FIELDS = list(UserItem.model_fields)
+
+class UserPage(BaseModel):
+    data: List[UserItem]
+    next_cursor: Optional[str] = None
+
+# ------------------ Roles (RoleID → RoleName), cached -----------------
+# Replaces the per-row LEFT JOIN roles; refreshed on a "roles" cache-bus event or after ROLES_CACHE_SECONDS.
+# A timed reload that finds different names publishes "roles" itself: cached /api/users pages embed them.
+_roles: Optional[Dict[int, str]] = None
+_roles_loaded_at = 0.0
+
+def clear_roles_cache(key: Optional[str] = None) -> None:
+    global _roles
+    _roles = None
+
+def get_role_names(cur) -> Dict[int, str]:
+    global _roles, _roles_loaded_at
+    previous = _roles
+    if previous is not None and time.monotonic() - _roles_loaded_at < ROLES_CACHE_SECONDS:
+        return previous
+    names: Dict[int, str] = {}
+    if table_exists(cur, "roles"):
+        cur.execute("SELECT RoleID, RoleName FROM `roles`")
+        for r in cur.fetchall():
+            rid, name = (r["RoleID"], r["RoleName"]) if isinstance(r, dict) else (r[0], r[1])
+            names[int(rid)] = name
+    if previous is not None and names != previous:
+        cache_bus.publish("roles")   # clears _roles everywhere, so assign after it
+    _roles, _roles_loaded_at = names, time.monotonic()
+    return names
+
+def refresh_role_names() -> None:
+    """Due timed reload, run before a cached read: a page cache hit never reaches get_role_names."""
+    if _roles is None or time.monotonic() - _roles_loaded_at < ROLES_CACHE_SECONDS:
+        return   # fresh, or cleared by a "roles" event (which already invalidated the pages)
+    cnx = get_conn(read_only=True)
     try:
-        cnx = get_conn()
+        cur = cnx.cursor()
+        get_role_names(cur)
+        cur.close()
+    finally:
+        cnx.close()
+
+def fill_role_names(cur, rows: List[Any], pos: Optional[int]) -> List[Any]:
+    """Swap the RoleID selected in the role_name slot (tuple position / dict key) for its name."""
+    if pos is None or not rows:
+        return rows
+    roles = get_role_names(cur)
+    if isinstance(rows[0], dict):
+        for r in rows:
+            r["role_name"] = roles.get(r["role_name"])
+        return rows
+    return [r[:pos] + (roles.get(r[pos]),) + r[pos + 1:] for r in rows]
+
+# ------------------ Directory query -----------------
+# Filters/keyset run in SQL; indexes users(UserName), users(Email), users(RoleID) come from migrations.py
+def build_user_list_sql(cur, table_name: str, where: str = "", columns: Optional[Tuple[int, ...]] = None,
+                        limit: Optional[int] = None) -> str:
+    """SELECT for list_user on `users` or `user`; absent columns come back as NULL.
+    `where` may use {pk} {username} {email} {role_id} {is_active}; `columns` keeps only those
+    positions of USER_ROW_FIELDS (?fields=)."""
+    cols = get_columns(cur, table_name)
+    if table_name == "users":
+        pk = get_users_pk(cur)
+        uname_col = "UserName" if "UserName" in cols else "Username"
+        phone_col = "PhoneNumber" if "PhoneNumber" in cols else None
+        birth_col = "BirthDate" if "BirthDate" in cols else None
+    else:
+        pk = "UserID"
+        uname_col = "Username" if "Username" in cols else "UserName"
+        phone_col = "Phonenumber" if "Phonenumber" in cols else ("PhoneNumber" if "PhoneNumber" in cols else None)
+        birth_col = "Birthdate" if "Birthdate" in cols else None
+    has_role = "RoleID" in cols
+    has_active = "IsActive" in cols
+    select_fields = [
+        f"u.{pk} AS user_id",
+        f"'{table_name}' AS table_used",
+        f"u.{uname_col} AS username",
+        "u.Email AS email",
+        f"u.{phone_col} AS phone" if phone_col else "NULL AS phone",
+        f"u.{birth_col} AS birthdate" if birth_col else "NULL AS birthdate",
+        "u.RoleID AS role_id" if has_role else "NULL AS role_id",
+        "u.RoleID AS role_name" if has_role else "NULL AS role_name",
+        "u.IsActive AS is_active" if has_active else "NULL AS is_active",
+    ]
+    if columns is not None:
+        select_fields = [select_fields[i] for i in columns]
+    where_sql = ""
+    if where:
+        where_sql = "WHERE " + where.format(
+            pk=f"u.`{pk}`", username=f"u.`{uname_col}`", email="u.`Email`",
+            role_id="u.`RoleID`" if has_role else "NULL", is_active="u.`IsActive`" if has_active else "NULL",
+        )
+    limit_sql = f" LIMIT {int(limit)}" if limit is not None else ""
+    return f"SELECT {', '.join(select_fields)} FROM `{table_name}` u {where_sql} ORDER BY u.`{pk}` ASC{limit_sql}"
+
+def _like_prefix(q: str) -> str:
+    return q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+def _parse_cursor(cursor: Optional[str]) -> Tuple[Optional[str], Optional[int]]:
+    # "<table>:<last pk>" — the directory runs through `users` (by pk) and then legacy `user`
+    if not cursor:
+        return None, None
+    table, _, after = cursor.partition(":")
+    if table not in ("users", "user") or not after.lstrip("-").isdigit():
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return table, int(after)
+
+@router.get("/api/users", response_model=UserPage, dependencies=[require_perm("users:read")])
+def list_user(
+    request: Request,
+    limit: int = Query(USERS_PAGE_SIZE, ge=1, le=USERS_PAGE_MAX),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    q: Optional[str] = Query(None, max_length=100, description="Prefix of username or email"),
+    role_id: Optional[int] = Query(None),
+    is_active: Optional[bool] = Query(None),
+    fields: Optional[str] = Query(None, description="Comma-separated subset, e.g. user_id,username"),
+):
+    refresh_role_names()
+    return cached(request, ("users", "roles"),
+                  lambda: _list_user(limit, cursor, q, role_id, is_active, fields))
+
+def _list_user(limit: int, cursor: Optional[str], q: Optional[str], role_id: Optional[int],
+               is_active: Optional[bool], fields: Optional[str]):
+    proj = parse_fields(fields, USER_ROW_FIELDS)
+    if proj is not None and 0 not in proj:
+        proj = (0,) + proj  # the cursor is built from user_id
+    role_pos = ROLE_NAME_POS if proj is None else (proj.index(ROLE_NAME_POS) if ROLE_NAME_POS in proj else None)
+    start_table, after = _parse_cursor(cursor)
+
+    conds, vals = [], []
+    q = (q or "").strip()
+    if q:
+        conds.append(f"({{username}} LIKE %s{repo.like_escape} OR {{email}} LIKE %s{repo.like_escape})"); vals += [_like_prefix(q)] * 2
+    if role_id is not None:
+        conds.append("{role_id} = %s"); vals.append(role_id)
+    if is_active is not None:
+        conds.append("{is_active} = %s"); vals.append(1 if is_active else 0)
+
+    try:
+        cnx = get_conn(read_only=True)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"DB connect failed: {e}")
 
-    results: List[UserItem] = []
+    dictionary = not (FAST_JSON or proj)
     try:
-        cur = cnx.cursor(dictionary=True)
+        cur = cnx.cursor(dictionary=dictionary)
         has_users = table_exists(cur, "users")
         has_user = table_exists(cur, "user")
         if not has_users and not has_user:
             raise HTTPException(status_code=500, detail="No suitable user table found. Expected 'users' or 'user'.")
 
-        if has_users:
-            cols = get_columns(cur, "users")
-            pk = get_users_pk(cur)
-            select_fields = [
-                f"u.{pk} AS user_id",
-                "u.UserName AS username" if "UserName" in cols else "u.Username AS username",
-                "u.Email AS email",
-            ]
-            if "PhoneNumber" in cols: select_fields.append("u.PhoneNumber AS phone")
-            if "BirthDate" in cols: select_fields.append("u.BirthDate AS birthdate")
-            if "RoleID" in cols: select_fields.append("u.RoleID AS role_id")
-            if "IsActive" in cols: select_fields.append("u.IsActive AS is_active")
-            role_join = ""
-            if "RoleID" in cols and table_exists(cur, "roles"):
-                role_join = " LEFT JOIN roles r ON u.RoleID = r.RoleID "
-                select_fields.append("r.RoleName AS role_name")
-            sql_users = f"SELECT {', '.join(select_fields)} FROM `users` u {role_join} ORDER BY u.`{pk}` ASC"
-            cur.execute(sql_users)
-            for row in cur.fetchall():
-                results.append(
-                    UserItem(
-                        user_id=row.get("user_id"),
-                        table_used="users",
-                        username=row.get("username"),
-                        email=row.get("email"),
-                        phone=row.get("phone"),
-                        birthdate=row.get("birthdate"),
-                        role_id=row.get("role_id"),
-                        role_name=row.get("role_name"),
-                        is_active=bool(row["is_active"]) if row.get("is_active") is not None else None,
-                    )
-                )
-
-        if has_user:
-            cols = get_columns(cur, "user")
-            uname_col = "Username" if "Username" in cols else "UserName"
-            phone_col = "Phonenumber" if "Phonenumber" in cols else ("PhoneNumber" if "PhoneNumber" in cols else None)
-            select_fields = [
-                "u.UserID AS user_id",
-                f"u.{uname_col} AS username",
-                "u.Email AS email",
-            ]
-            if phone_col: select_fields.append(f"u.{phone_col} AS phone")
-            if "Birthdate" in cols: select_fields.append("u.Birthdate AS birthdate")
-            if "RoleID" in cols: select_fields.append("u.RoleID AS role_id")
-            if "IsActive" in cols: select_fields.append("u.IsActive AS is_active")
-            role_join = ""
-            if "RoleID" in cols and table_exists(cur, "roles"):
-                role_join = " LEFT JOIN roles r ON u.RoleID = r.RoleID "
-                select_fields.append("r.RoleName AS role_name")
-            sql_user = f"SELECT {', '.join(select_fields)} FROM `user` u {role_join} ORDER BY u.`UserID` ASC"
-            cur.execute(sql_user)
-            for row in cur.fetchall():
-                results.append(
-                    UserItem(
-                        user_id=row.get("user_id"),
-                        table_used="user",
-                        username=row.get("username"),
-                        email=row.get("email"),
-                        phone=row.get("phone"),
-                        birthdate=row.get("birthdate"),
-                        role_id=row.get("role_id"),
-                        role_name=row.get("role_name"),
-                        is_active=bool(row["is_active"]) if row.get("is_active") is not None else None,
-                    )
-                )
-
-        return results
+        rows: List[Any] = []
+        origin: List[str] = []
+        for table_name, present in (("users", has_users), ("user", has_user)):
+            if not present or (start_table == "user" and table_name == "users"):
+                continue
+            t_conds, t_vals = list(conds), list(vals)
+            if table_name == start_table:
+                t_conds.append("{pk} > %s"); t_vals.append(after)
+            need = limit + 1 - len(rows)   # one extra row tells us whether there is a next page
+            cur.execute(build_user_list_sql(cur, table_name, " AND ".join(t_conds), columns=proj, limit=need),
+                        tuple(t_vals))
+            page = cur.fetchall()
+            rows.extend(page)
+            origin.extend([table_name] * len(page))
+            if len(rows) > limit:
+                break
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = f"{origin[limit - 1]}:{last['user_id'] if dictionary else last[0]}"
+        rows = fill_role_names(cur, rows, role_pos)
+
+        if proj or FAST_JSON:
+            encoder = projection(USER_ROW_FIELDS, proj, "user")[2] if proj else encode_user_row
+            cursor_json = "null" if next_cursor is None else f'"{next_cursor}"'
+            return json_bytes_response(b'{"data":' + encode_rows(encoder, rows) +
+                                       f',"next_cursor":{cursor_json}}}'.encode())
+
+        results = [
+            UserItem(
+                user_id=row.get("user_id"),
+                table_used=row.get("table_used"),
+                username=row.get("username"),
+                email=row.get("email"),
+                phone=row.get("phone"),
+                birthdate=row.get("birthdate"),
+                role_id=row.get("role_id"),
+                role_name=row.get("role_name"),
+                is_active=bool(row["is_active"]) if row.get("is_active") is not None else None,
+            )
+            for row in rows
+        ]
+        return UserPage(data=results, next_cursor=next_cursor)
 
     except HTTPException:
         raise
@@ -361,8 +499,42 @@ def list_user():
         except Exception:
             pass
 
-@app.post("/api/users", response_model=CreateUserResponse, status_code=201)
-def create_user(payload: CreateUserRequest):
+# declared before /{user_id} so "batch" is not parsed as an id
+@router.get("/api/users/batch", dependencies=[require_perm("users:read")])
+def get_users_batch(ids: str = Query(..., description="Comma-separated user ids, e.g. 3,1,2")):
+    wanted = batch.parse_ids(ids)
+    cnx = get_conn(read_only=True)
+    try:
+        cur = cnx.cursor()
+        found: Dict[int, Any] = {}
+        # `users` wins over the legacy `user` table for the same id (as in get_user_by_id)
+        for table_name in ("users", "user"):
+            rest = [i for i in wanted if i not in found]
+            if not rest or not table_exists(cur, table_name):
+                continue
+            in_sql = "{pk} IN (" + ", ".join(["%s"] * len(rest)) + ")"
+            cur.execute(build_user_list_sql(cur, table_name, where=in_sql), tuple(rest))
+            for row in cur.fetchall():
+                found.setdefault(int(row[0]), row)
+        rows, missing = batch.in_request_order(wanted, found)
+        rows = fill_role_names(cur, rows, ROLE_NAME_POS)
+    except mysql.connector.Error as e:
+        raise HTTPException(status_code=500, detail=f"Query failed: {e}")
+    finally:
+        try:
+            cur.close(); cnx.close()
+        except Exception:
+            pass
+    if FAST_JSON:
+        return json_bytes_response(batch.encode_batch(encode_rows(encode_user_row, rows), missing))
+    return {"data": [UserItem(**dict(zip(USER_FIELDS, r))) for r in rows], "missing": missing}
+
+@router.post("/api/users", response_model=CreateUserResponse, status_code=201)
+def create_user(payload: CreateUserRequest, idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+                claims: Dict[str, Any] = require_perm("users:write")):
+    return idempotency.run("users", idempotency_key, payload, lambda: _insert_user(payload), 201, claims.get("sub"))
+
+def _insert_user(payload: CreateUserRequest) -> CreateUserResponse:
     try:
         cnx = get_conn()
     except Exception as e:
@@ -411,6 +583,7 @@ def create_user(payload: CreateUserRequest):
 
         cnx.commit()
         new_id = cur.lastrowid
+        cache_bus.publish("users", new_id, "I")
         return CreateUserResponse(user_id=new_id, table_used=table_name, username=payload.username, email=payload.email)
 
     except mysql.connector.IntegrityError as e:
@@ -425,10 +598,187 @@ def create_user(payload: CreateUserRequest):
         except Exception:
             pass
 
-@app.get("/api/users/{user_id}", response_model=UserItem)
+# ------------------ Bulk provisioning -----------------
+# POST /api/users/bulk — body is a JSON list of CreateUserRequest objects or a CSV with the
+# same column names (header row). Invalid rows, in-batch duplicates and existing
+# usernames/emails are reported per row; every other row is inserted in one transaction.
+BULK_CSV_COLUMNS = ["username", "email", "password", "phone", "birthdate", "role_id", "is_active"]
+
+class BulkUserResult(BaseModel):
+    row: int
+    status: Literal["created", "invalid", "duplicate", "exists", "failed"]
+    user_id: Optional[int] = None
+    username: Optional[str] = None
+    detail: Optional[str] = None
+
+class BulkUserResponse(BaseModel):
+    table_used: Optional[Literal["users", "user"]] = None
+    created: int
+    rejected: int
+    results: List[BulkUserResult]
+
+async def _read_bulk_body(request: Request) -> List[Dict[str, Any]]:
+    """Stream the body in; CSV lines are split as they arrive so oversize uploads stop early."""
+    ctype = request.headers.get("content-type", "").lower()
+    is_csv = "csv" in ctype
+    size = 0
+    chunks: List[bytes] = []
+    lines = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > BULK_USERS_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"Body larger than {BULK_USERS_MAX_BYTES} bytes")
+        if is_csv:
+            lines += chunk.count(b"\n")
+            if lines > BULK_USERS_MAX + 1:
+                raise HTTPException(status_code=413, detail=f"At most {BULK_USERS_MAX} users per request")
+        chunks.append(chunk)
+    text = b"".join(chunks).decode("utf-8-sig")
+    if is_csv:
+        reader = csv.DictReader(io.StringIO(text))
+        unknown = set(reader.fieldnames or []) - set(BULK_CSV_COLUMNS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown CSV columns: {', '.join(sorted(unknown))}")
+        items = [{k: v for k, v in r.items() if v not in (None, "")} for r in reader]
+    else:
+        try:
+            items = json.loads(text or "[]")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON list of users")
+    if len(items) > BULK_USERS_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_USERS_MAX} users per request")
+    return items
+
+def hash_passwords(passwords: List[str]) -> List[str]:
+    # SHA-256 over short strings holds the GIL, so a thread pool would only add overhead here;
+    # this is the single place to move hashing to a process pool if a slow KDF replaces it.
+    return [hash_sha256(p) for p in passwords]
+
+def _user_insert_columns(cur, table_name: str) -> List[Tuple[str, str]]:
+    """(column, CreateUserRequest field | '_hash' | '_active') for INSERTs into `table_name`."""
+    if table_name == "users":
+        return [("UserName", "username"), ("PhoneNumber", "phone"), ("Email", "email"), ("PasswordHash", "_hash"),
+                ("BirthDate", "birthdate"), ("RoleID", "role_id"), ("IsActive", "_active")]
+    cols = get_columns(cur, "user")
+    out = [("Username" if "Username" in cols else "UserName", "username"), ("Email", "email"), ("PasswordHash", "_hash")]
+    phone_col = "Phonenumber" if "Phonenumber" in cols else ("PhoneNumber" if "PhoneNumber" in cols else None)
+    if phone_col: out.append((phone_col, "phone"))
+    if "Birthdate" in cols: out.append(("Birthdate", "birthdate"))
+    if "RoleID" in cols: out.append(("RoleID", "role_id"))
+    if "IsActive" in cols: out.append(("IsActive", "_active"))
+    return out
+
+def _existing_identities(cur, table_name: str, usernames: List[str], emails: List[str]) -> Tuple[set, set]:
+    """One query for the whole batch: which usernames / emails are already taken (lower-cased)."""
+    src = next((x for x in identity_sources(cur) if x["table"] == table_name), None)
+    if src is None or not usernames:
+        return set(), set()
+    q = (f"SELECT 'u', u.`{src['username']}` FROM `{table_name}` u "
+         f"WHERE u.`{src['username']}` IN ({', '.join(['%s'] * len(usernames))}) "
+         f"UNION ALL SELECT 'e', u.Email FROM `{table_name}` u WHERE u.Email IN ({', '.join(['%s'] * len(emails))})")
+    cur.execute(q, tuple(usernames) + tuple(emails))
+    taken_u, taken_e = set(), set()
+    for kind, v in cur.fetchall():
+        (taken_u if kind == "u" else taken_e).add(str(v).lower())
+    return taken_u, taken_e
+
+def _bulk_create(items: List[Dict[str, Any]]) -> BulkUserResponse:
+    results: List[Optional[BulkUserResult]] = [None] * len(items)
+    valid: List[Tuple[int, CreateUserRequest]] = []
+    seen_u, seen_e = set(), set()
+    for i, raw in enumerate(items):
+        try:
+            if not isinstance(raw, dict):
+                raise ValueError("expected an object")
+            p = CreateUserRequest(**raw)
+        except ValidationError as e:
+            detail = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            results[i] = BulkUserResult(row=i + 1, status="invalid", detail=detail)
+            continue
+        except (ValueError, TypeError) as e:
+            results[i] = BulkUserResult(row=i + 1, status="invalid", detail=str(e))
+            continue
+        ku, ke = p.username.lower(), p.email.lower()
+        if ku in seen_u or ke in seen_e:
+            results[i] = BulkUserResult(row=i + 1, status="duplicate", username=p.username,
+                                        detail="Username or email repeated earlier in this batch")
+            continue
+        seen_u.add(ku); seen_e.add(ke)
+        valid.append((i, p))
+
+    table_name = None
+    if valid:
+        cnx = get_conn()
+        try:
+            cur = cnx.cursor()
+            has_users = table_exists(cur, "users")
+            if not has_users and not table_exists(cur, "user"):
+                raise HTTPException(status_code=500, detail="No suitable user table found. Expected 'users' or 'user'.")
+            table_name = "users" if has_users else "user"
+
+            taken_u, taken_e = _existing_identities(cur, table_name, [p.username for _, p in valid],
+                                                    [p.email for _, p in valid])
+            to_insert = []
+            for i, p in valid:
+                if p.username.lower() in taken_u or p.email.lower() in taken_e:
+                    results[i] = BulkUserResult(row=i + 1, status="exists", username=p.username,
+                                                detail="Username or email already exists.")
+                else:
+                    to_insert.append((i, p))
+
+            hashes = hash_passwords([p.password for _, p in to_insert])
+            columns = _user_insert_columns(cur, table_name)
+            col_sql = ", ".join(f"`{c}`" for c, _ in columns)
+            user_col = columns[0][0]
+            pk = get_users_pk(cur) if table_name == "users" else "UserID"
+            row_sql = "(" + ", ".join(["%s"] * len(columns)) + ")"
+            try:
+                for start in range(0, len(to_insert), BULK_INSERT_CHUNK):
+                    chunk = to_insert[start:start + BULK_INSERT_CHUNK]
+                    values: List[Any] = []
+                    for j, (_, p) in enumerate(chunk):
+                        active = 1 if (p.is_active is None or p.is_active) else 0
+                        for _, field in columns:
+                            values.append(hashes[start + j] if field == "_hash" else active if field == "_active"
+                                          else getattr(p, field))
+                    cur.execute(f"INSERT INTO `{table_name}` ({col_sql}) VALUES {', '.join([row_sql] * len(chunk))}",
+                                tuple(values))
+                    # read the ids back by username: a multi-row INSERT's AUTO_INCREMENT ids are not
+                    # consecutive under innodb_autoinc_lock_mode=2 or auto_increment_increment > 1
+                    names = [p.username for _, p in chunk]
+                    cur.execute(f"SELECT `{pk}`, `{user_col}` FROM `{table_name}` "
+                                f"WHERE `{user_col}` IN ({', '.join(['%s'] * len(names))})", tuple(names))
+                    ids = {str(name).lower(): int(uid) for uid, name in cur.fetchall()}
+                    for i, p in chunk:
+                        results[i] = BulkUserResult(row=i + 1, status="created", user_id=ids[p.username.lower()],
+                                                    username=p.username)
+                cnx.commit()
+            except mysql.connector.Error as e:
+                cnx.rollback()
+                for i, p in to_insert:
+                    results[i] = BulkUserResult(row=i + 1, status="failed", username=p.username,
+                                                detail=f"Batch rolled back: {e.msg}")
+            cur.close()
+        finally:
+            cnx.close()
+        if any(r is not None and r.status == "created" for r in results):
+            cache_bus.publish("users", None, "I")
+
+    created = sum(1 for r in results if r.status == "created")
+    return BulkUserResponse(table_used=table_name, created=created, rejected=len(results) - created, results=results)
+
+@router.post("/api/users/bulk", response_model=BulkUserResponse, dependencies=[require_perm("users:write")])
+async def bulk_create_users(request: Request):
+    """JSON list or text/csv (header: username,email,password,phone,birthdate,role_id,is_active)."""
+    items = await _read_bulk_body(request)
+    return await run_in_threadpool(_bulk_create, items)
+
+@router.get("/api/users/{user_id}", response_model=UserItem, dependencies=[require_perm("users:read")])
 def get_user_by_id(user_id: int):
     try:
-        cnx = get_conn()
+        cnx = get_conn(read_only=True)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"DB connect failed: {e}")
 
@@ -459,7 +809,7 @@ def get_user_by_id(user_id: int):
         except Exception:
             pass
 
-@app.put("/api/users/{user_id}", response_model=UserItem)
+@router.put("/api/users/{user_id}", response_model=UserItem, dependencies=[require_perm("users:write")])
 def update_user(user_id: int, payload: CreateUserRequest):
     try:
         cnx = get_conn()
@@ -503,6 +853,7 @@ def update_user(user_id: int, payload: CreateUserRequest):
             cur.execute(sql, tuple(values))
 
         cnx.commit()
+        cache_bus.publish("users", user_id)
         # return latest
         row = get_user_item(cur, table_name, pk if table_name == "users" else "UserID", user_id)
         if not row:
@@ -528,7 +879,7 @@ def update_user(user_id: int, payload: CreateUserRequest):
         except Exception:
             pass
 
-@app.delete("/api/users/{user_id}")
+@router.delete("/api/users/{user_id}", dependencies=[require_perm("users:write")])
 def delete_user(user_id: int):
     try:
         cnx = get_conn()
@@ -542,6 +893,7 @@ def delete_user(user_id: int):
         if cur.rowcount == 0:
             raise HTTPException(status_code=404, detail="User not found.")
         cnx.commit()
+        cache_bus.publish("users", user_id, "D")
         return {"detail": "User deleted successfully."}
     except HTTPException:
         raise
@@ -557,8 +909,6 @@ def delete_user(user_id: int):
 # ------------------ Auth (JWT) -----------------
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
-REVOKED_JTI: set[str] = set()
-
 def _epoch(dt: datetime) -> int:
     return int(dt.timestamp())
 
@@ -585,66 +935,9 @@ class LogHeadersMiddleware(BaseHTTPMiddleware):
         response = await call_next(request)
         return response
 
-app.add_middleware(LogHeadersMiddleware)
-
-
-def ensure_not_revoked(jti: str):
-    if jti in REVOKED_JTI:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has been revoked")
-    
-
-def _fetch_user_by_username_or_email(cur, identifier: str) -> Optional[dict]:
-    # Try `users`
-    if table_exists(cur, "users"):
-        cur.execute(
-            """
-            SELECT 
-              u.UserID        AS user_id,
-              u.UserName      AS username,
-              u.Email         AS email,
-              u.PhoneNumber   AS phone,
-              u.PasswordHash  AS password_hash,
-              u.RoleID        AS role_id,
-              u.IsActive      AS is_active
-            FROM users u
-            WHERE u.UserName=%s OR u.Email=%s
-            LIMIT 1
-            """,
-            (identifier, identifier),
-        )
-        row = cur.fetchone()
-        if row:
-            return row
-    # Try `user`
-    if table_exists(cur, "user"):
-        cols = get_columns(cur, "user")
-        uname_col = "Username" if "Username" in cols else "UserName"
-        phone_col = "Phonenumber" if "Phonenumber" in cols else ("PhoneNumber" if "PhoneNumber" in cols else None)
-        cur.execute(
-            f"""
-            SELECT 
-              u.UserID        AS user_id,
-              u.{uname_col}   AS username,
-              u.Email         AS email,
-              {f'u.{phone_col} AS phone,' if phone_col else 'NULL AS phone,'}
-              u.PasswordHash  AS password_hash,
-              u.RoleID        AS role_id,
-              { 'u.IsActive' if 'IsActive' in cols else 'NULL'} AS is_active
-            FROM user u
-            WHERE u.{uname_col}=%s OR u.Email=%s
-            LIMIT 1
-            """,
-            (identifier, identifier),
-        )
-        row = cur.fetchone()
-        if row:
-            return row
-    return None
 
 def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
-    print("[DEBUG] Access token:", token)
     payload = decode_token(token)
-    print("[DEBUG] Payload:", payload)
     ensure_not_revoked(payload.get("jti", ""))
     if payload.get("type") != "access":
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not an access token")
@@ -664,7 +957,7 @@ def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
         except Exception:
             pass
 
-@app.post("/api/auth/login", response_model=TokenPairResponse)
+@router.post("/api/auth/login", response_model=TokenPairResponse)
 def login(payload: LoginRequest):
     try:
         cnx = get_conn()
@@ -672,14 +965,14 @@ def login(payload: LoginRequest):
         raise HTTPException(status_code=500, detail=f"DB connect failed: {e}")
     try:
         cur = cnx.cursor(dictionary=True)
-        u = _fetch_user_by_username_or_email(cur, payload.identifier)
+        u = find_identity(cur, payload.identifier)
         if not u:
             raise HTTPException(status_code=401, detail="Invalid credentials")
         if u.get("is_active") is not None and int(u["is_active"]) == 0:
             raise HTTPException(status_code=403, detail="User is inactive")
         if not verify_password(payload.password, u["password_hash"]):
             raise HTTPException(status_code=401, detail="Invalid credentials")
-        access_token, access_exp, _ = create_token(sub=str(u["user_id"]), kind="access", extra_claims={"username": u["username"]})
+        access_token, access_exp, _ = create_token(sub=str(u["user_id"]), kind="access", extra_claims={"username": u["username"], **role_claims(u.get("role_id"))})
         refresh_token, refresh_exp, _ = create_token(sub=str(u["user_id"]), kind="refresh")
         return TokenPairResponse(
             access_token=access_token,
@@ -697,17 +990,13 @@ def login(payload: LoginRequest):
         except Exception:
             pass
 
-@app.post("/api/auth/refresh", response_model=TokenPairResponse)
+@router.post("/api/auth/refresh", response_model=TokenPairResponse)
 def refresh_token(payload: RefreshRequest):
     data = decode_token(payload.refresh_token)
     ensure_not_revoked(data.get("jti", ""))
     if data.get("type") != "refresh":
         raise HTTPException(status_code=401, detail="Not a refresh token")
     user_id = data.get("sub")
-    # rotate refresh → revoke old refresh
-    old_jti = data.get("jti")
-    if old_jti:
-        REVOKED_JTI.add(old_jti)
     # verify user still active
     try:
         cnx = get_conn()
@@ -716,13 +1005,20 @@ def refresh_token(payload: RefreshRequest):
         row = get_user_item(cur, table_name, pk if table_name == "users" else "UserID", int(user_id))
         if not row:
             raise HTTPException(status_code=404, detail="User not found")
+        if row.get("is_active") is not None and int(row["is_active"]) == 0:
+            raise HTTPException(status_code=403, detail="User is inactive")
         username = row["username"]
+        claims = {"username": username, **role_claims(row.get("role_id"))}
     finally:
         try:
             cur.close(); cnx.close()
         except Exception:
             pass
-    access_token, access_exp, _ = create_token(sub=str(user_id), kind="access", extra_claims={"username": username})
+    # rotate refresh → revoke old refresh (only now: a 503 above leaves it usable for a retry)
+    old_jti = data.get("jti")
+    if old_jti:
+        REVOKED_JTI.add(old_jti)
+    access_token, access_exp, _ = create_token(sub=str(user_id), kind="access", extra_claims=claims)
     new_refresh, refresh_exp, _ = create_token(sub=str(user_id), kind="refresh")
     return TokenPairResponse(
         access_token=access_token,
@@ -731,7 +1027,7 @@ def refresh_token(payload: RefreshRequest):
         refresh_expires_at=refresh_exp,
     )
 
-@app.post("/api/auth/logout", response_model=LogoutResponse)
+@router.post("/api/auth/logout", response_model=LogoutResponse)
 def logout(authorization: str = Header(None)):
     if not authorization or not authorization.lower().startswith("bearer "):
         raise HTTPException(status_code=400, detail="Missing Bearer token in Authorization header")
@@ -743,7 +1039,7 @@ def logout(authorization: str = Header(None)):
     REVOKED_JTI.add(jti)
     return LogoutResponse(detail="Logged out (access token revoked).")
 
-@app.post("/api/auth/logout_refresh", response_model=LogoutResponse)
+@router.post("/api/auth/logout_refresh", response_model=LogoutResponse)
 def logout_refresh(payload: RefreshRequest):
     data = decode_token(payload.refresh_token)
     if data.get("type") != "refresh":
@@ -753,7 +1049,7 @@ def logout_refresh(payload: RefreshRequest):
         REVOKED_JTI.add(jti)
     return LogoutResponse(detail="Refresh token revoked.")
 
-@app.get("/api/me", response_model=UserItem)
+@router.get("/api/me", response_model=UserItem)
 def read_me(current=Depends(get_current_user)):
     try:
         cnx = get_conn()
@@ -779,7 +1075,21 @@ def read_me(current=Depends(get_current_user)):
         except Exception:
             pass
 
-# ------------------ Dev runner ------------------
-if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run("user:app", host="0.0.0.0", port=8000, reload=True)
+cache_bus.subscribe("schema", lambda key: clear_schema_cache())
+cache_bus.subscribe("roles", clear_roles_cache)
+
+def warm_up() -> None:
+    """Prime table existence / column / PK caches for both user table layouts and roles."""
+    cnx = get_conn()
+    try:
+        cur = cnx.cursor()
+        for t in ("users", "user", "roles"):
+            if table_exists(cur, t) and t != "roles":
+                get_columns(cur, t)
+        if table_exists(cur, "users"):
+            get_users_pk(cur)
+        get_role_names(cur)
+        identity_login_sql(cur)
+        cur.close()
+    finally:
+        cnx.close()
@@ -124,8 +124,8 @@ document.addEventListener("DOMContentLoaded", () => {
     if (res.status === 401 && auth === "access" && retryOn401 && !isRefreshExpired()) {
       try {
         await refreshAccessToken();
-        const headers2 = new Headers({ Accept: "application/json" });
-        if (opts.body && !(opts.body instanceof FormData)) headers2.set("Content-Type", "application/json");
+        // keep the caller's headers (Idempotency-Key, ...) on the replay; only the token changes
+        const headers2 = new Headers(headers);
         const at2 = getAT();
         if (at2) headers2.set("Authorization", `Bearer ${at2}`);
         res = await fetch(url, { method: opts.method, body: opts.body, headers: headers2, cache: "no-store" });
@@ -203,6 +203,11 @@ document.addEventListener("DOMContentLoaded", () => {
     return apiFetch(url, options, { auth: "access" });
   }
 
+  // One key per create: retries of that request (401 refresh, network) are deduplicated by the API
+  function newIdempotencyKey() {
+    return crypto.randomUUID ? crypto.randomUUID() : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+  }
+
   function toast(msg, type = "info") {
     console[type === "error" ? "error" : "log"]("[INFO]", msg);
   }
@@ -231,14 +236,22 @@ document.addEventListener("DOMContentLoaded", () => {
         Lowstock: payload.low,
         Unit: payload.unit || "-"
       };
-      return request(ROUTES.raw, { method: "POST", body: JSON.stringify(body) });
+      return request(ROUTES.raw, {
+        method: "POST",
+        headers: { "Idempotency-Key": newIdempotencyKey() },
+        body: JSON.stringify(body)
+      });
     } else {
       const body = {
         FinishedGoodsName: payload.name,
         FinishedGoodsQuantity: payload.qty,
         Lowstock: payload.low
       };
-      return request(ROUTES.finished, { method: "POST", body: JSON.stringify(body) });
+      return request(ROUTES.finished, {
+        method: "POST",
+        headers: { "Idempotency-Key": newIdempotencyKey() },
+        body: JSON.stringify(body)
+      });
     }
   }
 
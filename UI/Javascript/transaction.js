@@ -9,6 +9,7 @@
     transactions: `${API_BASE}/api/transactions`,
     materials:    `${API_BASE}/api/raw-materials`,
     products:     `${API_BASE}/api/finished-goods`,
+    lookupItems:  `${API_BASE}/api/lookup/items`,   // [[id, name, "Raw"|"Finished"], ...]
     // Auth + profile
     me:        `${API_BASE}/api/me`,
     login:     `${API_BASE}/api/auth/login`,
@@ -133,8 +134,8 @@
     if (res.status === 401 && auth === "access" && retryOn401 && !isRefreshExpired()) {
       try {
         await refreshAccessToken();
-        const headers2 = new Headers({ Accept: "application/json" });
-        if (opts.body && !(opts.body instanceof FormData)) headers2.set("Content-Type", "application/json");
+        // keep the caller's headers (Idempotency-Key, ...) on the replay; only the token changes
+        const headers2 = new Headers(headers);
         const at2 = getAT();
         if (at2) headers2.set("Authorization", `Bearer ${at2}`);
         res = await fetch(url, { method: opts.method, body: opts.body, headers: headers2, cache: "no-store" });
@@ -183,6 +184,10 @@
   const fmtNum = (v) => (v === null || v === undefined || v === "" ? "" : Number(v).toLocaleString());
   const fmtDT  = (s) => s ? new Date(s).toLocaleString() : "";
 
+  // One key per submit: retries of that submit (401 refresh, network) are deduplicated by the API
+  const newIdempotencyKey = () =>
+    (crypto.randomUUID ? crypto.randomUUID() : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`);
+
   const getChangedBy = () => {
     const me = getMe();
     return me?.UserID ?? me?.id ?? me?.user_id ?? null;
@@ -191,14 +196,11 @@
   // ---------- Load materials/products for Create modal (AUTHED) ----------
   async function loadMaterials() {
     try {
-      const data = await apiFetch(ROUTES.materials, { method: "GET" }, { auth: "access" });
-      const list = Array.isArray(data?.data) ? data.data : Array.isArray(data) ? data : [];
+      const list = await apiFetch(`${ROUTES.lookupItems}?type=Raw`, { method: "GET" }, { auth: "access" });
       createMaterial.innerHTML = `<option value="">—</option>` +
-        list.map(m => {
-          const id = m.MaterialID ?? m.MaterialsId ?? m.id ?? m.ID;
-          const name = m.MaterialName ?? m.MaterialsName ?? m.Name ?? "";
-          return `<option value="${id}">${id ?? ""} — ${name ?? ""}</option>`;
-        }).join("");
+        (Array.isArray(list) ? list : []).map(([id, name]) =>
+          `<option value="${id}">${id ?? ""} — ${name ?? ""}</option>`
+        ).join("");
     } catch (e) {
       console.error("Load materials failed:", e);
       createMaterial.innerHTML = `<option value="">—</option>`;
@@ -208,14 +210,11 @@
 
   async function loadProducts() {
     try {
-      const data = await apiFetch(ROUTES.products, { method: "GET" }, { auth: "access" });
-      const list = Array.isArray(data?.data) ? data.data : Array.isArray(data) ? data : [];
+      const list = await apiFetch(`${ROUTES.lookupItems}?type=Finished`, { method: "GET" }, { auth: "access" });
       createProduct.innerHTML = `<option value="">—</option>` +
-        list.map(p => {
-          const id = p.GoodsID ?? p.ProductId ?? p.id ?? p.ID;
-          const name = p.FinishedGoodsName ?? p.ProductName ?? p.Name ?? "";
-          return `<option value="${id}">${id ?? ""} — ${name ?? ""}</option>`;
-        }).join("");
+        (Array.isArray(list) ? list : []).map(([id, name]) =>
+          `<option value="${id}">${id ?? ""} — ${name ?? ""}</option>`
+        ).join("");
     } catch (e) {
       console.error("Load products failed:", e);
       createProduct.innerHTML = `<option value="">—</option>`;
@@ -489,6 +488,7 @@
     try {
       await apiFetch(ROUTES.transactions, {
         method: "POST",
+        headers: { "Idempotency-Key": newIdempotencyKey() },
         body: JSON.stringify(payload)
       }, { auth: "access" });
 